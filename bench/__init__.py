@@ -0,0 +1,7 @@
+"""
+Bancs d'essai du tableau de bord, sans accès aux bases de l'usine.
+
+Les tables sources sont remplacées par des données synthétiques servies par
+SQLite (voir bench.synthetic), et le script Streamlit est exécuté sans
+navigateur avec AppTest (voir bench.run).
+"""
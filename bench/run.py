@@ -0,0 +1,262 @@
+"""
+Mesure des temps de chargement et de réexécution du tableau de bord.
+
+Pour chaque taille, le script Streamlit est exécuté sans navigateur avec
+AppTest, sur une base synthétique (voir bench.synthetic), dans un processus
+neuf : caches, tables synchronisées et instantanés sont vides au premier
+chargement, comme au démarrage du serveur. Chaque scénario mesure un
+chargement complet de la page ou la réexécution qui suit une action sur un
+widget, ainsi que les durées enregistrées par kpi_rol.metrics (requêtes,
+transformations, rendu de chaque section).
+
+Les résultats sont enregistrés en JSON dans bench/results et peuvent être
+comparés à une référence :
+
+    python -m bench.run                              # 10k, 1M et 10M lignes
+    python -m bench.run --rows 10000 1000000
+    python -m bench.run --save-baseline              # nouvelle référence
+    python -m bench.run --baseline bench/results/baseline.json
+
+Le code de sortie est 1 si un scénario est plus lent que la référence au-delà
+de la tolérance.
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+import pandas as pd
+
+from bench import synthetic
+
+# Tailles mesurées par défaut (lignes de chaque table d'événements)
+SIZES = (10_000, 1_000_000, 10_000_000)
+# Script du tableau de bord
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'test.py')
+# Répertoire des résultats et fichier de référence
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+BASELINE = os.path.join(RESULTS_DIR, 'baseline.json')
+# Écart relatif toléré avant de signaler un ralentissement
+TOLERANCE = 0.10
+# Écart absolu en dessous duquel une différence est considérée comme du bruit (en secondes)
+NOISE = 0.05
+# Durée maximale d'une exécution du script (en secondes)
+RUN_TIMEOUT = 60 * 60
+
+
+def _narrow(widget, days):
+    # Réduit une plage de dates aux derniers jours de la plage actuelle
+    start, end = widget.value
+    return widget.set_value((max(start, end - timedelta(days=days)), end))
+
+
+def _first_option(widget):
+    return widget.set_value(widget.options[:1])
+
+
+def _open_tab(label):
+    # L'onglet affiché suit le paramètre 'section' de l'adresse de la page
+    def action(at):
+        at.query_params['section'] = label
+        return at
+    return action
+
+
+# Scénarios, dans leur ordre d'exécution : nom et action sur l'application.
+# Chaque section n'est rendue que dans son onglet : le premier est affiché au
+# chargement, les autres sont ouverts tour à tour
+SCENARIOS = [
+    ('chargement', lambda at: at),
+    ('reexecution', lambda at: at),
+    ('plage_rts', lambda at: _narrow(at.slider(key='plage_dates_rts'), 30)),
+    ('recherche_apercu', lambda at: at.text_input(key='apercu_rts_recherche').input('270')),
+    ('onglet_bt', _open_tab("BT")),
+    ('plage_bt', lambda at: _narrow(at.slider(key='plage_dates_bt'), 30)),
+    ('page_apercu', lambda at: at.number_input(key='apercu_bt_page').set_value(2)),
+    ('onglet_perte_temps', _open_tab("Pertes de temps")),
+    ('plage_perte_temps', lambda at: _narrow(at.slider(key='plage_dates_perte_temps'), 60)),
+    ('secteur_perte_temps', lambda at: _first_option(at.multiselect(key='secteurs_perte_temps'))),
+    ('onglet_non_planifie', _open_tab("Non planifié")),
+    ('jours_non_planifie', lambda at: at.slider(key='nb_jours_non_planifie').set_value(365)),
+    ('onglet_production', _open_tab("Production")),
+    ('plage_production', lambda at: _narrow(at.date_input(key='plage_dates_production'), 90)),
+    ('onglet_eau', _open_tab("Eau")),
+]
+
+
+def _stage_totals(records):
+    # Durées cumulées par étape, et par section pour les rendus
+    totals = {'query_ms': 0.0, 'transform_ms': 0.0, 'render_ms': {}, 'rows': 0, 'payload_bytes': 0}
+    for entry in records:
+        stage = entry['stage']
+        if stage == 'render':
+            totals['render_ms'][entry['name']] = entry.get('ms', 0.0)
+            totals['payload_bytes'] += entry.get('payload_bytes', 0)
+        elif stage in ('query', 'transform'):
+            totals[f'{stage}_ms'] += entry.get('ms', 0.0)
+            totals['rows'] += entry.get('rows', 0)
+    totals['process_peak_rss'] = max((entry.get('process_peak_rss') or 0 for entry in records), default=None)
+    return totals
+
+
+def measure(rows):
+    """
+    Exécute les scénarios sur la base synthétique d'une taille donnée.
+
+    Doit être appelée dans un processus neuf : les objets partagés du paquet
+    kpi_rol (caches, tables synchronisées) fausseraient le premier chargement.
+
+    Args:
+        rows (int): Le nombre de lignes de chaque table d'événements.
+
+    Returns:
+        dict: Pour chaque scénario, la durée en secondes, les durées cumulées
+            par étape et les erreurs affichées par l'application.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    from kpi_rol import metrics, pool
+
+    pool.use_driver(synthetic.connector(synthetic.ensure_database(rows)), errors=(sqlite3.Error,))
+    at = AppTest.from_file(APP, default_timeout=RUN_TIMEOUT)
+    results = {}
+    for name, action in SCENARIOS:
+        since = time.time()
+        start = time.perf_counter()
+        action(at).run()
+        elapsed = time.perf_counter() - start
+        results[name] = {
+            'seconds': round(elapsed, 3),
+            **_stage_totals(metrics.recent(since)),
+            'errors': [str(e.value) for e in at.exception] + [str(e.value) for e in at.error],
+        }
+    return results
+
+
+def _measure_in_subprocess(rows):
+    with tempfile.TemporaryDirectory(prefix='kpi-rol-bench-') as directory:
+        output = os.path.join(directory, 'results.json')
+        env = dict(
+            os.environ,
+            KPI_ROL_SNAPSHOT_DIR=os.path.join(directory, 'snapshots'),
+            KPI_ROL_OFFLINE='0',
+        )
+        subprocess.run(
+            [sys.executable, '-m', 'bench.run', '--child', str(rows), '--output', output],
+            check=True,
+            env=env,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        )
+        with open(output, encoding='utf-8') as f:
+            return json.load(f)
+
+
+def _environment():
+    import streamlit
+
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True, cwd=os.path.dirname(APP),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'streamlit': streamlit.__version__,
+        'machine': platform.platform(),
+    }
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """
+    Compare des résultats à une référence.
+
+    Args:
+        results (dict): Les résultats ({taille: {scénario: mesures}}).
+        baseline (dict): Les résultats de référence, de même forme.
+        tolerance (float): L'écart relatif toléré.
+
+    Returns:
+        pd.DataFrame: Les durées, le rapport à la référence et un indicateur
+            de ralentissement, par taille et scénario communs aux deux.
+    """
+    lines = []
+    for size, scenarios in results.items():
+        for name, values in scenarios.items():
+            reference = baseline.get(size, {}).get(name)
+            if reference is None:
+                continue
+            before, after = reference['seconds'], values['seconds']
+            lines.append({
+                'lignes': int(size),
+                'scenario': name,
+                'reference_s': before,
+                'mesure_s': after,
+                'rapport': round(after / before, 2) if before else None,
+                'ralentissement': after - before > max(NOISE, before * tolerance),
+            })
+    return pd.DataFrame(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=list(SIZES),
+                        help="Nombre de lignes des tables d'événements (une mesure par taille).")
+    parser.add_argument('--baseline', default=BASELINE, help="Fichier de résultats de référence.")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="Enregistre aussi les résultats comme nouvelle référence.")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help="Écart relatif toléré par rapport à la référence.")
+    parser.add_argument('--child', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--output', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child is not None:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(measure(args.child), f)
+        return 0
+
+    results = {}
+    for rows in args.rows:
+        # La génération éventuelle de la base n'est pas comptée dans les mesures
+        print(f"Base synthétique de {rows} lignes : {synthetic.ensure_database(rows)}")
+        results[str(rows)] = _measure_in_subprocess(rows)
+        for name, values in results[str(rows)].items():
+            print(f"  {name:<22} {values['seconds']:>9.3f} s")
+            for error in values['errors']:
+                print(f"    Erreur : {error}")
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    report = {'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'environment': _environment(), 'results': results}
+    path = os.path.join(RESULTS_DIR, time.strftime('%Y%m%d-%H%M%S') + '.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Résultats enregistrés dans {path}")
+
+    regression = False
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Nouvelle référence : {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        comparison = compare(results, baseline['results'], args.tolerance)
+        if not comparison.empty:
+            print(f"Comparaison avec la référence du {baseline['created']} ({baseline['environment']['commit']}) :")
+            print(comparison.to_string(index=False))
+            regression = bool(comparison['ralentissement'].any())
+    return 1 if regression else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
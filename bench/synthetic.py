@@ -0,0 +1,286 @@
+"""
+Données synthétiques des tables sources, servies par SQLite.
+
+Les tables sont générées avec les colonnes, les volumes et les cardinalités
+des tables de l'usine : identifiants uniques, quelques milliers
+d'emplacements fonctionnels répartis sur les préfixes des centres de coût,
+quelques étapes et types, des dates réparties sur plusieurs années. Les
+tables d'événements (demandes, BT, pertes de temps) comptent chacune le
+nombre de lignes demandé ; les tables quotidiennes (production, eau) ont une
+ligne par jour et par secteur.
+
+Une base est générée une seule fois par nombre de lignes et réutilisée
+ensuite. La fonction connect remplace pyodbc (voir kpi_rol.pool.use_driver) :
+toutes les chaînes de connexion désignent la même base, où les tables sont
+aussi accessibles avec le préfixe 'dbo.'. Les colonnes de dates sont
+retournées en datetime, comme avec pyodbc.
+"""
+import os
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from kpi_rol.cost_centres import default_cost_centres
+
+# Répertoire des bases générées
+DATA_DIR = os.environ.get(
+    'KPI_ROL_BENCH_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+)
+# Nombre de lignes générées et insérées à la fois
+CHUNK_ROWS = 500_000
+# Graine des générateurs, pour des bases identiques d'une exécution à l'autre
+SEED = 2024
+# Période couverte par les données
+HISTORY_DAYS = 5 * 365
+# Premier jour des tables quotidiennes
+DAILY_START = datetime(2019, 1, 1)
+
+# Cardinalités des colonnes catégorielles
+N_LOCATIONS = 3000
+N_CAUSE_TYPES = 40
+N_ACTIONS = 500
+STAGES = ['OUVERT', 'PLANIF', 'APPROUVE', 'ENCOURS', 'ATTENTE', 'ANNULE', 'COMPLETE', 'FERMER']
+REQUEST_TYPES = ['Correctif', 'Préventif', 'Amélioration', 'Sécurité', 'Inspection']
+LOSS_NAMES = ['Non-Planifié', 'Planifié', 'Changement de grade', 'Bris de feuille']
+LOSS_NAME_WEIGHTS = [0.45, 0.25, 0.2, 0.1]
+SECTORS = ['M6', 'M7', 'M8', 'Finition A', 'Finition B']
+DAILY_SECTORS = ['Usine', 'M6', 'M7', 'M8']
+# Part des demandes qui sont des BT, et des demandes sans date de début
+BT_SHARE = 0.3
+MISSING_START_SHARE = 0.02
+
+TABLES = {
+    'ROLDynawayWorksheetKPIRequest': [
+        ('REQUESTID', 'TEXT'),
+        ('WORKORDER_ID', 'TEXT'),
+        ('FUNCTIONAL_LOCATION', 'TEXT'),
+        ('STAGEID', 'TEXT'),
+        ('ACTUALSTART', 'TIMESTAMP'),
+        ('REQUEST_TYPE', 'TEXT'),
+        ('CREATEDDATETIME', 'TIMESTAMP'),
+        ('MODIFIEDDATETIME', 'TIMESTAMP'),
+    ],
+    'ROLDynawayWorksheetAll': [
+        ('WORKORDER_ID', 'TEXT'),
+        ('FUNCTIONALLOCATIONID', 'TEXT'),
+        ('STAGEID', 'TEXT'),
+        ('CREATEDDATETIME', 'TIMESTAMP'),
+        ('MODIFIEDDATETIME', 'TIMESTAMP'),
+    ],
+    'vPerteTempsExtraction': [
+        ('DateDebut', 'TIMESTAMP'),
+        ('DureeSecondaire', 'REAL'),
+        ('Nom', 'TEXT'),
+        ('Secteur', 'TEXT'),
+        ('TypeCauses', 'TEXT'),
+        ('ActionsInterventions', 'TEXT'),
+    ],
+    'Daily Production': [
+        ('Date', 'TIMESTAMP'),
+        ('Secteur', 'TEXT'),
+        ('Production Nette (lb)', 'REAL'),
+        ('Production Brute (lb)', 'REAL'),
+    ],
+    'Water Consumption': [
+        ('Date', 'TIMESTAMP'),
+        ('Secteur', 'TEXT'),
+        ('Consommation (m3)', 'REAL'),
+    ],
+}
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def _adapt_datetime(value):
+    return value.strftime(TIMESTAMP_FORMAT)
+
+
+def _convert_timestamp(value):
+    return datetime.fromisoformat(value.decode())
+
+
+# Paramètres datetime écrits et colonnes TIMESTAMP relues comme par pyodbc
+sqlite3.register_adapter(datetime, _adapt_datetime)
+sqlite3.register_adapter(pd.Timestamp, _adapt_datetime)
+sqlite3.register_converter('TIMESTAMP', _convert_timestamp)
+
+
+def database_path(rows):
+    """
+    Retourne le chemin de la base synthétique d'une taille donnée.
+
+    Args:
+        rows (int): Le nombre de lignes des tables d'événements.
+
+    Returns:
+        str: Le chemin du fichier SQLite.
+    """
+    return os.path.join(DATA_DIR, f'kpi_rol_{rows}.sqlite')
+
+
+def _timestamps(rng, now, size):
+    seconds = rng.integers(0, HISTORY_DAYS * 24 * 60 * 60, size)
+    return pd.Series(now - pd.to_timedelta(seconds, unit='s'))
+
+
+def _text(values):
+    # Dates au format de la base, None pour les valeurs manquantes
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.dt.strftime(TIMESTAMP_FORMAT).astype(object).where(values.notna(), None)
+    return values
+
+
+def _locations(rng):
+    prefixes = sorted(default_cost_centres().prefixes)
+    chosen = rng.choice(prefixes, N_LOCATIONS)
+    return np.array([f'{prefix}-{index:05d}' for index, prefix in enumerate(chosen)])
+
+
+def _requests(rng, now, start, size, locations):
+    ids = np.arange(start, start + size)
+    created = _timestamps(rng, now, size)
+    actual_start = created + pd.to_timedelta(rng.integers(0, 14 * 24 * 60 * 60, size), unit='s')
+    actual_start = actual_start.where(rng.random(size) >= MISSING_START_SHARE)
+    is_bt = rng.random(size) < BT_SHARE
+    return pd.DataFrame({
+        'REQUESTID': pd.Series(ids).map('RQ-{:09d}'.format),
+        'WORKORDER_ID': np.where(is_bt, 'BT-', 'RT-') + pd.Series(ids).map('{:09d}'.format),
+        'FUNCTIONAL_LOCATION': rng.choice(locations, size),
+        'STAGEID': rng.choice(STAGES, size),
+        'ACTUALSTART': actual_start,
+        'REQUEST_TYPE': rng.choice(REQUEST_TYPES, size),
+        'CREATEDDATETIME': created,
+        'MODIFIEDDATETIME': created + pd.to_timedelta(rng.integers(0, 30 * 24 * 60 * 60, size), unit='s'),
+    })
+
+
+def _work_orders(rng, now, start, size, locations):
+    created = _timestamps(rng, now, size)
+    return pd.DataFrame({
+        'WORKORDER_ID': pd.Series(np.arange(start, start + size)).map('BT-{:09d}'.format),
+        'FUNCTIONALLOCATIONID': rng.choice(locations, size),
+        'STAGEID': rng.choice(STAGES, size),
+        'CREATEDDATETIME': created,
+        'MODIFIEDDATETIME': created + pd.to_timedelta(rng.integers(0, 30 * 24 * 60 * 60, size), unit='s'),
+    })
+
+
+def _losses(rng, now, start, size):
+    cause_types = [f'Cause {index:02d}' for index in range(N_CAUSE_TYPES)]
+    actions = [f'Intervention {index:03d}' for index in range(N_ACTIONS)]
+    return pd.DataFrame({
+        'DateDebut': _timestamps(rng, now, size),
+        # Durées en secondes : surtout courtes, quelques arrêts de plusieurs heures
+        'DureeSecondaire': rng.lognormal(mean=6.0, sigma=1.2, size=size).round(1),
+        'Nom': rng.choice(LOSS_NAMES, size, p=LOSS_NAME_WEIGHTS),
+        'Secteur': rng.choice(SECTORS, size),
+        'TypeCauses': rng.choice(cause_types, size),
+        'ActionsInterventions': rng.choice(actions, size),
+    })
+
+
+def _daily(rng, now):
+    days = pd.date_range(DAILY_START, now.normalize(), freq='D')
+    dates = np.repeat(days, len(DAILY_SECTORS))
+    sectors = np.tile(DAILY_SECTORS, len(days))
+    size = len(dates)
+    net = rng.normal(1_500_000, 200_000, size).round()
+    production = pd.DataFrame({
+        'Date': dates,
+        'Secteur': sectors,
+        'Production Nette (lb)': net,
+        'Production Brute (lb)': (net * rng.uniform(1.02, 1.1, size)).round(),
+    })
+    water = pd.DataFrame({
+        'Date': dates,
+        'Secteur': sectors,
+        'Consommation (m3)': rng.normal(25_000, 3_000, size).round(1),
+    })
+    return production, water
+
+
+def _insert(conn, table, df):
+    columns = ', '.join(f'"{column}"' for column, _ in TABLES[table])
+    markers = ', '.join('?' for _ in TABLES[table])
+    df = df.assign(**{column: _text(df[column]) for column in df.columns})
+    conn.executemany(
+        f'INSERT INTO "{table}" ({columns}) VALUES ({markers})',
+        df.itertuples(index=False, name=None),
+    )
+
+
+def generate(rows, path=None):
+    """
+    Génère une base synthétique.
+
+    Args:
+        rows (int): Le nombre de lignes de chaque table d'événements.
+        path (str, optional): Le fichier SQLite à créer. Par défaut, voir database_path.
+
+    Returns:
+        str: Le chemin de la base générée.
+    """
+    path = path or database_path(rows)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = path + '.partial'
+    if os.path.exists(partial):
+        os.remove(partial)
+    rng = np.random.default_rng(SEED)
+    # Dates relatives au jour de génération, comme les données récentes de l'usine
+    now = pd.Timestamp.now().floor('s')
+    locations = _locations(rng)
+    conn = sqlite3.connect(partial)
+    try:
+        for table, columns in TABLES.items():
+            definition = ', '.join(f'"{column}" {kind}' for column, kind in columns)
+            conn.execute(f'CREATE TABLE "{table}" ({definition})')
+        for start in range(0, rows, CHUNK_ROWS):
+            size = min(CHUNK_ROWS, rows - start)
+            _insert(conn, 'ROLDynawayWorksheetKPIRequest', _requests(rng, now, start, size, locations))
+            _insert(conn, 'ROLDynawayWorksheetAll', _work_orders(rng, now, start, size, locations))
+            _insert(conn, 'vPerteTempsExtraction', _losses(rng, now, start, size))
+            conn.commit()
+        production, water = _daily(rng, now)
+        _insert(conn, 'Daily Production', production)
+        _insert(conn, 'Water Consumption', water)
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(partial, path)
+    return path
+
+
+def ensure_database(rows):
+    """
+    Retourne la base synthétique d'une taille donnée, générée au besoin.
+
+    Args:
+        rows (int): Le nombre de lignes de chaque table d'événements.
+
+    Returns:
+        str: Le chemin de la base.
+    """
+    path = database_path(rows)
+    if not os.path.exists(path):
+        generate(rows, path)
+    return path
+
+
+def connector(path):
+    """
+    Crée une fonction d'ouverture de connexions à une base synthétique.
+
+    Args:
+        path (str): Le fichier SQLite.
+
+    Returns:
+        callable: Fonction connect(connection_string) utilisable avec
+            kpi_rol.pool.use_driver ; la chaîne de connexion est ignorée.
+    """
+    def connect(connection_string):
+        conn = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+        conn.execute("ATTACH DATABASE ? AS dbo", (path,))
+        return conn
+    return connect
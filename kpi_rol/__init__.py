@@ -0,0 +1,8 @@
+"""
+Utilitaires partagés du tableau de bord des KPIs de Papier Rolland.
+
+Les objets définis dans ce paquet vivent au niveau du processus : contrairement
+au script Streamlit, qui est réexécuté à chaque interaction, un module importé
+n'est chargé qu'une seule fois et conserve son état entre les réexécutions et
+entre les sessions.
+"""
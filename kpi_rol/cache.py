@@ -0,0 +1,284 @@
+"""
+Cache des résultats de requêtes SQL.
+
+Les résultats sont indexés par la chaîne de connexion, le texte de la requête
+et ses paramètres, expirent selon une durée de vie (TTL) choisie par
+l'appelant et sont évincés du moins récemment utilisé au plus récent lorsque
+la mémoire occupée dépasse la limite configurée.
+
+Le cache est partagé par toutes les sessions du processus : les DataFrames
+qu'il contient ne doivent pas être modifiés. Les lectures simultanées d'une
+même requête sont regroupées (SingleFlight) : une seule est exécutée, les
+autres attendent son résultat. Les valeurs dérivées d'un DataFrame partagé
+(cubes, pyramides de résolutions...) sont conservées tant que ce DataFrame
+existe (FrameMemo).
+"""
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# Limite par défaut de la mémoire occupée par le cache (512 Mo)
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class CacheEntry:
+    """
+    Résultat mis en cache pour une requête.
+
+    Attributes:
+        df (pd.DataFrame): Le résultat de la requête.
+        loaded_at (float): Instant du chargement (horloge monotone).
+        loaded_wall (float): Instant du chargement (horodatage Unix).
+        nbytes (int): Taille estimée du DataFrame en mémoire.
+    """
+
+    __slots__ = ('df', 'loaded_at', 'loaded_wall', 'nbytes')
+
+    def __init__(self, df):
+        self.df = df
+        self.loaded_at = time.monotonic()
+        self.loaded_wall = time.time()
+        self.nbytes = int(df.memory_usage(index=True, deep=True).sum())
+
+    def age(self):
+        """
+        Retourne l'âge de l'entrée en secondes.
+        """
+        return time.monotonic() - self.loaded_at
+
+
+class QueryCache:
+    """
+    Cache LRU borné en mémoire des DataFrames retournés par les requêtes.
+
+    Args:
+        max_bytes (int): Mémoire maximale occupée par les résultats en cache.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(connection_string, query, params=None):
+        """
+        Construit la clé de cache d'une requête.
+
+        Args:
+            connection_string (str): La chaîne de connexion à la base de données.
+            query (str): La requête SQL.
+            params (list, optional): Les paramètres de la requête.
+
+        Returns:
+            tuple: La clé de cache.
+        """
+        return (connection_string, query, tuple(params) if params else ())
+
+    def get(self, connection_string, query, ttl, params=None):
+        """
+        Retourne le résultat en cache d'une requête s'il est encore valide.
+
+        Args:
+            connection_string (str): La chaîne de connexion à la base de données.
+            query (str): La requête SQL.
+            ttl (float): Durée de vie maximale du résultat, en secondes.
+            params (list, optional): Les paramètres de la requête.
+
+        Returns:
+            pd.DataFrame: Le résultat en cache, ou None s'il est absent ou expiré.
+        """
+        key = self.make_key(connection_string, query, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            # Un résultat expiré est conservé : il peut être servi en attendant
+            # son actualisation (voir get_stale)
+            if entry is None or entry.age() > ttl:
+                return None
+            self._entries.move_to_end(key)
+            return entry.df
+
+    def get_stale(self, connection_string, query, params=None):
+        """
+        Retourne le résultat en cache d'une requête, même expiré.
+
+        Args:
+            connection_string (str): La chaîne de connexion à la base de données.
+            query (str): La requête SQL.
+            params (list, optional): Les paramètres de la requête.
+
+        Returns:
+            pd.DataFrame: Le résultat en cache, ou None s'il est absent.
+        """
+        key = self.make_key(connection_string, query, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry.df
+
+    def put(self, connection_string, query, df, params=None):
+        """
+        Ajoute ou remplace le résultat d'une requête dans le cache.
+
+        Les entrées les moins récemment utilisées sont évincées tant que la
+        mémoire occupée dépasse la limite. Un résultat plus gros que la limite
+        n'est pas conservé.
+
+        Args:
+            connection_string (str): La chaîne de connexion à la base de données.
+            query (str): La requête SQL.
+            df (pd.DataFrame): Le résultat de la requête.
+            params (list, optional): Les paramètres de la requête.
+        """
+        key = self.make_key(connection_string, query, params)
+        entry = CacheEntry(df)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if entry.nbytes > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self._total_bytes += entry.nbytes
+            while self._total_bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+
+    def invalidate(self, connection_string=None):
+        """
+        Supprime les résultats en cache d'une source de données.
+
+        Args:
+            connection_string (str, optional): La chaîne de connexion dont les
+                résultats doivent être supprimés. Si None, tout le cache est vidé.
+        """
+        with self._lock:
+            keys = [
+                key for key in self._entries
+                if connection_string is None or key[0] == connection_string
+            ]
+            for key in keys:
+                self._remove(key)
+
+    def last_loaded(self, connection_string):
+        """
+        Retourne l'horodatage du chargement le plus récent pour une source.
+
+        Args:
+            connection_string (str): La chaîne de connexion à la base de données.
+
+        Returns:
+            float: Horodatage Unix du dernier chargement, ou None.
+        """
+        with self._lock:
+            times = [
+                entry.loaded_wall for key, entry in self._entries.items()
+                if key[0] == connection_string
+            ]
+        return max(times) if times else None
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._total_bytes -= entry.nbytes
+
+
+class SingleFlight:
+    """
+    Regroupement des appels simultanés portant sur une même clé.
+
+    Pendant qu'un appel est en cours pour une clé, les appels suivants pour la
+    même clé n'exécutent rien et reçoivent son résultat (ou son erreur).
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        """
+        Exécute une fonction, ou attend l'exécution en cours pour la même clé.
+
+        Args:
+            key (hashable): La clé identifiant l'appel.
+            func (callable): La fonction sans argument à exécuter.
+
+        Returns:
+            Le résultat de l'exécution, partagé par tous les appelants.
+
+        Raises:
+            Exception: L'erreur levée par l'exécution, pour tous les appelants.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+        if not leader:
+            return future.result()
+        try:
+            result = func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+class FrameMemo:
+    """
+    Valeurs dérivées de DataFrames, calculées une seule fois par DataFrame.
+
+    Les valeurs sont conservées tant que le DataFrame existe : un jeu servi
+    depuis le cache de requêtes n'est traité qu'une fois, quel que soit le
+    nombre de rendus. Les DataFrames n'étant pas hachables, ils sont suivis
+    par leur identifiant et une référence faible.
+    """
+
+    def __init__(self):
+        # id(df) -> (référence faible, {clé: valeur})
+        self._entries = {}
+        # Réentrant : une référence faible peut expirer pendant que le verrou est détenu
+        self._lock = threading.RLock()
+
+    def get(self, df, key, build):
+        """
+        Retourne la valeur dérivée d'un DataFrame, calculée au premier appel.
+
+        Args:
+            df (pd.DataFrame): Le DataFrame, qui ne doit pas être modifié.
+            key (hashable): La valeur demandée (ex. la définition d'un cube).
+            build (callable): Fonction sans argument qui calcule la valeur.
+
+        Returns:
+            La valeur dérivée.
+        """
+        frame_id = id(df)
+        with self._lock:
+            entry = self._entries.get(frame_id)
+            if entry is None or entry[0]() is not df:
+                def forget(ref, frame_id=frame_id):
+                    with self._lock:
+                        if frame_id in self._entries and self._entries[frame_id][0] is ref:
+                            del self._entries[frame_id]
+                entry = (weakref.ref(df, forget), {})
+                self._entries[frame_id] = entry
+            value = entry[1].get(key)
+        if value is None:
+            value = build()
+            with self._lock:
+                entry[1][key] = value
+        return value
+
+
+# Instances partagées par toutes les sessions du processus Streamlit
+query_cache = QueryCache()
+single_flight = SingleFlight()
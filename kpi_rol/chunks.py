@@ -0,0 +1,88 @@
+"""
+Lecture par lots des résultats volumineux.
+
+Les lignes sont converties en colonnes typées (catégories, dates, numériques)
+au fur et à mesure de leur arrivée, de sorte que la mémoire de pointe dépende
+de la taille d'un lot et non de celle de la table. Les agrégations simples
+peuvent consommer les lots directement, sans jamais assembler la table.
+"""
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# Nombre de lignes lues par lot
+DEFAULT_CHUNKSIZE = 50_000
+
+
+def concat_chunks(chunks):
+    """
+    Assemble des lots typés en un seul DataFrame.
+
+    Les colonnes catégorielles reçoivent l'union des catégories de tous les
+    lots, afin de rester catégorielles après l'assemblage. Lorsque les lots
+    diffèrent, cette union est triée, comme les catégories d'une lecture d'un
+    seul bloc.
+
+    Args:
+        chunks (iterable): Les lots (pd.DataFrame) ayant les mêmes colonnes.
+
+    Returns:
+        pd.DataFrame: Le DataFrame assemblé.
+    """
+    chunks = list(chunks)
+    if len(chunks) == 1:
+        return chunks[0]
+    categorical = [
+        column for column in chunks[0].columns
+        if isinstance(chunks[0][column].dtype, pd.CategoricalDtype)
+    ]
+    for column in categorical:
+        if len({chunk[column].dtype for chunk in chunks}) == 1:
+            continue
+        categories = union_categoricals(
+            [chunk[column] for chunk in chunks], sort_categories=True, ignore_order=True
+        ).categories
+        chunks = [
+            chunk.assign(**{column: chunk[column].cat.set_categories(categories)})
+            for chunk in chunks
+        ]
+    return pd.concat(chunks, ignore_index=True)
+
+
+
+# Combinaison des résultats partiels de chaque fonction d'agrégation
+_COMBINE = {'sum': 'sum', 'count': 'sum', 'size': 'sum', 'min': 'min', 'max': 'max'}
+
+
+def aggregate_chunks(chunks, by, **aggregations):
+    """
+    Agrège des lots sans les assembler.
+
+    Chaque lot est agrégé séparément, puis les résultats partiels sont
+    combinés. Seules les agrégations décomposables sont acceptées.
+
+    Args:
+        chunks (iterable): Les lots à agréger.
+        by (list): Les colonnes de regroupement.
+        **aggregations: Agrégations nommées, sous la forme
+            nom=(colonne, fonction) avec fonction parmi 'sum', 'count',
+            'size', 'min' et 'max'.
+
+    Returns:
+        pd.DataFrame: Le résultat agrégé, indexé par les colonnes de regroupement.
+
+    Raises:
+        ValueError: Si une fonction d'agrégation n'est pas décomposable.
+    """
+    for name, (_, function) in aggregations.items():
+        if function not in _COMBINE:
+            raise ValueError(f"L'agrégation '{function}' de '{name}' ne peut pas être calculée par lots.")
+    partials = [chunk.groupby(by, observed=True).agg(**aggregations) for chunk in chunks]
+    # Sans aucune ligne, le résultat vide d'un lot garde les colonnes de regroupement
+    partials = [partial for partial in partials if not partial.empty] or partials[-1:]
+    if not partials:
+        return pd.DataFrame(columns=list(aggregations))
+    # Les catégories des colonnes de regroupement sont réunies, comme à l'assemblage des lots
+    combined = concat_chunks([partial.reset_index() for partial in partials])
+    return combined.groupby(by, observed=True).agg(
+        {name: _COMBINE[function] for name, (_, function) in aggregations.items()}
+    )
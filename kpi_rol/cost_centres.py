@@ -0,0 +1,151 @@
+"""
+Correspondance entre emplacements fonctionnels et centres de coût.
+
+La table des préfixes et la hiérarchie des centres (zones M6, M7, M8 et leurs
+préparations des pâtes) sont des données, lues dans un fichier JSON :
+kpi_rol/cost_centres.json par défaut, ou le fichier désigné par la variable
+d'environnement KPI_ROL_COST_CENTRES.
+
+La correspondance est calculée une seule fois par emplacement distinct, puis
+appliquée à toutes les lignes par indexation des codes catégoriels : le coût
+par ligne ne dépend pas de la longueur des chaînes.
+"""
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Fichier de configuration par défaut
+CONFIG_PATH = os.environ.get(
+    'KPI_ROL_COST_CENTRES',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cost_centres.json'),
+)
+
+
+class CostCentres:
+    """
+    Table de correspondance des centres de coût.
+
+    Un emplacement est associé au centre du plus long préfixe connu par lequel
+    il commence.
+
+    Args:
+        prefixes (dict): Le centre de coût de chaque préfixe d'emplacement.
+        areas (dict, optional): Les centres de coût de chaque zone.
+    """
+
+    def __init__(self, prefixes, areas=None):
+        self.prefixes = dict(prefixes)
+        self.areas = {area: list(centres) for area, centres in (areas or {}).items()}
+        self._lengths = sorted({len(prefix) for prefix in self.prefixes}, reverse=True)
+        self.centres = pd.CategoricalDtype(sorted(set(self.prefixes.values())))
+        # Code du centre de chaque emplacement déjà rencontré
+        self._memo = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Lit une table de correspondance dans un fichier JSON.
+
+        Le fichier contient un objet 'prefixes' (préfixe -> centre de coût) et,
+        facultativement, un objet 'areas' (zone -> liste de centres de coût).
+
+        Args:
+            path (str): Le chemin du fichier.
+
+        Returns:
+            CostCentres: La table lue.
+        """
+        with open(path, encoding='utf-8') as f:
+            config = json.load(f)
+        return cls(config['prefixes'], config.get('areas'))
+
+    def centre_of(self, location):
+        """
+        Retourne le centre de coût d'un emplacement fonctionnel.
+
+        Args:
+            location (str): L'emplacement fonctionnel.
+
+        Returns:
+            str: Le centre de coût, ou None si aucun préfixe ne correspond.
+        """
+        if not isinstance(location, str):
+            return None
+        for length in self._lengths:
+            centre = self.prefixes.get(location[:length])
+            if centre is not None:
+                return centre
+        return None
+
+    def _codes(self, locations):
+        # Codes des centres (-1 si inconnu) des emplacements distincts
+        with self._lock:
+            missing = [location for location in locations if location not in self._memo]
+            for location in missing:
+                centre = self.centre_of(location)
+                self._memo[location] = -1 if centre is None else self.centres.categories.get_loc(centre)
+            return np.array([self._memo[location] for location in locations], dtype=np.int32)
+
+    def map(self, locations):
+        """
+        Associe son centre de coût à chaque emplacement d'une colonne.
+
+        Args:
+            locations (pd.Series): Les emplacements fonctionnels.
+
+        Returns:
+            pd.Series: Les centres de coût (catégoriels ; manquants si inconnus).
+        """
+        if isinstance(locations.dtype, pd.CategoricalDtype):
+            codes, uniques = locations.cat.codes.to_numpy(), locations.cat.categories
+        else:
+            codes, uniques = pd.factorize(locations)
+        # Le code -1 (valeur manquante) désigne le dernier élément : un centre inconnu
+        lookup = np.append(self._codes(list(uniques)), np.int32(-1))
+        centres = pd.Categorical.from_codes(lookup[codes], dtype=self.centres)
+        return pd.Series(centres, index=locations.index, name=locations.name)
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_cost_centres():
+    """
+    Retourne la table de correspondance partagée, lue au premier appel.
+
+    Returns:
+        CostCentres: La table lue dans CONFIG_PATH.
+    """
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = CostCentres.from_file(CONFIG_PATH)
+        return _default
+
+
+def map_cost_centres(location_column, cost_centres=None):
+    """
+    Crée une transformation qui ajoute la colonne 'Centre de coût'.
+
+    Si la colonne d'emplacement est absente, le DataFrame est retourné tel quel.
+
+    Args:
+        location_column (str): La colonne de l'emplacement fonctionnel
+            (ex. 'FUNCTIONAL_LOCATION' ou 'FUNCTIONALLOCATIONID').
+        cost_centres (CostCentres, optional): La table de correspondance. Par
+            défaut, la table partagée.
+
+    Returns:
+        callable: La transformation df -> df.
+    """
+    def transform(df):
+        if location_column not in df.columns:
+            return df
+        table = cost_centres or default_cost_centres()
+        return df.assign(**{'Centre de coût': table.map(df[location_column])})
+    return transform
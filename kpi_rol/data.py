@@ -0,0 +1,268 @@
+"""
+Couche d'accès aux données du tableau de bord.
+
+Chaque source est déclarée une seule fois (table, colonnes, filtres permanents,
+transformations). Les transformations sont appliquées une seule fois par jeu
+de données chargé, et le résultat est mis en cache. Au cours d'un même rendu,
+une demande dont le résultat est contenu dans celui d'une demande précédente
+est dérivée localement au lieu d'interroger à nouveau la base.
+
+Les sections reçoivent des copies superficielles : grâce au mode copy-on-write
+de pandas, elles peuvent les modifier sans altérer le jeu partagé et sans
+recopier les données.
+"""
+import threading
+
+import pandas as pd
+
+from kpi_rol.downsample import pyramid_of
+from kpi_rol.query import apply_filters, build_fingerprint, build_select, filters_cover
+from kpi_rol.rollups import cube_of
+from kpi_rol.schemas import schema_for
+from kpi_rol.sync import get_incremental_table
+from kpi_rol.transforms import chain, sort_by
+
+if int(pd.__version__.split('.')[0]) < 3:
+    # Toujours actif à partir de pandas 3.0
+    pd.set_option('mode.copy_on_write', True)
+
+
+class DataSource:
+    """
+    Déclaration d'une source de données.
+
+    Args:
+        name (str): Nom unique de la source.
+        connection_string (str): La chaîne de connexion à la base de données.
+        table (str): Le nom qualifié de la table ou de la vue.
+        columns (list, optional): Les colonnes à lire. Si None, toutes les colonnes.
+        filters (list): Filtres permanents appliqués côté serveur.
+        transform (callable, optional): Transformation appliquée au résultat brut.
+        ttl (float, optional): Durée de vie du résultat en cache, en secondes.
+        key (str, optional): Clé de fusion ; si fournie, la table est
+            synchronisée de façon incrémentale (voir kpi_rol.sync).
+        dtypes (dict, optional): Types cibles des colonnes, appliqués dès la
+            lecture (voir kpi_rol.transforms.apply_dtypes). Par défaut, ceux
+            déclarés pour la table dans kpi_rol.schemas.
+        chunksize (int, optional): Si fourni, les résultats sont lus par lots
+            de cette taille (voir kpi_rol.db.iter_query).
+        order_by (str, optional): Colonne de dates selon laquelle les lignes
+            chargées sont triées, pour le filtrage par plage de dates
+            (voir kpi_rol.dates.date_window).
+        rollups (dict, optional): Cubes d'agrégats quotidiens de la source, par
+            nom (voir kpi_rol.rollups.DailyRollup).
+        fingerprint (list, optional): Expressions SQL d'agrégat dont les
+            valeurs changent avec le contenu de la table (ex. 'COUNT_BIG(*)',
+            'MAX([Date])') ; si fournies, une source non synchronisée n'est
+            relue que lorsque cette empreinte a changé (voir
+            kpi_rol.db.read_query).
+    """
+
+    def __init__(
+        self,
+        name,
+        connection_string,
+        table,
+        columns=None,
+        filters=(),
+        transform=None,
+        ttl=None,
+        key=None,
+        dtypes=None,
+        chunksize=None,
+        order_by=None,
+        rollups=None,
+        fingerprint=None,
+    ):
+        self.name = name
+        self.connection_string = connection_string
+        self.table = table
+        self.columns = columns
+        self.filters = list(filters)
+        self.transform = transform
+        self.ttl = ttl
+        self.key = key
+        self.dtypes = schema_for(table) if dtypes is None else dtypes
+        self.chunksize = chunksize
+        self.order_by = order_by
+        self.rollups = dict(rollups or {})
+        self.fingerprint = list(fingerprint) if fingerprint else None
+
+    @property
+    def incremental(self):
+        """
+        Indique si la source est synchronisée de façon incrémentale.
+        """
+        return self.key is not None
+
+    def incremental_table(self):
+        """
+        Retourne la table synchronisée partagée de la source.
+
+        Returns:
+            IncrementalTable: La copie locale de la table.
+        """
+        return get_incremental_table(
+            self.connection_string,
+            self.table,
+            key=self.key,
+            columns=self.columns,
+            filters=self.filters,
+            transform=self.transform,
+            order_by=self.order_by,
+            rollups=self.rollups,
+        )
+
+
+class DataAccess:
+    """
+    Point d'accès aux sources pour un rendu de la page.
+
+    Les lectures peuvent être lancées depuis plusieurs fils d'exécution.
+
+    Args:
+        execute (callable): Fonction ayant la signature de kpi_rol.db.read_query,
+            qui exécute une requête et retourne un DataFrame ; en cas d'échec,
+            elle lève une exception ou retourne None.
+    """
+
+    def __init__(self, execute):
+        self._execute = execute
+        # Jeux déjà obtenus pendant ce rendu : nom de source -> [(filtres, df)]
+        self._loaded = {}
+        self._lock = threading.Lock()
+
+    def load(self, source, filters=(), scheduled=None):
+        """
+        Retourne les lignes d'une source qui satisfont des filtres.
+
+        Args:
+            source (DataSource): La source à lire.
+            filters (list): Filtres propres à la section (ex. sélections des widgets).
+            scheduled (bool, optional): Si True, le résultat est aussi relu par
+                l'actualisation planifiée de la source et enregistré pour le
+                mode hors ligne (voir kpi_rol.db.read_query). Par défaut, seule
+                la lecture sans filtre propre l'est ; à réserver aux filtres
+                fixes d'une section, et non aux sélections des widgets.
+
+        Returns:
+            pd.DataFrame: Une vue des lignes demandées, ou None en cas d'échec.
+        """
+        df = self._frame(source, list(filters), scheduled)
+        return None if df is None else df.copy(deep=False)
+
+    def rollup(self, source, name, filters=()):
+        """
+        Retourne un cube d'agrégats quotidiens d'une source.
+
+        Pour une source synchronisée, le cube est tenu à jour avec la copie
+        locale et les filtres s'appliquent aux lignes du cube (ils doivent donc
+        porter sur ses colonnes). Sinon, le cube est construit une seule fois
+        pour le jeu de lignes que retournerait load(source, filters).
+
+        Args:
+            source (DataSource): La source.
+            name (str): Le nom du cube dans source.rollups.
+            filters (list): Les filtres à appliquer.
+
+        Returns:
+            pd.DataFrame: Le cube, ou None en cas d'échec du chargement.
+        """
+        filters = list(filters)
+        if source.incremental:
+            if self._frame(source, []) is None:
+                return None
+            cube = source.incremental_table().cube(name)
+            return None if cube is None else apply_filters(cube, filters)
+        df = self._frame(source, filters)
+        return None if df is None else cube_of(source.rollups[name], df)
+
+    def pyramid(self, source, filters=()):
+        """
+        Retourne la pyramide de résolutions d'une source indexée par date.
+
+        La pyramide est construite une seule fois pour le jeu de lignes que
+        retournerait load(source, filters) (voir kpi_rol.downsample).
+
+        Args:
+            source (DataSource): Une source dont les lignes sont indexées par
+                date (ex. transformation index_by_date).
+            filters (list): Les filtres à appliquer.
+
+        Returns:
+            SeriesPyramid: La pyramide, ou None en cas d'échec du chargement.
+        """
+        df = self._frame(source, list(filters))
+        return None if df is None else pyramid_of(df)
+
+    def _frame(self, source, filters, scheduled=None):
+        # Jeu de lignes partagé par les sections, à ne pas modifier
+        with self._lock:
+            loaded = list(self._loaded.get(source.name, []))
+        for loaded_filters, df in loaded:
+            if filters_cover(loaded_filters, filters):
+                if filters_cover(filters, loaded_filters):
+                    # Mêmes lignes : le jeu est servi tel quel, pour que les valeurs
+                    # qui en sont dérivées (cubes, pyramides) soient réutilisées
+                    return df
+                return apply_filters(df, filters)
+        df = self._fetch(source, filters, not filters if scheduled is None else scheduled)
+        if df is None:
+            return None
+        with self._lock:
+            self._loaded.setdefault(source.name, []).append((filters, df))
+        return df
+
+    def refresh(self, source):
+        """
+        Met à jour immédiatement la copie locale d'une source synchronisée.
+
+        Destinée aux actualisations planifiées (voir kpi_rol.scheduler) : les
+        rendus continuent de servir l'ancienne copie jusqu'à son remplacement.
+
+        Args:
+            source (DataSource): Une source synchronisée (avec une clé).
+        """
+        source.incremental_table().load(self._fetcher(source), min_interval=0)
+
+    def _fetcher(self, source):
+        def fetch(query, params):
+            return self._execute(
+                query,
+                source.connection_string,
+                params=params,
+                tag=source.name,
+                chunksize=source.chunksize,
+                dtypes=source.dtypes,
+            )
+        return fetch
+
+    def _fetch(self, source, filters, scheduled):
+        if source.incremental:
+            # La copie locale est complète : les filtres sont appliqués localement.
+            # Une copie existante est servie sans attendre sa mise à jour.
+            df = source.incremental_table().load(
+                self._fetcher(source), min_interval=source.ttl or 0, wait=False
+            )
+            return None if df is None else apply_filters(df, filters)
+
+        # Le résultat est mis en cache après transformation et tri
+        transform = source.transform
+        if source.order_by is not None:
+            transform = chain(*filter(None, [transform, sort_by(source.order_by)]))
+        query, params = build_select(source.table, source.columns, source.filters + filters)
+        probe = None
+        if source.fingerprint is not None:
+            probe = build_fingerprint(source.table, source.fingerprint, source.filters + filters)
+        return self._execute(
+            query,
+            source.connection_string,
+            ttl=source.ttl,
+            params=params or None,
+            transform=transform,
+            tag=source.name,
+            chunksize=source.chunksize,
+            dtypes=source.dtypes,
+            probe=probe,
+            scheduled=scheduled,
+        )
@@ -0,0 +1,88 @@
+"""
+Filtrage des DataFrames par plage de dates.
+
+Les comparaisons portent directement sur les valeurs datetime64, sans convertir
+chaque ligne en objet date Python. Lorsque les valeurs sont triées (index trié,
+ou colonne triée par la transformation kpi_rol.transforms.sort_by), la plage
+est trouvée par recherche dichotomique et extraite par tranche : déplacer un
+curseur coûte O(log n) plus la taille du résultat au lieu d'un parcours complet.
+
+L'ordre d'une colonne est vérifié une fois par DataFrame et par colonne, puis
+mémorisé tant que le DataFrame existe.
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from kpi_rol.cache import FrameMemo
+
+# Ordre des colonnes de dates, par DataFrame
+_sorted_columns = FrameMemo()
+
+
+def day_bounds(start, end):
+    """
+    Convertit une plage de jours inclusive en bornes d'horodatage.
+
+    Args:
+        start (date): Le premier jour de la plage (ou None).
+        end (date): Le dernier jour de la plage, inclus (ou None).
+
+    Returns:
+        tuple: La borne de début (incluse) et la borne de fin (exclue), en
+            datetime (utilisables comme paramètres de requête), ou None pour
+            une borne absente.
+    """
+    start = None if start is None else datetime.combine(start, datetime.min.time())
+    end = None if end is None else datetime.combine(end + timedelta(days=1), datetime.min.time())
+    return start, end
+
+
+def _sorted_missing_last(values):
+    # Dates croissantes suivies des seules dates manquantes, comme après sort_by
+    missing = values.isna().to_numpy()
+    present = len(missing) - int(missing.sum())
+    return not missing[:present].any() and values.iloc[:present].is_monotonic_increasing
+
+
+def _is_sorted(df, column):
+    if column is None:
+        # Le résultat est mis en cache par l'index lui-même
+        return df.index.is_monotonic_increasing
+    return _sorted_columns.get(df, column, lambda: bool(_sorted_missing_last(df[column])))
+
+
+def date_window(df, start, end, column=None):
+    """
+    Sélectionne les lignes dont la date tombe dans une plage de jours.
+
+    Les lignes sans date sont écartées. Les bornes sont des jours entiers : le
+    jour de fin est inclus en entier.
+
+    Args:
+        df (pd.DataFrame): Le DataFrame à filtrer, qui ne doit pas être
+            modifié ensuite (l'ordre de ses colonnes est mémorisé).
+        start (date): Le premier jour de la plage (ou None).
+        end (date): Le dernier jour de la plage, inclus (ou None).
+        column (str, optional): La colonne de dates. Si None, l'index.
+
+    Returns:
+        pd.DataFrame: Les lignes de la plage, dans leur ordre d'origine.
+    """
+    start, end = day_bounds(start, end)
+    values = df.index if column is None else df[column]
+
+    if _is_sorted(df, column):
+        # Les dates manquantes sont placées en fin de tri : la tranche les exclut
+        dates = values.to_numpy()
+        first = 0 if start is None else dates.searchsorted(np.datetime64(start))
+        last = dates.searchsorted(np.datetime64('NaT' if end is None else end))
+        return df.iloc[first:max(first, last)]
+
+    mask = pd.Series(values.notna(), index=df.index)
+    if start is not None:
+        mask &= values >= start
+    if end is not None:
+        mask &= values < end
+    return df[mask]
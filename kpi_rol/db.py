@@ -0,0 +1,325 @@
+"""
+Exécution des requêtes SQL, sans dépendance à l'interface Streamlit.
+
+Les fonctions de ce module lèvent les erreurs au lieu de les afficher, ce qui
+permet de les appeler depuis des fils d'exécution secondaires.
+"""
+import logging
+import threading
+import time
+from collections import namedtuple
+
+import pandas as pd
+
+from kpi_rol import loader, metrics, snapshots
+from kpi_rol.cache import query_cache, single_flight
+from kpi_rol.chunks import DEFAULT_CHUNKSIZE, concat_chunks
+from kpi_rol.pool import get_pool
+from kpi_rol.transforms import apply_dtypes
+
+logger = logging.getLogger(__name__)
+
+# Paramètres d'une lecture, conservés pour pouvoir la relancer en arrière-plan
+_Request = namedtuple(
+    '_Request',
+    'query connection_string ttl params transform chunksize dtypes cache_query tag probe scheduled',
+)
+
+# Requêtes déjà lues depuis la base par ce processus
+_fetched = set()
+# Requêtes en cours d'actualisation en arrière-plan
+_refreshing = set()
+# Dernière empreinte connue du résultat de chaque requête : nom d'instantané -> valeurs
+_fingerprints = {}
+# Requêtes mises en cache, par étiquette, pour les actualisations planifiées :
+# étiquette -> {nom d'instantané: _Request}
+_cached_requests = {}
+# Dernière lecture de chaque requête planifiée (horloge monotone) : nom d'instantané -> instant
+_last_read = {}
+_state_lock = threading.Lock()
+
+
+def iter_query(query, connection_string, params=None, chunksize=DEFAULT_CHUNKSIZE, dtypes=None):
+    """
+    Exécute une requête et en retourne le résultat par lots typés.
+
+    La connexion est empruntée au bassin pendant toute la lecture. Si aucune
+    ligne n'est retournée, un seul lot vide (avec les colonnes) est produit.
+
+    Args:
+        query (str): La requête SQL à exécuter.
+        connection_string (str): La chaîne de connexion à la base de données.
+        params (list, optional): Les paramètres de la requête (marqueurs '?').
+        chunksize (int): Nombre de lignes par lot.
+        dtypes (dict, optional): Types cibles des colonnes (voir apply_dtypes).
+
+    Yields:
+        pd.DataFrame: Les lots successifs du résultat.
+    """
+    with get_pool(connection_string).connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(query, params or [])
+            columns = [description[0] for description in cursor.description]
+            empty = True
+            while True:
+                rows = cursor.fetchmany(chunksize)
+                if not rows:
+                    break
+                empty = False
+                chunk = pd.DataFrame.from_records([tuple(row) for row in rows], columns=columns)
+                yield apply_dtypes(chunk, dtypes)
+            if empty:
+                yield apply_dtypes(pd.DataFrame(columns=columns), dtypes)
+        finally:
+            cursor.close()
+
+
+def _read_frame(query, connection_string, params, chunksize, dtypes):
+    if chunksize is None:
+        df = get_pool(connection_string).run(
+            lambda conn: pd.read_sql(query, conn, params=params)
+        )
+        return apply_dtypes(df, dtypes)
+    return concat_chunks(iter_query(query, connection_string, params, chunksize, dtypes))
+
+
+def _fingerprint(request):
+    # Empreinte actuelle du résultat (voir read_query), ou None si la requête
+    # n'en déclare pas ou si elle n'a pas pu être lue
+    if request.probe is None:
+        return None
+    query, params = request.probe
+    label = request.tag or request.query[:80]
+    try:
+        with metrics.timed('probe', label, server=loader.server_of(request.connection_string)):
+            df = get_pool(request.connection_string).run(
+                lambda conn: pd.read_sql(query, conn, params=params or None)
+            )
+    except Exception as e:
+        logger.warning("Échec de la lecture de l'empreinte de %s, lecture complète : %s", label, e)
+        return None
+    if df.empty:
+        return None
+    return [str(value) for value in df.iloc[0].tolist()]
+
+
+def _current(request, name):
+    # Résultat déjà chargé d'une requête : en cache, même expiré, ou dans son instantané
+    df = query_cache.get_stale(request.connection_string, request.cache_query, request.params)
+    if df is None:
+        snapshot = snapshots.read(name)
+        df = None if snapshot is None else snapshot[0]
+    return df
+
+
+def _store(request, name, df):
+    with _state_lock:
+        _fetched.add(name)
+    if request.ttl is not None:
+        query_cache.put(request.connection_string, request.cache_query, df, request.params)
+        snapshots.clear_served(name)
+
+
+def _fetch(request, name):
+    # L'empreinte est lue avant le résultat : une modification survenue entre
+    # les deux sera détectée à la lecture suivante
+    fingerprint = _fingerprint(request)
+    with _state_lock:
+        known = _fingerprints.get(name)
+    if fingerprint is not None and fingerprint == known:
+        df = _current(request, name)
+        if df is not None:
+            # Résultat inchangé : il est conservé et sa durée de vie renouvelée
+            _store(request, name, df)
+            return df
+
+    label = request.tag or request.query[:80]
+    with metrics.timed('query', label, server=loader.server_of(request.connection_string)) as measure:
+        df = _read_frame(
+            request.query, request.connection_string, request.params, request.chunksize, request.dtypes
+        )
+        measure.update(rows=len(df), bytes=metrics.frame_bytes(df))
+    if request.transform is not None:
+        with metrics.timed('transform', label):
+            df = request.transform(df)
+    with _state_lock:
+        _fingerprints[name] = fingerprint
+    if request.ttl is not None and request.scheduled:
+        snapshots.write_async(name, df, {'query': request.query, 'fingerprint': fingerprint})
+    _store(request, name, df)
+    return df
+
+
+def _fetch_shared(request, name, use_cache=True):
+    # Les lectures simultanées de la même requête, depuis toutes les sessions,
+    # attendent une seule exécution
+    def fetch():
+        if use_cache and request.ttl is not None:
+            # Une exécution a pu se terminer entre la consultation du cache et ici
+            df = query_cache.get(request.connection_string, request.cache_query, request.ttl, request.params)
+            if df is not None:
+                return df
+        return _fetch(request, name)
+    return single_flight.do(name, fetch)
+
+
+def _refresh_in_background(request, name):
+    with _state_lock:
+        if name in _refreshing:
+            return
+        _refreshing.add(name)
+
+    def refresh():
+        try:
+            _fetch_shared(request, name)
+        except Exception:
+            logger.exception("Échec de l'actualisation en arrière-plan de l'instantané %s", name)
+        finally:
+            with _state_lock:
+                _refreshing.discard(name)
+
+    loader.submit(request.connection_string, refresh)
+
+
+def refresh_tagged(tag):
+    """
+    Relit depuis la base les résultats en cache d'une étiquette.
+
+    Seules les requêtes planifiées (voir read_query) dont le résultat est
+    encore en cache et a été lu au cours de sa durée de vie sont relues ; le
+    nouveau résultat remplace l'ancien d'un bloc. Les autres ne sont plus
+    planifiées. Destinée aux actualisations planifiées (voir
+    kpi_rol.scheduler), hors du rendu des pages.
+
+    Args:
+        tag (str): L'étiquette passée à read_query (nom de la source).
+
+    Returns:
+        int: Le nombre de requêtes relues.
+    """
+    with _state_lock:
+        requests = list(_cached_requests.get(tag, {}).items())
+    refreshed = 0
+    now = time.monotonic()
+    for name, request in requests:
+        with _state_lock:
+            idle = now - _last_read.get(name, now) > request.ttl
+        if idle or query_cache.get_stale(request.connection_string, request.cache_query, request.params) is None:
+            # Plus lue depuis une durée de vie (ex. fenêtre de la veille) ou
+            # évincée du cache : elle ne sera relue qu'à la prochaine demande
+            with _state_lock:
+                _cached_requests.get(tag, {}).pop(name, None)
+                _last_read.pop(name, None)
+            continue
+        _fetch_shared(request, name, use_cache=False)
+        refreshed += 1
+    return refreshed
+
+
+def _read_snapshot(name, connection_string):
+    snapshot = snapshots.read(name)
+    if snapshot is None:
+        return None
+    df, metadata = snapshot
+    snapshots.mark_served(name, connection_string, metadata)
+    if metadata.get('fingerprint') is not None:
+        with _state_lock:
+            _fingerprints.setdefault(name, metadata['fingerprint'])
+    return df
+
+
+def read_query(
+    query,
+    connection_string,
+    ttl=None,
+    params=None,
+    transform=None,
+    tag=None,
+    chunksize=None,
+    dtypes=None,
+    probe=None,
+    scheduled=False,
+):
+    """
+    Exécute une requête avec une connexion du bassin partagé.
+
+    Lorsqu'une durée de vie est fournie, le résultat est servi depuis le cache
+    partagé tant qu'il n'a pas expiré ; celui d'une requête planifiée est
+    aussi enregistré dans un instantané sur disque. Si le processus n'a encore
+    jamais lu cette requête, l'instantané est servi immédiatement et la base
+    est interrogée en arrière-plan. En mode hors ligne, seuls les instantanés
+    sont utilisés. Un résultat expiré est
+    servi tel quel pendant sa relecture en arrière-plan : seule la première
+    lecture d'une requête, sans cache ni instantané, attend la base. Les
+    lectures simultanées d'une même requête, y compris depuis des sessions
+    différentes, sont regroupées en une seule exécution.
+
+    Si une requête d'empreinte est fournie, elle est exécutée avant chaque
+    lecture : lorsque l'empreinte est identique à celle du résultat déjà
+    chargé (en cache ou dans l'instantané), ce résultat est conservé et la
+    relecture se limite à cette seule ligne.
+
+    Le DataFrame retourné est partagé : il ne doit pas être modifié en place.
+
+    Args:
+        query (str): La requête SQL à exécuter.
+        connection_string (str): La chaîne de connexion à la base de données.
+        ttl (float, optional): Durée de vie du résultat en cache, en secondes.
+            Si None, la requête est toujours exécutée.
+        params (list, optional): Les paramètres de la requête (marqueurs '?').
+        transform (callable, optional): Transformation appliquée une seule fois
+            au résultat, avant sa mise en cache et son enregistrement.
+        tag (str, optional): Étiquette qui distingue, dans le cache et les
+            instantanés, les résultats transformés des résultats bruts.
+        chunksize (int, optional): Si fourni, le résultat est lu par lots de
+            cette taille (voir iter_query) au lieu d'être construit d'un bloc.
+        dtypes (dict, optional): Types cibles des colonnes, appliqués à chaque
+            lot dès sa lecture (voir apply_dtypes).
+        probe (tuple, optional): La requête d'empreinte du résultat et ses
+            paramètres (voir kpi_rol.query.build_fingerprint).
+        scheduled (bool): Si True (avec une durée de vie), le résultat est
+            enregistré dans un instantané et, avec une étiquette, relu par les
+            actualisations planifiées de l'étiquette (voir refresh_tagged),
+            tant qu'il est lu. Réservé aux requêtes fixes d'une source : les
+            combinaisons de filtres choisies dans les widgets ne sont relues
+            qu'à la demande et ne sont pas servies hors ligne.
+
+    Returns:
+        pd.DataFrame: Le résultat de la requête.
+
+    Raises:
+        snapshots.OfflineError: En mode hors ligne, si aucun instantané n'existe.
+        Exception: Toute erreur de connexion ou d'exécution.
+    """
+    cache_query = query if tag is None else f'/* {tag} */ {query}'
+    name = snapshots.snapshot_name(connection_string, cache_query, params)
+    request = _Request(
+        query, connection_string, ttl, params, transform, chunksize, dtypes, cache_query, tag, probe, scheduled
+    )
+    if scheduled and ttl is not None and tag is not None:
+        with _state_lock:
+            _cached_requests.setdefault(tag, {})[name] = request
+            _last_read[name] = time.monotonic()
+    if ttl is not None:
+        df = query_cache.get(connection_string, cache_query, ttl, params)
+        if df is not None:
+            return df
+    if snapshots.OFFLINE:
+        df = _read_snapshot(name, connection_string)
+        if df is None:
+            raise snapshots.OfflineError(f"Aucun instantané disponible pour la requête : {query}")
+        if ttl is not None:
+            query_cache.put(connection_string, cache_query, df, params)
+        return df
+    if ttl is not None:
+        stale = query_cache.get_stale(connection_string, cache_query, params)
+        if stale is not None:
+            _refresh_in_background(request, name)
+            return stale
+    if ttl is not None and name not in _fetched:
+        df = _read_snapshot(name, connection_string)
+        if df is not None:
+            _refresh_in_background(request, name)
+            return df
+    return _fetch_shared(request, name)
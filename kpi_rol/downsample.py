@@ -0,0 +1,191 @@
+"""
+Sous-échantillonnage des séries temporelles des graphiques linéaires.
+
+Une pyramide de résolutions est calculée une seule fois par jeu de données :
+au-dessus des données brutes, chaque niveau (heure, jour, semaine, mois) ne
+garde, pour chaque période et chaque colonne, que les lignes portant le
+minimum et le maximum. Les niveaux ne contiennent que des lignes réelles et
+conservent les pics et les creux. Pour une plage de dates, le niveau le plus
+fin dont la plage compte au plus quelques fois le budget de points est
+retenu, puis réduit au budget par l'algorithme LTTB (Largest Triangle Three
+Buckets), qui conserve lui aussi la forme de la courbe. Le volume d'un
+graphique et le coût de sa préparation dépendent ainsi du budget de points,
+et non de l'historique accumulé.
+"""
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from kpi_rol.cache import FrameMemo
+from kpi_rol.dates import date_window
+from kpi_rol.rollups import floor_period
+
+# Niveaux de la pyramide, du plus fin au plus grossier : nom, période (voir
+# kpi_rol.rollups.floor_period) et durée approximative d'une période
+LEVELS = (
+    ('hour', 'h', timedelta(hours=1)),
+    ('day', 'D', timedelta(days=1)),
+    ('week', 'W', timedelta(weeks=1)),
+    ('month', 'M', timedelta(days=30)),
+)
+# Nombre de lignes, en multiple du budget, au-delà duquel un niveau plus
+# grossier est utilisé plutôt que de réduire le niveau courant
+OVERSAMPLING = 4
+
+
+def lttb(x, y, threshold):
+    """
+    Choisit les points d'une courbe à conserver selon l'algorithme LTTB.
+
+    Les points sont répartis en seaux de taille égale ; dans chaque seau est
+    retenu le point qui forme le plus grand triangle avec le point retenu
+    précédemment et la moyenne du seau suivant. Le premier et le dernier
+    point sont toujours conservés.
+
+    Args:
+        x (np.ndarray): Les abscisses, croissantes.
+        y (np.ndarray): Les ordonnées, sans valeurs manquantes.
+        threshold (int): Le nombre de points à conserver.
+
+    Returns:
+        np.ndarray: Les positions des points conservés, croissantes.
+    """
+    n = len(x)
+    if threshold >= n or n <= 2:
+        return np.arange(n)
+    if threshold < 3:
+        return np.array([0, n - 1])[:threshold]
+    x = np.asarray(x, dtype='float64') - float(x[0])
+    y = np.asarray(y, dtype='float64')
+    every = (n - 2) / (threshold - 2)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start = int(bucket * every) + 1
+        end = int((bucket + 1) * every) + 1
+        following_end = min(int((bucket + 2) * every) + 1, n)
+        mean_x = x[end:following_end].mean()
+        mean_y = y[end:following_end].mean()
+        areas = np.abs(
+            (x[previous] - mean_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (mean_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def extremes(df, freq):
+    """
+    Garde, pour chaque période et chaque colonne, les lignes du minimum et du maximum.
+
+    Args:
+        df (pd.DataFrame): Les séries numériques, indexées par date croissante.
+        freq (str): La période (voir kpi_rol.rollups.floor_period).
+
+    Returns:
+        pd.DataFrame: Les lignes retenues (au plus deux par période et par
+            colonne), dans leur ordre d'origine.
+    """
+    periods = floor_period(pd.Series(df.index), freq).to_numpy()
+    kept = [np.array([], dtype=np.int64)]
+    for column in df.columns:
+        values = pd.Series(df[column].to_numpy(dtype='float64', na_value=np.nan))
+        valid = values.notna().to_numpy()
+        grouped = values[valid].groupby(periods[valid])
+        kept.extend([grouped.idxmin().to_numpy(), grouped.idxmax().to_numpy()])
+    return df.iloc[np.unique(np.concatenate(kept))]
+
+
+def downsample(df, max_rows):
+    """
+    Réduit les lignes d'un DataFrame indexé par date par LTTB, colonne par colonne.
+
+    Les lignes retenues sont la réunion des points retenus pour chaque
+    colonne ; le budget est partagé entre les colonnes.
+
+    Args:
+        df (pd.DataFrame): Les séries numériques, indexées par date croissante.
+        max_rows (int): Le nombre maximal de lignes à conserver.
+
+    Returns:
+        pd.DataFrame: Les lignes retenues, dans leur ordre d'origine.
+    """
+    if len(df) <= max_rows:
+        return df
+    x = np.asarray(df.index, dtype='datetime64[ns]').view('int64')
+    threshold = max(3, max_rows // max(1, len(df.columns)))
+    kept = [np.array([], dtype=np.int64)]
+    for column in df.columns:
+        y = df[column].to_numpy(dtype='float64', na_value=np.nan)
+        valid = np.flatnonzero(~np.isnan(y))
+        kept.append(valid[lttb(x[valid], y[valid], threshold)])
+    return df.iloc[np.unique(np.concatenate(kept))]
+
+
+class SeriesPyramid:
+    """
+    Pyramide de résolutions des colonnes numériques d'un DataFrame indexé par date.
+
+    Seuls les niveaux plus grossiers que l'intervalle habituel des données
+    sont calculés : une table quotidienne a des niveaux semaine et mois.
+
+    Args:
+        df (pd.DataFrame): Les données, indexées par date croissante (voir
+            kpi_rol.transforms.index_by_date).
+    """
+
+    def __init__(self, df):
+        numeric = df.select_dtypes('number')
+        self.levels = [('raw', numeric)]
+        if len(numeric) < 2:
+            return
+        spacing = pd.Series(numeric.index).diff().median()
+        for name, freq, size in LEVELS:
+            if size > spacing:
+                # Les extrêmes d'une période figurent parmi ceux de ses sous-périodes
+                self.levels.append((name, extremes(self.levels[-1][1], freq)))
+
+    def view(self, start, end, max_points, columns=None):
+        """
+        Retourne les points à afficher pour une plage de dates.
+
+        Args:
+            start (date): Le premier jour de la plage.
+            end (date): Le dernier jour de la plage, inclus.
+            max_points (int): Le nombre maximal de points du graphique (lignes
+                multipliées par colonnes).
+            columns (list, optional): Les colonnes à afficher. Par défaut, toutes
+                les colonnes numériques.
+
+        Returns:
+            pd.DataFrame: Les points retenus, indexés par date ; ne doit pas
+                être modifié en place.
+        """
+        if columns is None:
+            columns = list(self.levels[0][1].columns)
+        max_rows = max(3, max_points // max(1, len(columns)))
+        for _, level in self.levels:
+            window = date_window(level, start, end)[columns]
+            if len(window) <= max_rows * OVERSAMPLING:
+                break
+        return downsample(window, max_rows)
+
+
+# Pyramides déjà construites, par jeu de données
+_built = FrameMemo()
+
+
+def pyramid_of(df):
+    """
+    Retourne la pyramide de résolutions d'un jeu de données, construite une seule fois.
+
+    Args:
+        df (pd.DataFrame): Les données, indexées par date croissante.
+
+    Returns:
+        SeriesPyramid: La pyramide.
+    """
+    return _built.get(df, SeriesPyramid, lambda: SeriesPyramid(df))
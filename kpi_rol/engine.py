@@ -0,0 +1,305 @@
+"""
+Calcul des KPI en lot, hors du tableau de bord.
+
+Le moteur calcule tous les KPI d'une période (une journée, un quart, une
+semaine...) et les enregistre dans le magasin local (voir kpi_rol.store), que
+le tableau de bord se contente de lire. Il peut être lancé par une tâche
+planifiée, chaque nuit ou à chaque fin de quart :
+
+    python -m kpi_rol.engine                                    # la veille
+    python -m kpi_rol.engine --start 2024-12-01 --end 2024-12-08
+    python -m kpi_rol.engine --start 2024-12-23T06:00 --end 2024-12-23T14:00
+    python -m kpi_rol.engine --kpis production eau --workers 2
+
+Les sources sont lues en parallèle par le bassin de kpi_rol.loader, dans la
+limite de requêtes simultanées par serveur, directement depuis la base et
+bornées à la période côté serveur (ni cache, ni instantané, ni copie locale
+synchronisée). Les KPI qui ne lisent qu'un cube d'agrégats le construisent
+lot par lot pendant la lecture, sans assembler les lignes de la période.
+Les calculs (voir kpi_rol.kpis) sont répartis sur un
+bassin de processus dès l'arrivée des lignes de chaque source : chaque KPI
+est une tâche, et les KPI par centre de coût sont partagés en groupes de
+centres de coût de tailles équilibrées, un par processus.
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from kpi_rol import db, kpis, loader, metrics, store
+from kpi_rol.chunks import DEFAULT_CHUNKSIZE
+from kpi_rol.data import DataAccess, DataSource
+from kpi_rol.query import Between, IsIn, build_select
+from kpi_rol.sources import source_bt, source_eau, source_perte_temps, source_production, source_rts
+
+logger = logging.getLogger(__name__)
+
+# Nombre maximal de points des séries de pertes de temps, comme les
+# graphiques du tableau de bord
+MAX_POINTS = 5000
+# Nombre minimal de lignes d'un groupe de centres de coût : en deçà, le
+# transfert des lignes vers un autre processus coûte plus que le calcul
+MIN_TASK_ROWS = 100_000
+
+# Définition d'un KPI : la source lue, sa colonne de dates (bornée à la
+# période), les filtres propres au KPI, la colonne selon laquelle les lignes
+# sont partagées entre les processus (ou None), la fonction de calcul
+# compute(rows, start, end) et, si le calcul ne lit qu'un cube de la source,
+# le nom de ce cube : compute reçoit alors le cube au lieu des lignes
+Kpi = namedtuple('Kpi', 'source date_column filters split compute rollup', defaults=(None,))
+
+
+def _request_stages(rows, start, end):
+    rollup = source_rts.rollups['etapes']
+    return kpis.request_stages(rollup, rollup.build(rows))
+
+
+def _work_order_stages(rows, start, end):
+    rollup = source_bt.rollups['etapes']
+    return kpis.work_order_stages(rollup, rollup.build(rows))
+
+
+def _downtime_series(cube, start, end):
+    # La fin de la période est exclue : son dernier jour est celui de l'instant précédent
+    last_day = (end - timedelta(microseconds=1)).date()
+    return kpis.downtime_series(source_perte_temps.rollups['durees'], cube, start.date(), last_day, MAX_POINTS)
+
+
+def _unplanned_by_cause(rows, start, end):
+    return kpis.downtime_summary(kpis.with_duration_classes(rows), 'TypeCauses')
+
+
+def _unplanned_by_action(rows, start, end):
+    return kpis.downtime_summary(kpis.with_duration_classes(rows), 'ActionsInterventions')
+
+
+def _daily_series(rows, start, end):
+    return kpis.daily_series(rows)
+
+
+# KPI calculés, par nom
+KPIS = {
+    'rts_etapes': Kpi(source_rts, 'ACTUALSTART', (), 'Centre de coût', _request_stages),
+    'bt_etapes': Kpi(source_bt, 'CREATEDDATETIME', (), 'Centre de coût', _work_order_stages),
+    'perte_temps': Kpi(source_perte_temps, 'DateDebut', (), None, _downtime_series, 'durees'),
+    'non_planifie_causes': Kpi(
+        source_perte_temps, 'DateDebut', (IsIn('Nom', [kpis.UNPLANNED]),), None, _unplanned_by_cause
+    ),
+    'non_planifie_actions': Kpi(
+        source_perte_temps, 'DateDebut', (IsIn('Nom', [kpis.UNPLANNED]),), None, _unplanned_by_action
+    ),
+    'production': Kpi(source_production, 'Date', (), None, _daily_series),
+    'eau': Kpi(source_eau, 'Date', (), None, _daily_series),
+}
+
+
+def _read_fresh(query, connection_string, ttl=None, probe=None, scheduled=False, **kwargs):
+    # Les KPI sont calculés sur les données actuelles de la base : sans durée
+    # de vie ni empreinte, read_query ne consulte ni n'écrit cache et instantanés
+    return db.read_query(query, connection_string, **kwargs)
+
+
+def _direct(source):
+    # Une source synchronisée est lue comme une autre : la période est bornée
+    # dans la requête, au lieu de relire toute la table dans sa copie locale
+    if not source.incremental:
+        return source
+    return DataSource(
+        source.name,
+        source.connection_string,
+        source.table,
+        columns=source.columns,
+        filters=source.filters,
+        transform=source.transform,
+        dtypes=source.dtypes,
+        chunksize=source.chunksize,
+        order_by=source.order_by,
+        rollups=source.rollups,
+    )
+
+
+def _load(access, kpi, start, end):
+    # Les lignes de la période, ou le cube du KPI, et le nombre de lignes lues
+    filters = [Between(kpi.date_column, start, end)] + list(kpi.filters)
+    if kpi.rollup is not None:
+        return _read_cube(kpi.source, kpi.rollup, filters)
+    rows = access.load(_direct(kpi.source), filters)
+    return rows, 0 if rows is None else len(rows)
+
+
+def _read_cube(source, name, filters):
+    # Chaque lot est agrégé dès sa lecture : la mémoire de pointe dépend de la
+    # taille d'un lot et non de celle de la période
+    query, params = build_select(source.table, source.columns, source.filters + filters)
+    read = [0]
+
+    def chunks():
+        for chunk in db.iter_query(
+            query, source.connection_string, params or None, source.chunksize or DEFAULT_CHUNKSIZE, source.dtypes
+        ):
+            read[0] += len(chunk)
+            yield chunk if source.transform is None else source.transform(chunk)
+
+    with metrics.timed('query', source.name, server=loader.server_of(source.connection_string)) as measure:
+        cube = source.rollups[name].build_chunks(chunks())
+        measure.update(rows=read[0], bytes=metrics.frame_bytes(cube))
+    return cube, read[0]
+
+
+def split_rows(rows, column, parts, min_rows=MIN_TASK_ROWS):
+    """
+    Partage des lignes en groupes de valeurs entières d'une colonne.
+
+    Les valeurs sont réparties de façon à équilibrer le nombre de lignes des
+    groupes, qui en comptent chacun au moins min_rows environ. Les lignes
+    sans valeur sont écartées.
+
+    Args:
+        rows (pd.DataFrame): Les lignes à partager.
+        column (str): La colonne de partage (ex. 'Centre de coût').
+        parts (int): Le nombre maximal de groupes.
+        min_rows (int): Le nombre minimal de lignes visé par groupe.
+
+    Returns:
+        list: Les groupes de lignes (pd.DataFrame), non vides.
+    """
+    sizes = rows[column].value_counts()
+    sizes = sizes[sizes > 0]
+    parts = min(parts, len(rows) // max(1, min_rows))
+    if parts <= 1 or len(sizes) <= 1:
+        return [rows]
+    loads = [0] * parts
+    groups = [[] for _ in range(parts)]
+    # Les valeurs les plus fréquentes d'abord, chacune dans le groupe le moins chargé
+    for value, size in sizes.items():
+        smallest = loads.index(min(loads))
+        groups[smallest].append(value)
+        loads[smallest] += size
+    return [rows[rows[column].isin(values)] for values in groups if values]
+
+
+def _run(compute, rows, start, end):
+    # Exécuté dans un processus du bassin : le résultat et la durée du calcul
+    started = time.perf_counter()
+    return compute(rows, start, end), time.perf_counter() - started
+
+
+def _combine(parts):
+    if len(parts) == 1:
+        return parts[0]
+    # Résultats par groupes de centres de coût : lignes disjointes, étapes à réunir
+    return pd.concat(parts).fillna(0).sort_index()
+
+
+def compute(start, end, names=None, workers=None):
+    """
+    Calcule des KPI pour une période.
+
+    Args:
+        start (datetime): Le début de la période (inclus).
+        end (datetime): La fin de la période (exclue).
+        names (list, optional): Les KPI à calculer (clés de KPIS). Par
+            défaut, tous.
+        workers (int, optional): Le nombre de processus de calcul. Par
+            défaut, le nombre de processeurs.
+
+    Returns:
+        tuple: Les KPI calculés (nom -> pd.DataFrame) et le compte rendu du
+            calcul (nom -> dict avec le nombre de lignes lues, le nombre de
+            tâches, la durée de calcul et l'éventuelle erreur).
+    """
+    names = list(KPIS) if names is None else list(names)
+    workers = workers or os.cpu_count() or 1
+    access = DataAccess(_read_fresh)
+    report = {name: {'rows': 0, 'tasks': 0, 'compute_s': 0.0, 'error': None} for name in names}
+    parts = {name: [] for name in names}
+
+    reads = {
+        name: loader.submit(KPIS[name].source.connection_string, _load, access, KPIS[name], start, end)
+        for name in names
+    }
+    # Processus neufs (et non copies du processus courant) : ils n'héritent ni
+    # des fils de lecture ni des connexions ouvertes
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        tasks = {}
+        # Les calculs d'un KPI commencent dès l'arrivée de ses lignes
+        for name, read in loader.completed(reads):
+            kpi = KPIS[name]
+            try:
+                rows, count = read.result()
+                if rows is None:
+                    raise ValueError("aucune donnée n'a pu être lue")
+            except Exception as e:
+                logger.error("Échec de la lecture des données du KPI %s : %s", name, e)
+                report[name]['error'] = str(e)
+                continue
+            groups = [rows] if kpi.split is None else split_rows(rows, kpi.split, workers)
+            report[name].update(rows=count, tasks=len(groups))
+            for group in groups:
+                tasks[pool.submit(_run, kpi.compute, group, start, end)] = name
+        for task in as_completed(tasks):
+            name = tasks[task]
+            try:
+                result, seconds = task.result()
+            except Exception as e:
+                logger.error("Échec du calcul du KPI %s : %s", name, e)
+                report[name]['error'] = str(e)
+                continue
+            parts[name].append(result)
+            report[name]['compute_s'] += seconds
+
+    results = {
+        name: _combine(parts[name])
+        for name in names if report[name]['error'] is None and parts[name]
+    }
+    return results, report
+
+
+def _timestamp(text):
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Date invalide : {text} (attendu : AAAA-MM-JJ[THH:MM])")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--start', type=_timestamp,
+                        help="Début de la période, inclus (AAAA-MM-JJ[THH:MM]). Par défaut, la veille à minuit.")
+    parser.add_argument('--end', type=_timestamp,
+                        help="Fin de la période, exclue (AAAA-MM-JJ[THH:MM]). Par défaut, un jour après le début.")
+    parser.add_argument('--kpis', nargs='+', choices=list(KPIS), help="KPI à calculer. Par défaut, tous.")
+    parser.add_argument('--workers', type=int, help="Nombre de processus de calcul.")
+    args = parser.parse_args(argv)
+    logging.basicConfig(format='%(levelname)s %(name)s : %(message)s')
+
+    if not store.enabled():
+        parser.error("Le magasin de KPI nécessite pyarrow.")
+    start = args.start or datetime.combine(datetime.now().date() - timedelta(days=1), datetime.min.time())
+    end = args.end or start + timedelta(days=1)
+    if end <= start:
+        parser.error("La fin de la période doit être postérieure à son début.")
+
+    started = time.perf_counter()
+    results, report = compute(start, end, args.kpis, args.workers)
+    elapsed = time.perf_counter() - started
+    errors = {name: entry['error'] for name, entry in report.items() if entry['error'] is not None}
+    period = store.write(start, end, results, {'seconds': round(elapsed, 3), 'report': report, 'errors': errors})
+
+    print(f"KPI du {start:%Y-%m-%d %H:%M} au {end:%Y-%m-%d %H:%M} ({elapsed:.2f} s) : {store.STORE_DIR}/{period}")
+    for name, entry in report.items():
+        status = f"{len(results[name])} lignes" if name in results else f"Erreur : {entry['error']}"
+        print(f"  {name:<22} {entry['rows']:>10} lignes lues {entry['tasks']:>3} tâches"
+              f" {entry['compute_s']:>8.3f} s  {status}")
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+Distributions résumées par groupe.
+
+Au lieu de transmettre la liste de toutes les valeurs de chaque groupe, les
+distributions sont résumées par des histogrammes de taille fixe, calculés pour
+tous les groupes en un seul passage vectorisé. Les classes sont attribuées une
+fois par ligne ; les histogrammes de regroupements différents (ou de plages
+de dates différentes) peuvent ensuite être calculés à partir de ces classes.
+
+Les durées sont très asymétriques (beaucoup d'arrêts courts, quelques arrêts
+très longs) : les classes s'élargissent de façon logarithmique, pour que les
+valeurs courantes ne tombent pas toutes dans la première classe.
+"""
+import numpy as np
+import pandas as pd
+
+# Nombre de classes par histogramme
+DEFAULT_BINS = 20
+
+
+def bin_edges(values, bins=DEFAULT_BINS):
+    """
+    Calcule les bornes de classes de largeur croissante entre le minimum et le maximum.
+
+    Les bornes sont espacées régulièrement sur l'échelle log(1 + valeur - minimum) :
+    chaque classe est plus large que la précédente d'un facteur constant.
+
+    Args:
+        values (pd.Series): Les valeurs numériques.
+        bins (int): Le nombre de classes.
+
+    Returns:
+        np.ndarray: Les bins + 1 bornes croissantes, ou None si aucune valeur
+            n'est renseignée.
+    """
+    data = values.to_numpy(dtype='float64', na_value=np.nan)
+    data = data[~np.isnan(data)]
+    if not len(data):
+        return None
+    low, high = data.min(), data.max()
+    edges = low + np.expm1(np.linspace(0.0, np.log1p(high - low), bins + 1))
+    # Bornes extrêmes exactes, malgré les arrondis
+    edges[0], edges[-1] = low, high
+    return edges
+
+
+def assign_bins(values, bins=DEFAULT_BINS):
+    """
+    Attribue à chaque valeur sa classe parmi celles de bin_edges.
+
+    Args:
+        values (pd.Series): Les valeurs numériques.
+        bins (int): Le nombre de classes.
+
+    Returns:
+        np.ndarray: Le numéro de classe de chaque valeur (0 à bins - 1), ou -1
+            pour une valeur manquante. Une valeur égale à une borne est
+            comptée dans la classe qui se termine à cette borne.
+    """
+    data = values.to_numpy(dtype='float64', na_value=np.nan)
+    valid = ~np.isnan(data)
+    codes = np.full(len(data), -1, dtype=np.int32)
+    edges = bin_edges(values, bins)
+    if edges is None:
+        return codes
+    codes[valid] = np.searchsorted(edges[1:-1], data[valid], side='left')
+    return codes
+
+
+def group_histograms(keys, codes, bins=DEFAULT_BINS):
+    """
+    Compte les valeurs de chaque classe, pour chaque groupe.
+
+    Args:
+        keys (pd.Series): Le groupe de chaque ligne.
+        codes (array-like): La classe de chaque ligne (voir assign_bins).
+        bins (int): Le nombre de classes.
+
+    Returns:
+        pd.Series: Pour chaque groupe observé, la liste des effectifs de ses
+            classes (longueur bins), indexée par le groupe.
+    """
+    codes = np.asarray(codes)
+    groups, labels = pd.factorize(keys)
+    valid = (groups >= 0) & (codes >= 0)
+    counts = np.bincount(
+        groups[valid] * bins + codes[valid], minlength=len(labels) * bins
+    ).reshape(len(labels), bins)
+    return pd.Series(counts.tolist(), index=pd.Index(labels, name=keys.name), dtype=object)
@@ -0,0 +1,139 @@
+"""
+Calcul des KPI, sans dépendance à l'interface Streamlit.
+
+Chaque fonction reçoit des lignes déjà chargées, ou le cube d'agrégats d'une
+source (voir kpi_rol.rollups), et retourne le tableau affiché par une section
+du tableau de bord. Les mêmes fonctions sont appelées par le rendu des pages
+et par le moteur de calcul en lot (voir kpi_rol.engine) : un KPI précalculé
+est identique à celui que la page aurait affiché pour la même période.
+"""
+from kpi_rol.histograms import DEFAULT_BINS, assign_bins, group_histograms
+from kpi_rol.rollups import COUNT, choose_bucket
+
+# Étapes des demandes closes, exclues des demandes en cours
+CLOSED_STAGES = ['ANNULE', 'COMPLETE', 'FERMER']
+# Nom des pertes de temps non planifiées
+UNPLANNED = 'Non-Planifié'
+# Colonne de la classe de durée de chaque arrêt (voir with_duration_classes)
+DURATION_CLASS = 'ClasseDuree'
+
+
+def request_stages(rollup, cube, start=None, end=None):
+    """
+    Compte les demandes (RT) distinctes par centre de coût et par étape, hors étapes closes.
+
+    Args:
+        rollup (DailyRollup): Le cube 'etapes' de la source des RTs.
+        cube (pd.DataFrame): Le cube (voir kpi_rol.rollups.cube_of).
+        start (date, optional): Le premier jour de la plage.
+        end (date, optional): Le dernier jour de la plage, inclus.
+
+    Returns:
+        pd.DataFrame: Le nombre de demandes, indexé par centre de coût, avec
+            une colonne par étape.
+    """
+    grouped = rollup.query(cube, start, end)
+    grouped = grouped[~grouped.index.get_level_values('STAGEID').isin(CLOSED_STAGES)]
+    return grouped[rollup.distinct].unstack('STAGEID').fillna(0)
+
+
+def work_order_stages(rollup, cube, start=None, end=None):
+    """
+    Compte les bons de travail (BT) par centre de coût et par étape.
+
+    Args:
+        rollup (DailyRollup): Le cube 'etapes' de la source des BT.
+        cube (pd.DataFrame): Le cube.
+        start (date, optional): Le premier jour de la plage.
+        end (date, optional): Le dernier jour de la plage, inclus.
+
+    Returns:
+        pd.DataFrame: Le nombre de BT, indexé par centre de coût, avec une
+            colonne par étape.
+    """
+    return rollup.query(cube, start, end)[COUNT].unstack('STAGEID').fillna(0)
+
+
+def downtime_series(rollup, cube, start, end, max_points):
+    """
+    Additionne les durées des pertes de temps par nom et par période.
+
+    La période (heure, jour ou semaine) est la plus fine qui respecte le
+    nombre maximal de points pour la plage (voir kpi_rol.rollups.choose_bucket).
+
+    Args:
+        rollup (DailyRollup): Le cube 'durees' de la source des pertes de temps.
+        cube (pd.DataFrame): Le cube des lignes de la plage.
+        start (date): Le premier jour de la plage.
+        end (date): Le dernier jour de la plage, inclus.
+        max_points (int): Le nombre maximal de points (périodes multipliées
+            par noms).
+
+    Returns:
+        pd.DataFrame: La durée totale, indexée par début de période, avec une
+            colonne par nom.
+    """
+    series = max(1, cube['Nom'].nunique())
+    freq = choose_bucket(start, end, max_points // series)
+    grouped = rollup.query(cube, by=[rollup.date_column, 'Nom'], freq=freq)
+    return grouped['DureeSecondaire'].unstack('Nom').fillna(0)
+
+
+def with_duration_classes(df, bins=DEFAULT_BINS):
+    """
+    Ajoute aux arrêts leur classe de durée, pour les histogrammes de downtime_summary.
+
+    Les classes couvrent toutes les lignes reçues : elles sont communes à tous
+    les regroupements et à toutes les plages extraites ensuite de ces lignes.
+
+    Args:
+        df (pd.DataFrame): Les arrêts, avec la colonne 'DureeSecondaire'.
+        bins (int): Le nombre de classes.
+
+    Returns:
+        pd.DataFrame: Les arrêts, avec la colonne DURATION_CLASS.
+    """
+    return df.assign(**{DURATION_CLASS: assign_bins(df['DureeSecondaire'], bins)})
+
+
+def downtime_summary(df, column, bins=DEFAULT_BINS):
+    """
+    Résume les arrêts par cause ou par action.
+
+    Args:
+        df (pd.DataFrame): Les arrêts, avec leur classe de durée (voir
+            with_duration_classes).
+        column (str): La colonne de regroupement (ex. 'TypeCauses' ou
+            'ActionsInterventions').
+        bins (int): Le nombre de classes des histogrammes.
+
+    Returns:
+        pd.DataFrame: Pour chaque valeur du regroupement, le nombre
+            d'occurrences, la somme et la moyenne des durées, et
+            l'histogramme des durées (colonne 'Durees').
+    """
+    aggregated = df.groupby(column, observed=True).agg(
+        Nombre_Occurrences=(column, 'size'),
+        Somme_Duree_Minutes=('DureeSecondaire', 'sum')
+    ).reset_index()
+    aggregated['Duree_Par_Occurrence_Minutes'] = (
+        aggregated['Somme_Duree_Minutes'] / aggregated['Nombre_Occurrences']
+    )
+    histograms = group_histograms(df[column], df[DURATION_CLASS], bins)
+    aggregated['Durees'] = histograms.reindex(aggregated[column]).to_numpy()
+    return aggregated
+
+
+def daily_series(df, columns=None):
+    """
+    Extrait les séries quotidiennes d'une table indexée par date.
+
+    Args:
+        df (pd.DataFrame): Les lignes de la plage, indexées par date.
+        columns (list, optional): Les colonnes à garder. Par défaut, toutes
+            les colonnes numériques.
+
+    Returns:
+        pd.DataFrame: Les séries, indexées par date.
+    """
+    return df.select_dtypes('number') if columns is None else df[columns]
@@ -0,0 +1,122 @@
+"""
+Lecture parallèle des sources de données.
+
+Les lectures sont confiées à un bassin de fils d'exécution partagé par le
+processus, avec un nombre borné de requêtes simultanées par serveur SQL. Au-delà,
+les lectures d'un serveur attendent dans sa file, hors du bassin.
+"""
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+
+# Nombre total de fils de lecture du processus
+MAX_WORKERS = 16
+# Nombre maximal de requêtes simultanées par serveur
+MAX_PER_SERVER = 2
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='kpi-loader')
+# Lectures de chaque serveur : serveur -> _ServerQueue
+_servers = {}
+_servers_lock = threading.Lock()
+
+
+class _ServerQueue:
+    # Lectures en cours d'un serveur et lectures en attente d'une place
+    def __init__(self):
+        self.running = 0
+        self.pending = deque()
+
+
+def server_of(connection_string):
+    """
+    Extrait le nom du serveur d'une chaîne de connexion.
+
+    Args:
+        connection_string (str): La chaîne produite par create_connection_string.
+
+    Returns:
+        str: La valeur de SERVER=, ou la chaîne entière si elle est absente.
+    """
+    for part in connection_string.split(';'):
+        name, _, value = part.partition('=')
+        if name.strip().upper() == 'SERVER':
+            return value.strip().lower()
+    return connection_string
+
+
+def submit(connection_string, func, *args, **kwargs):
+    """
+    Lance une lecture en arrière-plan.
+
+    La lecture n'est confiée au bassin que lorsque son serveur a une place
+    libre : les lectures en attente d'un serveur chargé n'occupent aucun fil
+    et ne retardent pas celles des autres serveurs.
+
+    Args:
+        connection_string (str): La chaîne de connexion interrogée, qui
+            détermine la limite de requêtes simultanées à respecter.
+        func (callable): La fonction de lecture.
+        *args, **kwargs: Les arguments de la fonction.
+
+    Returns:
+        concurrent.futures.Future: Le résultat à venir de la lecture.
+    """
+    server = server_of(connection_string)
+    future = Future()
+    with _servers_lock:
+        queue = _servers.setdefault(server, _ServerQueue())
+        if queue.running >= MAX_PER_SERVER:
+            queue.pending.append((future, func, args, kwargs))
+            return future
+        queue.running += 1
+    _start(server, future, func, args, kwargs)
+    return future
+
+
+def _start(server, future, func, args, kwargs):
+    try:
+        _executor.submit(_run, server, future, func, args, kwargs)
+    except RuntimeError as e:
+        # Bassin arrêté (fin du processus) : la place est rendue
+        future.set_exception(e)
+        _release(server)
+
+
+def _run(server, future, func, args, kwargs):
+    try:
+        # Une lecture annulée pendant son attente n'est pas exécutée
+        if future.set_running_or_notify_cancel():
+            try:
+                result = func(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+    finally:
+        _release(server)
+
+
+def _release(server):
+    # La place libérée revient à la plus ancienne lecture en attente du serveur
+    with _servers_lock:
+        queue = _servers[server]
+        if not queue.pending:
+            queue.running -= 1
+            return
+        task = queue.pending.popleft()
+    _start(server, *task)
+
+
+def completed(futures):
+    """
+    Parcourt des lectures dans leur ordre d'achèvement.
+
+    Args:
+        futures (dict): Les lectures lancées, indexées par nom.
+
+    Yields:
+        tuple: Le nom et la lecture terminée (Future).
+    """
+    names = {future: name for name, future in futures.items()}
+    for future in as_completed(names):
+        yield names[future], future
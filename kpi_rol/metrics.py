@@ -0,0 +1,149 @@
+"""
+Mesures de performance du tableau de bord.
+
+Chaque étape mesurée (requête, transformation, rendu d'une section) produit un
+enregistrement : durée, lignes, octets, volume envoyé au navigateur et pic de
+mémoire résidente (RSS) du processus. Ce pic est celui atteint depuis le
+démarrage du processus, et non pendant l'étape : il ne désigne l'étape
+responsable que lorsqu'il augmente. Les enregistrements sont écrits en JSON,
+une ligne par mesure, dans le journal 'kpi_rol.metrics' (et dans le fichier
+désigné par la variable d'environnement KPI_ROL_METRICS_FILE), et les plus
+récents sont conservés en mémoire pour le panneau de débogage.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - indisponible sous Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Nombre d'enregistrements conservés en mémoire
+MAX_RECORDS = 1000
+# Fichier JSON Lines facultatif recevant les mesures
+METRICS_FILE = os.environ.get('KPI_ROL_METRICS_FILE')
+
+if METRICS_FILE:
+    _handler = logging.FileHandler(METRICS_FILE, encoding='utf-8')
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+_records = deque(maxlen=MAX_RECORDS)
+_records_lock = threading.Lock()
+# Mesure en cours dans chaque fil d'exécution (pour frame_payload)
+_current = threading.local()
+
+
+def process_peak_rss():
+    """
+    Retourne le pic de mémoire résidente du processus depuis son démarrage.
+
+    Returns:
+        int: Le pic en octets, ou None si la plateforme ne le fournit pas.
+    """
+    if resource is None:
+        return None
+    # ru_maxrss est exprimé en kilo-octets sous Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def frame_bytes(df):
+    """
+    Estime la taille en mémoire d'un DataFrame, sans parcourir les objets Python.
+
+    Args:
+        df (pd.DataFrame): Le DataFrame.
+
+    Returns:
+        int: La taille estimée en octets.
+    """
+    return int(df.memory_usage(index=True, deep=False).sum())
+
+
+def record(stage, name, **fields):
+    """
+    Enregistre une mesure.
+
+    Args:
+        stage (str): L'étape mesurée (ex. 'query', 'transform', 'render').
+        name (str): Ce qui est mesuré (source, section...).
+        **fields: Les valeurs mesurées (ms, rows, bytes...).
+
+    Returns:
+        dict: L'enregistrement.
+    """
+    entry = {'ts': time.time(), 'stage': stage, 'name': name, **fields}
+    entry.setdefault('process_peak_rss', process_peak_rss())
+    with _records_lock:
+        _records.append(entry)
+    logger.info(json.dumps(entry, default=str, ensure_ascii=False))
+    return entry
+
+
+@contextmanager
+def timed(stage, name, **fields):
+    """
+    Mesure la durée d'un bloc de code et l'enregistre.
+
+    Le dictionnaire produit peut recevoir d'autres valeurs pendant le bloc
+    (ex. le nombre de lignes lues). Les volumes passés à frame_payload dans le
+    même fil d'exécution y sont additionnés sous 'payload_bytes'.
+
+    Args:
+        stage (str): L'étape mesurée.
+        name (str): Ce qui est mesuré.
+        **fields: Valeurs initiales de l'enregistrement.
+
+    Yields:
+        dict: Les valeurs de l'enregistrement, complétées par 'ms' à la sortie.
+    """
+    values = dict(fields)
+    parent = getattr(_current, 'values', None)
+    _current.values = values
+    start = time.perf_counter()
+    try:
+        yield values
+    finally:
+        values['ms'] = round((time.perf_counter() - start) * 1000, 1)
+        _current.values = parent
+        record(stage, name, **values)
+
+
+def frame_payload(df):
+    """
+    Ajoute à la mesure en cours le volume d'un DataFrame envoyé au navigateur.
+
+    Args:
+        df (pd.DataFrame): Le DataFrame affiché.
+
+    Returns:
+        pd.DataFrame: Le même DataFrame, pour pouvoir envelopper l'appel d'affichage.
+    """
+    values = getattr(_current, 'values', None)
+    if values is not None:
+        values['payload_bytes'] = values.get('payload_bytes', 0) + frame_bytes(df)
+    return df
+
+
+def recent(since=None):
+    """
+    Retourne les mesures conservées en mémoire.
+
+    Args:
+        since (float, optional): Horodatage Unix ; seules les mesures
+            postérieures sont retournées.
+
+    Returns:
+        list: Les enregistrements, du plus ancien au plus récent.
+    """
+    with _records_lock:
+        records = list(_records)
+    return records if since is None else [entry for entry in records if entry['ts'] >= since]
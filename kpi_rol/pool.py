@@ -0,0 +1,246 @@
+"""
+Bassins de connexions pyodbc partagés par toutes les sessions du processus.
+
+Un bassin est créé par chaîne de connexion. Les connexions sont réutilisées
+d'une requête à l'autre, vérifiées avant usage lorsqu'elles sont restées
+inactives, fermées au-delà du délai d'inactivité et remplacées en cas d'échec.
+
+Les connexions sont ouvertes avec pyodbc. Un autre pilote DB-API (ex. sqlite3
+pour les bancs d'essai hors usine) peut être utilisé à sa place avec
+use_driver ; pyodbc n'est alors pas nécessaire.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import pyodbc
+except ImportError:  # pragma: no cover - dépend de l'environnement (pilote ODBC)
+    pyodbc = None
+
+# Nombre maximal de connexions ouvertes par chaîne de connexion
+DEFAULT_MAX_SIZE = 4
+# Délai au-delà duquel une connexion inactive est fermée (en secondes)
+DEFAULT_IDLE_TIMEOUT = 10 * 60
+# Délai d'inactivité au-delà duquel une connexion est vérifiée avant usage
+DEFAULT_HEALTH_CHECK_AFTER = 30
+# Délai d'attente maximal d'une connexion libre (en secondes)
+DEFAULT_ACQUIRE_TIMEOUT = 60
+
+# Pilote des connexions : fonction d'ouverture et erreurs signalant une
+# connexion inutilisable (voir use_driver)
+_connect = pyodbc.connect if pyodbc is not None else None
+_driver_errors = (pyodbc.Error,) if pyodbc is not None else ()
+
+
+class PoolTimeout(Exception):
+    """
+    Aucune connexion n'est devenue disponible dans le délai imparti.
+    """
+
+
+class ConnectionPool:
+    """
+    Bassin de connexions pour une chaîne de connexion.
+
+    Args:
+        connection_string (str): La chaîne de connexion à la base de données.
+        max_size (int): Nombre maximal de connexions ouvertes simultanément.
+        idle_timeout (float): Délai d'inactivité avant fermeture, en secondes.
+        health_check_after (float): Délai d'inactivité avant vérification, en secondes.
+        acquire_timeout (float): Délai d'attente d'une connexion libre, en secondes.
+    """
+
+    def __init__(
+        self,
+        connection_string,
+        max_size=DEFAULT_MAX_SIZE,
+        idle_timeout=DEFAULT_IDLE_TIMEOUT,
+        health_check_after=DEFAULT_HEALTH_CHECK_AFTER,
+        acquire_timeout=DEFAULT_ACQUIRE_TIMEOUT,
+    ):
+        self.connection_string = connection_string
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self.acquire_timeout = acquire_timeout
+        # Connexions libres : liste de tuples (connexion, instant de remise)
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    def _open(self):
+        if _connect is None:
+            raise RuntimeError("pyodbc n'est pas disponible et aucun autre pilote n'a été déclaré.")
+        return _connect(self.connection_string)
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except _driver_errors:
+            pass
+
+    @staticmethod
+    def _is_healthy(conn):
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1;")
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except _driver_errors:
+            return False
+
+    def close_idle(self):
+        """
+        Ferme les connexions libres dont le délai d'inactivité est dépassé.
+        """
+        now = time.monotonic()
+        with self._lock:
+            expired = [conn for conn, since in self._idle if now - since > self.idle_timeout]
+            self._idle = [(conn, since) for conn, since in self._idle if now - since <= self.idle_timeout]
+        for conn in expired:
+            self._close(conn)
+
+    def acquire(self):
+        """
+        Emprunte une connexion au bassin, en ouvrant une nouvelle au besoin.
+
+        Returns:
+            pyodbc.Connection: Une connexion vérifiée.
+
+        Raises:
+            PoolTimeout: Si le nombre maximal de connexions est atteint et
+                qu'aucune n'est libérée dans le délai imparti.
+        """
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise PoolTimeout(
+                f"Aucune connexion disponible après {self.acquire_timeout} s "
+                f"({self.max_size} connexions déjà utilisées)."
+            )
+        try:
+            self.close_idle()
+            while True:
+                with self._lock:
+                    if not self._idle:
+                        break
+                    conn, since = self._idle.pop()
+                if time.monotonic() - since < self.health_check_after or self._is_healthy(conn):
+                    return conn
+                self._close(conn)
+            return self._open()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn, discard=False):
+        """
+        Rend une connexion au bassin.
+
+        Args:
+            conn (pyodbc.Connection): La connexion empruntée.
+            discard (bool): Si True, la connexion est fermée au lieu d'être réutilisée.
+        """
+        try:
+            if discard:
+                self._close(conn)
+            else:
+                with self._lock:
+                    self._idle.append((conn, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """
+        Gestionnaire de contexte qui emprunte puis rend une connexion.
+
+        Une connexion qui a levé une erreur du pilote est fermée plutôt que rendue.
+        """
+        conn = self.acquire()
+        try:
+            yield conn
+        except _driver_errors:
+            self.release(conn, discard=True)
+            raise
+        except BaseException:
+            self.release(conn)
+            raise
+        self.release(conn)
+
+    def run(self, func, retries=1):
+        """
+        Exécute une fonction avec une connexion du bassin.
+
+        En cas d'erreur du pilote, la connexion fautive est fermée et la fonction
+        est relancée sur une nouvelle connexion.
+
+        Args:
+            func (callable): Fonction recevant la connexion en argument.
+            retries (int): Nombre de nouvelles tentatives après un échec.
+
+        Returns:
+            Le résultat de la fonction.
+        """
+        for attempt in range(retries + 1):
+            try:
+                with self.connection() as conn:
+                    return func(conn)
+            except _driver_errors:
+                if attempt == retries:
+                    raise
+
+    def close(self):
+        """
+        Ferme toutes les connexions libres du bassin.
+        """
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close(conn)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(connection_string):
+    """
+    Retourne le bassin partagé associé à une chaîne de connexion.
+
+    Args:
+        connection_string (str): Chaîne produite par create_connection_string.
+
+    Returns:
+        ConnectionPool: Le bassin de connexions, créé au premier appel.
+    """
+    with _pools_lock:
+        pool = _pools.get(connection_string)
+        if pool is None:
+            pool = ConnectionPool(connection_string)
+            _pools[connection_string] = pool
+        return pool
+
+
+def use_driver(connect, errors=()):
+    """
+    Remplace le pilote utilisé pour ouvrir les connexions.
+
+    Les bassins existants sont fermés et oubliés : les connexions suivantes
+    sont toutes ouvertes avec le nouveau pilote.
+
+    Args:
+        connect (callable): Fonction recevant la chaîne de connexion et
+            retournant une connexion DB-API (ex. sqlite3.connect enveloppé).
+        errors (tuple): Les exceptions du pilote après lesquelles une
+            connexion est fermée plutôt que réutilisée.
+    """
+    global _connect, _driver_errors
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+        _connect = connect
+        _driver_errors = tuple(errors)
+    for pool in pools:
+        pool.close()
@@ -0,0 +1,85 @@
+"""
+Aperçu paginé des jeux de données.
+
+Seule la page affichée est envoyée au navigateur : la recherche et le tri sont
+faits sur le serveur, et l'export complet n'est produit qu'à la demande. Le
+volume transmis à chaque rendu ne dépend donc pas de la taille de la table.
+"""
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from kpi_rol import metrics
+
+# Nombre de lignes par page
+DEFAULT_PAGE_SIZE = 100
+# Choix du sélecteur de tri signifiant « ordre d'origine »
+NO_SORT = '(ordre d\'origine)'
+
+
+def search(df, text):
+    """
+    Sélectionne les lignes dont une colonne textuelle contient un texte.
+
+    La recherche ignore la casse. Pour les colonnes catégorielles, seules les
+    catégories sont parcourues, puis les lignes correspondantes sont retenues
+    par leur code.
+
+    Args:
+        df (pd.DataFrame): Le DataFrame à filtrer.
+        text (str): Le texte recherché ; vide, toutes les lignes sont retenues.
+
+    Returns:
+        pd.DataFrame: Les lignes correspondantes, dans leur ordre d'origine.
+    """
+    if not text:
+        return df
+    mask = pd.Series(False, index=df.index)
+    for column in df.columns:
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            categories = values.cat.categories.astype(str)
+            matching = np.flatnonzero(categories.str.contains(text, case=False, regex=False))
+            mask |= values.cat.codes.isin(matching)
+        elif pd.api.types.is_string_dtype(values) or values.dtype == object:
+            mask |= values.astype('string').str.contains(text, case=False, regex=False).fillna(False)
+    return df[mask]
+
+
+def preview(df, key, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Affiche un aperçu paginé d'un DataFrame, avec recherche, tri et export.
+
+    Args:
+        df (pd.DataFrame): Le DataFrame à afficher.
+        key (str): Préfixe unique des clés des widgets de l'aperçu.
+        page_size (int): Le nombre de lignes par page.
+    """
+    search_column, sort_column, order_column, page_column = st.columns([3, 2, 1, 1])
+    text = search_column.text_input("Rechercher :", key=f'{key}_recherche')
+    sort = sort_column.selectbox("Trier par :", [NO_SORT] + list(df.columns), key=f'{key}_tri')
+    descending = order_column.toggle("Décroissant", key=f'{key}_ordre')
+
+    view = search(df, text)
+    if sort != NO_SORT:
+        view = view.sort_values(sort, ascending=not descending, kind='stable', na_position='last')
+    elif descending:
+        view = view.iloc[::-1]
+
+    # La page demandée est ramenée à la dernière si la recherche réduit le nombre de lignes
+    pages = max(1, -(-len(view) // page_size))
+    page = min(page_column.number_input("Page :", min_value=1, value=1, step=1, key=f'{key}_page'), pages)
+    start = (page - 1) * page_size
+    end = min(start + page_size, len(view))
+
+    st.caption(f"Lignes {start + 1 if end else 0} à {end} sur {len(view)} (page {page} sur {pages})")
+    st.dataframe(metrics.frame_payload(view.iloc[start:end]))
+    st.download_button(
+        "Exporter en CSV",
+        # Produit seulement au clic, dans un fil séparé du rendu
+        data=lambda: view.to_csv().encode('utf-8-sig'),
+        file_name=f'{key}.csv',
+        mime='text/csv',
+        on_click='ignore',
+        key=f'{key}_export',
+    )
@@ -0,0 +1,273 @@
+"""
+Construction de requêtes SELECT paramétrées.
+
+Les filtres choisis dans les widgets sont traduits en clauses WHERE avec des
+marqueurs '?' afin que seules les lignes et les colonnes utiles à l'affichage
+courant soient transférées depuis SQL Server. Les mêmes filtres peuvent être
+appliqués localement à un DataFrame déjà chargé.
+"""
+import re
+
+import pandas as pd
+
+
+def quote_identifier(name):
+    """
+    Entoure un nom de colonne de crochets SQL Server.
+
+    Args:
+        name (str): Le nom de la colonne.
+
+    Returns:
+        str: Le nom délimité (ex. '[Production Nette (lb)]').
+    """
+    return '[' + name.replace(']', ']]') + ']'
+
+
+class Between:
+    """
+    Filtre start <= colonne < end. Une borne à None n'est pas appliquée.
+
+    Args:
+        column (str): La colonne filtrée.
+        start: Borne inférieure incluse.
+        end: Borne supérieure exclue.
+    """
+
+    def __init__(self, column, start=None, end=None):
+        self.column = column
+        self.start = start
+        self.end = end
+
+    def to_sql(self):
+        clauses, params = [], []
+        if self.start is not None:
+            clauses.append(f"{quote_identifier(self.column)} >= ?")
+            params.append(self.start)
+        if self.end is not None:
+            clauses.append(f"{quote_identifier(self.column)} < ?")
+            params.append(self.end)
+        return ' AND '.join(clauses), params
+
+    def mask(self, df):
+        mask = df[self.column].notna()
+        if self.start is not None:
+            mask &= df[self.column] >= self.start
+        if self.end is not None:
+            mask &= df[self.column] < self.end
+        return mask
+
+    def covers(self, other):
+        return (
+            isinstance(other, Between)
+            and other.column == self.column
+            and (self.start is None or (other.start is not None and other.start >= self.start))
+            and (self.end is None or (other.end is not None and other.end <= self.end))
+        )
+
+
+class IsIn:
+    """
+    Filtre colonne IN (valeurs). Une liste vide ne filtre rien.
+
+    Args:
+        column (str): La colonne filtrée.
+        values (list): Les valeurs retenues.
+    """
+
+    def __init__(self, column, values):
+        self.column = column
+        self.values = list(values)
+
+    def to_sql(self):
+        if not self.values:
+            return '', []
+        if len(self.values) == 1:
+            return f"{quote_identifier(self.column)} = ?", list(self.values)
+        markers = ', '.join('?' for _ in self.values)
+        return f"{quote_identifier(self.column)} IN ({markers})", list(self.values)
+
+    def mask(self, df):
+        if not self.values:
+            return pd.Series(True, index=df.index)
+        return df[self.column].isin(self.values)
+
+    def covers(self, other):
+        if not self.values:
+            return True
+        return (
+            isinstance(other, IsIn)
+            and other.column == self.column
+            and bool(other.values)
+            and set(other.values) <= set(self.values)
+        )
+
+
+class NotLike:
+    """
+    Filtre colonne NOT LIKE motif. Les valeurs NULL sont conservées.
+
+    Args:
+        column (str): La colonne filtrée.
+        pattern (str): Le motif LIKE exclu (ex. 'BT-%').
+    """
+
+    def __init__(self, column, pattern):
+        self.column = column
+        self.pattern = pattern
+
+    def to_sql(self):
+        column = quote_identifier(self.column)
+        return f"({column} IS NULL OR {column} NOT LIKE ?)", [self.pattern]
+
+    def mask(self, df):
+        regex = ''.join(
+            '.*' if char == '%' else '.' if char == '_' else re.escape(char)
+            for char in self.pattern
+        )
+        values = df[self.column]
+        return values.isna() | ~values.astype(str).str.fullmatch(regex)
+
+    def covers(self, other):
+        return (
+            isinstance(other, NotLike)
+            and other.column == self.column
+            and other.pattern == self.pattern
+        )
+
+
+def apply_filters(df, filters):
+    """
+    Applique localement une liste de filtres à un DataFrame.
+
+    Args:
+        df (pd.DataFrame): Le DataFrame à filtrer.
+        filters (list): Les filtres à combiner par AND.
+
+    Returns:
+        pd.DataFrame: Les lignes qui satisfont tous les filtres.
+    """
+    if not filters:
+        return df
+    mask = filters[0].mask(df)
+    for filtre in filters[1:]:
+        mask &= filtre.mask(df)
+    return df[mask]
+
+
+def filters_cover(broad, narrow):
+    """
+    Indique si le résultat des filtres 'broad' contient celui des filtres 'narrow'.
+
+    Chaque filtre de 'broad' doit être impliqué par au moins un filtre de
+    'narrow' ; le résultat de 'narrow' peut alors être obtenu en filtrant
+    localement celui de 'broad'.
+
+    Args:
+        broad (list): Les filtres du résultat déjà chargé.
+        narrow (list): Les filtres du résultat demandé.
+
+    Returns:
+        bool: True si 'narrow' peut être dérivé de 'broad'.
+    """
+    return all(
+        isinstance(filtre, IsIn) and not filtre.values
+        or any(filtre.covers(other) for other in narrow)
+        for filtre in broad
+    )
+
+
+def build_where(filters):
+    """
+    Assemble une clause WHERE à partir d'une liste de filtres.
+
+    Args:
+        filters (list): Les filtres à combiner par AND.
+
+    Returns:
+        tuple: La clause (chaîne vide si aucun filtre) et la liste des paramètres.
+    """
+    clauses, params = [], []
+    for filtre in filters:
+        clause, clause_params = filtre.to_sql()
+        if clause:
+            clauses.append(clause)
+            params.extend(clause_params)
+    if not clauses:
+        return '', []
+    return ' WHERE ' + ' AND '.join(clauses), params
+
+
+def build_select(table, columns=None, filters=()):
+    """
+    Construit une requête SELECT paramétrée.
+
+    Args:
+        table (str): Le nom qualifié de la table ou de la vue.
+        columns (list, optional): Les colonnes à lire. Si None, toutes les colonnes.
+        filters (list): Les filtres à appliquer.
+
+    Returns:
+        tuple: La requête SQL et la liste de ses paramètres.
+    """
+    select = '*' if columns is None else ', '.join(quote_identifier(c) for c in columns)
+    where, params = build_where(filters)
+    return f"SELECT {select} FROM {table}{where};", params
+
+
+def build_bounds(table, column, filters=()):
+    """
+    Construit une requête retournant le minimum et le maximum d'une colonne.
+
+    Args:
+        table (str): Le nom qualifié de la table ou de la vue.
+        column (str): La colonne dont on veut les bornes.
+        filters (list): Les filtres à appliquer.
+
+    Returns:
+        tuple: La requête SQL (colonnes 'min_value' et 'max_value') et ses paramètres.
+    """
+    where, params = build_where(filters)
+    column = quote_identifier(column)
+    return (
+        f"SELECT MIN({column}) AS min_value, MAX({column}) AS max_value FROM {table}{where};",
+        params,
+    )
+
+
+def build_distinct(table, column, filters=()):
+    """
+    Construit une requête retournant les valeurs distinctes d'une colonne.
+
+    Args:
+        table (str): Le nom qualifié de la table ou de la vue.
+        column (str): La colonne dont on veut les valeurs.
+        filters (list): Les filtres à appliquer.
+
+    Returns:
+        tuple: La requête SQL et ses paramètres.
+    """
+    where, params = build_where(filters)
+    column = quote_identifier(column)
+    return f"SELECT DISTINCT {column} FROM {table}{where} ORDER BY {column};", params
+
+
+def build_fingerprint(table, expressions, filters=()):
+    """
+    Construit une requête retournant l'empreinte d'un jeu de lignes.
+
+    L'empreinte est une seule ligne d'agrégats (ex. 'COUNT_BIG(*)',
+    'MAX([Date])', 'CHECKSUM_AGG(BINARY_CHECKSUM(*))') qui change dès que
+    les lignes sélectionnées par les filtres changent.
+
+    Args:
+        table (str): Le nom qualifié de la table ou de la vue.
+        expressions (list): Les expressions SQL d'agrégat composant l'empreinte.
+        filters (list): Les filtres à appliquer.
+
+    Returns:
+        tuple: La requête SQL et ses paramètres.
+    """
+    where, params = build_where(filters)
+    select = ', '.join(f"{expression} AS fingerprint_{index}" for index, expression in enumerate(expressions))
+    return f"SELECT {select} FROM {table}{where};", params
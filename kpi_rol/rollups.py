@@ -0,0 +1,219 @@
+"""
+Agrégats quotidiens (cubes) des jeux de données.
+
+Un cube regroupe les lignes brutes par jour et par dimensions (centre de coût,
+étape, secteur, nom, cause...) et conserve pour chaque groupe le nombre de
+lignes et les sommes des mesures. Les comptes distincts sont exacts : le cube
+garde alors une ligne par jour, dimensions et identifiant distinct.
+
+Les graphiques interrogent le cube pour une plage de dates quelconque. Sans
+compte distinct, leur coût dépend du nombre de jours et de groupes, et non du
+nombre d'événements. Avec un compte distinct, il suit le nombre d'identifiants
+présents chaque jour (ex. une ligne par jour et par REQUESTID) : seuls les
+événements répétés d'un même identifiant dans la journée sont regroupés.
+Les cubes sont additifs : une mise à jour ajoute les agrégats des lignes
+nouvelles et retranche ceux des anciennes versions des lignes modifiées.
+
+Un cube fin (par heure) peut être interrogé à une période plus grossière (jour,
+semaine) : choose_bucket choisit la plus fine qui respecte un nombre maximal de
+points, ce qui borne la taille des graphiques quelle que soit la plage choisie.
+"""
+from datetime import timedelta
+
+from kpi_rol.cache import FrameMemo
+from kpi_rol.chunks import aggregate_chunks, concat_chunks
+from kpi_rol.dates import date_window
+from kpi_rol.query import apply_filters
+from kpi_rol.transforms import sort_by
+
+# Colonne du nombre de lignes agrégées
+COUNT = 'Nombre'
+
+# Périodes d'agrégation possibles des graphiques, de la plus fine à la plus grossière
+BUCKETS = (('h', timedelta(hours=1)), ('D', timedelta(days=1)), ('W', timedelta(weeks=1)))
+
+
+def floor_period(values, freq):
+    """
+    Ramène des dates au début de leur période.
+
+    Args:
+        values (pd.Series): Les dates (datetime64).
+        freq (str): La période : fréquence pandas fixe (ex. 'h', 'D'), 'W'
+            pour la semaine commençant le lundi ou 'M' pour le mois.
+
+    Returns:
+        pd.Series: Le début de la période de chaque date, de même type.
+    """
+    if freq in ('W', 'M'):
+        return values.dt.to_period(freq).dt.start_time.astype(values.dtype)
+    return values.dt.floor(freq)
+
+
+def choose_bucket(start, end, max_buckets):
+    """
+    Choisit la période d'agrégation la plus fine pour une plage de dates.
+
+    Args:
+        start (date): Le premier jour de la plage.
+        end (date): Le dernier jour de la plage, inclus.
+        max_buckets (int): Le nombre maximal de périodes à afficher.
+
+    Returns:
+        str: La période retenue parmi BUCKETS ; la plus grossière si aucune ne
+            respecte la limite.
+    """
+    span = end - start + timedelta(days=1)
+    for freq, size in BUCKETS:
+        if span / size <= max_buckets:
+            return freq
+    return BUCKETS[-1][0]
+
+
+class DailyRollup:
+    """
+    Définition d'un cube d'agrégats quotidiens.
+
+    Args:
+        date_column (str): La colonne de dates ; dans le cube, elle contient le
+            début de la période (jour par défaut).
+        by (list): Les colonnes de dimensions.
+        distinct (str, optional): Colonne dont le nombre de valeurs distinctes
+            doit pouvoir être calculé sur toute plage (ex. 'REQUESTID').
+        sums (list): Les colonnes de mesures à additionner.
+        freq (str): La période d'agrégation (voir floor_period, 'D' par défaut).
+    """
+
+    def __init__(self, date_column, by=(), distinct=None, sums=(), freq='D'):
+        self.date_column = date_column
+        self.by = list(by)
+        self.distinct = distinct
+        self.sums = list(sums)
+        self.freq = freq
+
+    @property
+    def keys(self):
+        """
+        Les colonnes identifiant une ligne du cube.
+        """
+        keys = [self.date_column] + self.by
+        return keys + [self.distinct] if self.distinct is not None else keys
+
+    @property
+    def measures(self):
+        """
+        Les colonnes additives du cube.
+        """
+        return [COUNT] + self.sums
+
+    def build(self, df):
+        """
+        Construit le cube d'un jeu de lignes brutes.
+
+        Les lignes sans date ou sans valeur pour une dimension sont ignorées,
+        comme dans un regroupement pandas.
+
+        Args:
+            df (pd.DataFrame): Les lignes brutes.
+
+        Returns:
+            pd.DataFrame: Le cube, trié par période.
+        """
+        cube = self._with_periods(df).groupby(self.keys, observed=True).agg(**self._aggregations())
+        return sort_by(self.date_column)(cube.reset_index())
+
+    def build_chunks(self, chunks):
+        """
+        Construit le cube de lignes brutes lues par lots, sans les assembler.
+
+        Chaque lot est agrégé dès son arrivée (voir kpi_rol.chunks.aggregate_chunks) :
+        la mémoire de pointe dépend de la taille d'un lot et de celle du cube.
+
+        Args:
+            chunks (iterable): Les lots de lignes brutes (ex. kpi_rol.db.iter_query).
+
+        Returns:
+            pd.DataFrame: Le cube, trié par période.
+        """
+        cube = aggregate_chunks(
+            (self._with_periods(chunk) for chunk in chunks), self.keys, **self._aggregations()
+        )
+        return sort_by(self.date_column)(cube.reset_index())
+
+    def _with_periods(self, df):
+        return df.assign(**{self.date_column: floor_period(df[self.date_column], self.freq)})
+
+    def _aggregations(self):
+        return {
+            COUNT: (self.date_column, 'size'),
+            **{column: (column, 'sum') for column in self.sums},
+        }
+
+    def update(self, cube, added, removed=None):
+        """
+        Met à jour un cube avec des lignes ajoutées et retirées.
+
+        Args:
+            cube (pd.DataFrame): Le cube à mettre à jour.
+            added (pd.DataFrame): Les lignes brutes ajoutées.
+            removed (pd.DataFrame, optional): Les lignes brutes retirées
+                (ex. anciennes versions des lignes modifiées).
+
+        Returns:
+            pd.DataFrame: Le nouveau cube ; le cube d'origine n'est pas modifié.
+        """
+        parts = [cube, self.build(added)]
+        if removed is not None and not removed.empty:
+            negative = self.build(removed)
+            parts.append(negative.assign(**{column: -negative[column] for column in self.measures}))
+        merged = concat_chunks(parts).groupby(self.keys, observed=True)[self.measures].sum()
+        merged = merged[merged[COUNT] != 0].reset_index()
+        return sort_by(self.date_column)(merged)
+
+    def query(self, cube, start=None, end=None, by=None, filters=(), freq=None):
+        """
+        Agrège un cube sur une plage de jours.
+
+        Args:
+            cube (pd.DataFrame): Le cube à interroger.
+            start (date, optional): Le premier jour de la plage.
+            end (date, optional): Le dernier jour de la plage, inclus.
+            by (list, optional): Les colonnes de regroupement du résultat
+                (dimensions et/ou colonne de dates). Par défaut, les dimensions.
+            filters (list): Filtres à appliquer aux lignes du cube.
+            freq (str, optional): Période, plus grossière que celle du cube, à
+                laquelle regrouper la colonne de dates (voir floor_period).
+
+        Returns:
+            pd.DataFrame: Le nombre de lignes, les sommes et, si le cube en
+                garde, le nombre de valeurs distinctes, indexés par les
+                colonnes de regroupement.
+        """
+        window = apply_filters(date_window(cube, start, end, self.date_column), filters)
+        if freq is not None and freq != self.freq:
+            window = window.assign(**{self.date_column: floor_period(window[self.date_column], freq)})
+        aggregations = {column: (column, 'sum') for column in self.measures}
+        if self.distinct is not None:
+            aggregations[self.distinct] = (self.distinct, 'nunique')
+        return window.groupby(self.by if by is None else list(by), observed=True).agg(**aggregations)
+
+
+# Cubes déjà construits, par jeu de données
+_built = FrameMemo()
+
+
+def cube_of(rollup, df):
+    """
+    Retourne le cube d'un jeu de données, construit une seule fois par jeu.
+
+    Le cube est conservé tant que le DataFrame existe : un jeu servi depuis le
+    cache de requêtes n'est agrégé qu'une fois, quel que soit le nombre de rendus.
+
+    Args:
+        rollup (DailyRollup): La définition du cube.
+        df (pd.DataFrame): Les lignes brutes.
+
+    Returns:
+        pd.DataFrame: Le cube.
+    """
+    return _built.get(df, rollup, lambda: rollup.build(df))
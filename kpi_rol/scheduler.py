@@ -0,0 +1,169 @@
+"""
+Actualisation planifiée des sources de données.
+
+Un fil d'exécution du processus relit chaque source à son propre intervalle,
+indépendamment des rendus : les pages servent les données déjà chargées,
+remplacées d'un bloc à la fin de chaque actualisation, et n'attendent jamais
+la base. Les relectures passent par le bassin de kpi_rol.loader et respectent
+donc la limite de requêtes simultanées par serveur.
+"""
+import logging
+import threading
+import time
+
+from kpi_rol import db, loader, snapshots
+from kpi_rol.data import DataAccess
+
+logger = logging.getLogger(__name__)
+
+# Période de vérification des actualisations dues (en secondes)
+TICK = 5
+
+
+class RefreshJob:
+    """
+    Actualisation périodique d'une source.
+
+    Attributes:
+        name (str): Le nom de la source.
+        connection_string (str): La chaîne de connexion de la source.
+        interval (float): L'intervalle entre deux actualisations, en secondes.
+        refresh (callable): La fonction sans argument qui actualise la source.
+        last_success (float): Horodatage Unix de la dernière actualisation réussie.
+        last_error (str): Message de la dernière erreur, effacé par un succès.
+        running (bool): Indique si une actualisation est en cours.
+    """
+
+    def __init__(self, name, connection_string, interval, refresh):
+        self.name = name
+        self.connection_string = connection_string
+        self.interval = interval
+        self.refresh = refresh
+        self.last_success = None
+        self.last_error = None
+        self.running = False
+        # Les données viennent d'être chargées par le rendu qui déclare la source
+        self.next_run = time.monotonic() + interval
+
+    def staleness(self):
+        """
+        Retourne l'âge des données, en secondes, depuis la dernière actualisation réussie.
+
+        Returns:
+            float: L'âge, ou None si aucune actualisation planifiée n'a encore réussi.
+        """
+        return None if self.last_success is None else time.time() - self.last_success
+
+
+class RefreshScheduler:
+    """
+    Planificateur des actualisations, partagé par les sessions du processus.
+
+    Args:
+        tick (float): Période de vérification des actualisations dues, en secondes.
+    """
+
+    def __init__(self, tick=TICK):
+        self.tick = tick
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def register(self, name, connection_string, interval, refresh):
+        """
+        Déclare l'actualisation périodique d'une source.
+
+        Appeler à nouveau register pour le même nom met à jour l'intervalle et
+        la fonction sans réinitialiser l'état de l'actualisation.
+
+        Args:
+            name (str): Le nom de la source.
+            connection_string (str): La chaîne de connexion de la source.
+            interval (float): L'intervalle entre deux actualisations, en secondes.
+            refresh (callable): La fonction sans argument qui actualise la source.
+
+        Returns:
+            RefreshJob: L'actualisation déclarée.
+        """
+        with self._lock:
+            job = self._jobs.get(name)
+            if job is None:
+                job = RefreshJob(name, connection_string, interval, refresh)
+                self._jobs[name] = job
+            else:
+                job.interval = interval
+                job.refresh = refresh
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='kpi-scheduler', daemon=True)
+                self._thread.start()
+            return job
+
+    def status(self, name):
+        """
+        Retourne l'état de l'actualisation d'une source.
+
+        Args:
+            name (str): Le nom de la source.
+
+        Returns:
+            RefreshJob: L'actualisation, ou None si la source n'est pas planifiée.
+        """
+        with self._lock:
+            return self._jobs.get(name)
+
+    def _run(self):
+        while True:
+            time.sleep(self.tick)
+            now = time.monotonic()
+            with self._lock:
+                due = [job for job in self._jobs.values() if not job.running and now >= job.next_run]
+                for job in due:
+                    job.running = True
+            for job in due:
+                loader.submit(job.connection_string, self._execute, job)
+
+    def _execute(self, job):
+        try:
+            job.refresh()
+        except Exception as e:
+            logger.exception("Échec de l'actualisation planifiée de la source %s", job.name)
+            job.last_error = str(e)
+        else:
+            job.last_success = time.time()
+            job.last_error = None
+        finally:
+            job.next_run = time.monotonic() + job.interval
+            job.running = False
+
+
+# Instance partagée par toutes les sessions du processus Streamlit
+scheduler = RefreshScheduler()
+
+
+def schedule_source(source, interval=None):
+    """
+    Planifie l'actualisation périodique d'une source déclarée.
+
+    Une source synchronisée est mise à jour de façon incrémentale ; pour les
+    autres, les résultats encore en cache sont relus (voir db.refresh_tagged).
+    En mode hors ligne, rien n'est planifié.
+
+    Args:
+        source (DataSource): La source à actualiser.
+        interval (float, optional): L'intervalle entre deux actualisations, en
+            secondes. Par défaut, la durée de vie de la source (source.ttl).
+
+    Returns:
+        RefreshJob: L'actualisation déclarée, ou None en mode hors ligne.
+    """
+    if snapshots.OFFLINE:
+        return None
+    if source.incremental:
+        def refresh():
+            DataAccess(db.read_query).refresh(source)
+    else:
+        def refresh():
+            db.refresh_tagged(source.name)
+    return scheduler.register(
+        source.name, source.connection_string, interval or source.ttl, refresh
+    )
@@ -0,0 +1,61 @@
+"""
+Registre des types de colonnes des tables sources.
+
+Les colonnes sont retournées par pyodbc avec le type object. Ce registre
+déclare, pour chaque table, le type cible de chaque colonne connue : catégorie
+pour les chaînes à faible cardinalité, datetime64 pour les dates, float32 pour
+les durées et les quantités, chaîne pour les identifiants. Les types sont
+appliqués une seule fois, au chargement (voir kpi_rol.transforms.apply_dtypes).
+"""
+
+SCHEMAS = {
+    'dbo.ROLDynawayWorksheetKPIRequest': {
+        'REQUESTID': 'string',
+        'WORKORDER_ID': 'string',
+        'FUNCTIONAL_LOCATION': 'category',
+        'STAGEID': 'category',
+        'REQUEST_TYPE': 'category',
+        'ACTUALSTART': 'datetime64[ns]',
+        'CREATEDDATETIME': 'datetime64[ns]',
+        'MODIFIEDDATETIME': 'datetime64[ns]',
+    },
+    'dbo.ROLDynawayWorksheetAll': {
+        'WORKORDER_ID': 'string',
+        'FUNCTIONALLOCATIONID': 'category',
+        'STAGEID': 'category',
+        'CREATEDDATETIME': 'datetime64[ns]',
+        'MODIFIEDDATETIME': 'datetime64[ns]',
+    },
+    'dbo.vPerteTempsExtraction': {
+        'DateDebut': 'datetime64[ns]',
+        'DureeSecondaire': 'float32',
+        'Nom': 'category',
+        'Secteur': 'category',
+        'TypeCauses': 'category',
+        'ActionsInterventions': 'category',
+    },
+    '[dbo].[Daily Production]': {
+        'Date': 'datetime64[ns]',
+        'Secteur': 'category',
+        'Production Nette (lb)': 'float32',
+        'Production Brute (lb)': 'float32',
+    },
+    '[dbo].[Water Consumption]': {
+        'Date': 'datetime64[ns]',
+        'Secteur': 'category',
+    },
+}
+
+
+def schema_for(table):
+    """
+    Retourne les types cibles déclarés pour une table.
+
+    Args:
+        table (str): Le nom qualifié de la table, tel qu'utilisé dans les requêtes.
+
+    Returns:
+        dict: Le type cible de chaque colonne connue (vide si la table n'est
+            pas déclarée).
+    """
+    return dict(SCHEMAS.get(table, {}))
@@ -0,0 +1,235 @@
+"""
+Instantanés des jeux de données sur disque, au format Parquet.
+
+Chaque résultat lu depuis SQL Server peut être enregistré avec son schéma et
+son horodatage. Au démarrage du processus, les instantanés permettent
+d'afficher des données immédiatement, puis de les actualiser en arrière-plan.
+En mode hors ligne (variable d'environnement KPI_ROL_OFFLINE=1), le tableau de
+bord fonctionne uniquement à partir des instantanés.
+
+pyarrow est une dépendance optionnelle : s'il est absent, les instantanés sont
+désactivés.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - dépend de l'environnement
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+# Répertoire des instantanés
+SNAPSHOT_DIR = os.environ.get(
+    'KPI_ROL_SNAPSHOT_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'snapshots'),
+)
+# Fonctionnement sans accès aux bases de données
+OFFLINE = os.environ.get('KPI_ROL_OFFLINE', '') not in ('', '0')
+# Nombre maximal d'instantanés conservés (les plus anciens sont supprimés)
+MAX_SNAPSHOTS = 200
+# Clé des métadonnées propres au tableau de bord dans le schéma Parquet
+METADATA_KEY = b'kpi_rol'
+
+# Les écritures sont sérialisées dans un fil dédié pour ne pas ralentir les rendus
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='kpi-snapshots')
+_served = {}
+_served_lock = threading.Lock()
+
+
+class OfflineError(Exception):
+    """
+    Aucun instantané n'est disponible pour une lecture en mode hors ligne.
+    """
+
+
+def enabled():
+    """
+    Indique si les instantanés sont disponibles (pyarrow installé).
+    """
+    return pq is not None
+
+
+def snapshot_name(connection_string, query, params=None):
+    """
+    Calcule le nom de l'instantané d'une requête.
+
+    Le nom est une empreinte : il ne contient ni la requête ni les identifiants
+    de connexion.
+
+    Args:
+        connection_string (str): La chaîne de connexion à la base de données.
+        query (str): La requête SQL.
+        params (list, optional): Les paramètres de la requête.
+
+    Returns:
+        str: Le nom de l'instantané.
+    """
+    text = json.dumps([connection_string, query, list(params or [])], default=str)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def _path(name):
+    return os.path.join(SNAPSHOT_DIR, f'{name}.parquet')
+
+
+def write_frame(df, path, metadata=None):
+    """
+    Enregistre un DataFrame et ses métadonnées dans un fichier Parquet compressé.
+
+    L'écriture passe par un fichier temporaire puis un renommage, de sorte
+    qu'un lecteur ne voit jamais un fichier partiel. pyarrow doit être
+    installé (voir enabled).
+
+    Args:
+        df (pd.DataFrame): Le DataFrame à enregistrer.
+        path (str): Le fichier à écrire.
+        metadata (dict, optional): Métadonnées supplémentaires (sérialisables en JSON).
+    """
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    info = dict(metadata or {}, created_at=time.time(), rows=len(df))
+    schema_metadata = dict(table.schema.metadata or {})
+    schema_metadata[METADATA_KEY] = json.dumps(info, default=str).encode('utf-8')
+    table = table.replace_schema_metadata(schema_metadata)
+    temporary = f'{path}.{threading.get_ident()}.tmp'
+    pq.write_table(table, temporary, compression='zstd')
+    os.replace(temporary, path)
+
+
+def read_frame(path):
+    """
+    Lit un fichier écrit par write_frame, en mémoire projetée (memory-mapped).
+
+    Args:
+        path (str): Le fichier à lire.
+
+    Returns:
+        tuple: Le DataFrame et ses métadonnées, ou None si le fichier est
+            absent ou illisible, ou si pyarrow n'est pas installé.
+    """
+    if not enabled() or not os.path.exists(path):
+        return None
+    try:
+        table = pq.read_table(path, memory_map=True)
+    except (OSError, pa.ArrowException):
+        return None
+    metadata = json.loads((table.schema.metadata or {}).get(METADATA_KEY, b'{}'))
+    return table.to_pandas(), metadata
+
+
+def write(name, df, metadata=None):
+    """
+    Enregistre un DataFrame dans un instantané compressé (voir write_frame).
+
+    Args:
+        name (str): Le nom de l'instantané.
+        df (pd.DataFrame): Le DataFrame à enregistrer.
+        metadata (dict, optional): Métadonnées supplémentaires (sérialisables en JSON).
+    """
+    if not enabled():
+        return
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    write_frame(df, _path(name), metadata)
+    _prune()
+
+
+def write_async(name, df, metadata=None):
+    """
+    Enregistre un instantané en arrière-plan.
+
+    Args:
+        name (str): Le nom de l'instantané.
+        df (pd.DataFrame): Le DataFrame à enregistrer ; il ne doit plus être modifié.
+        metadata (dict, optional): Métadonnées supplémentaires.
+    """
+    if enabled():
+        _writer.submit(write, name, df, metadata).add_done_callback(_log_failure(name))
+
+
+def _log_failure(name):
+    # Une écriture en arrière-plan n'a pas d'appelant pour recevoir son erreur
+    def done(future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.error("Échec de l'écriture de l'instantané %s", name, exc_info=future.exception())
+    return done
+
+
+def read(name):
+    """
+    Lit un instantané en mémoire projetée (memory-mapped).
+
+    Args:
+        name (str): Le nom de l'instantané.
+
+    Returns:
+        tuple: Le DataFrame et ses métadonnées, ou None si l'instantané est
+            absent ou illisible.
+    """
+    if not enabled():
+        return None
+    return read_frame(_path(name))
+
+
+def mark_served(name, connection_string, metadata):
+    """
+    Note qu'un instantané a été servi à la place d'une lecture de la base.
+
+    Args:
+        name (str): Le nom de l'instantané.
+        connection_string (str): La chaîne de connexion de la source.
+        metadata (dict): Les métadonnées de l'instantané servi.
+    """
+    with _served_lock:
+        _served[name] = (connection_string, metadata.get('created_at', 0))
+
+
+def clear_served(name):
+    """
+    Oublie un instantané servi, une fois ses données actualisées.
+
+    Args:
+        name (str): Le nom de l'instantané.
+    """
+    with _served_lock:
+        _served.pop(name, None)
+
+
+def oldest_served(connection_string):
+    """
+    Retourne l'horodatage du plus ancien instantané servi pour une source.
+
+    Args:
+        connection_string (str): La chaîne de connexion de la source.
+
+    Returns:
+        float: Horodatage Unix, ou None si aucun instantané n'est servi.
+    """
+    with _served_lock:
+        times = [created_at for cs, created_at in _served.values() if cs == connection_string]
+    return min(times) if times else None
+
+
+def _prune():
+    try:
+        paths = [
+            os.path.join(SNAPSHOT_DIR, entry)
+            for entry in os.listdir(SNAPSHOT_DIR) if entry.endswith('.parquet')
+        ]
+    except OSError:
+        return
+    if len(paths) <= MAX_SNAPSHOTS:
+        return
+    paths.sort(key=os.path.getmtime)
+    for path in paths[:len(paths) - MAX_SNAPSHOTS]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
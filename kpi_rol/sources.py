@@ -0,0 +1,144 @@
+"""
+Déclaration des sources de données du tableau de bord.
+
+Les sources sont déclarées une seule fois pour le processus, sans dépendance à
+l'interface Streamlit : le script du tableau de bord et le moteur de calcul
+des KPI (voir kpi_rol.engine) lisent les mêmes tables, avec les mêmes
+colonnes, filtres permanents, transformations et cubes d'agrégats.
+"""
+from datetime import datetime
+
+from kpi_rol.chunks import DEFAULT_CHUNKSIZE
+from kpi_rol.cost_centres import map_cost_centres
+from kpi_rol.data import DataSource
+from kpi_rol.query import Between, IsIn, NotLike
+from kpi_rol.rollups import DailyRollup
+from kpi_rol.transforms import index_by_date
+
+
+def create_connection_string(server, database, username, password):
+    """
+    Crée une chaîne de connexion pour la base de données SQL Server.
+
+    Args:
+        server (str): Nom du serveur.
+        database (str): Nom de la base de données.
+        username (str): Nom d'utilisateur.
+        password (str): Mot de passe.
+
+    Returns:
+        str: Chaîne de connexion formatée.
+    """
+    return (
+        f'DRIVER={{ODBC Driver 17 for SQL Server}};'
+        f'SERVER={server};'
+        f'DATABASE={database};'
+        f'UID={username};'
+        f'PWD={password};'
+        'TrustServerCertificate=yes;'
+    )
+
+
+# Chaînes de connexion
+connection_string_bi_staging = create_connection_string(
+    server='cpopapbi01',
+    database='BI_Staging',
+    username='PowerBI',
+    password='Stj2020!'
+)
+
+connection_string_bi_prep = create_connection_string(
+    server='cpopapbi01',
+    database='BI_PREP',
+    username='PowerBI',
+    password='Stj2020!'
+)
+
+connection_string_prod_pdtazure = create_connection_string(
+    server='SRV-SQLPROD-01',
+    database='PROD_PDTAzure',
+    username='PDTViewer',
+    password='PDTViewer'
+)
+
+# Durée de vie des résultats en cache par section (en secondes)
+TTL_RTS = 15 * 60
+TTL_BT = 15 * 60
+TTL_PERTE_TEMPS = 5 * 60
+TTL_PRODUCTION = 60 * 60
+TTL_EAU = 60 * 60
+
+# Empreinte des tables quotidiennes, lue avant chaque actualisation : elles ne
+# changent qu'une fois par jour et ne sont relues que si le nombre de lignes, la
+# dernière date ou la somme de contrôle des lignes (corrections) a changé
+DAILY_TABLE_FINGERPRINT = ['COUNT_BIG(*)', 'MAX([Date])', 'CHECKSUM_AGG(BINARY_CHECKSUM(*))']
+
+source_rts = DataSource(
+    'rts',
+    connection_string_bi_staging,
+    'dbo.ROLDynawayWorksheetKPIRequest',
+    # Seules les colonnes utilisées par les sections sont transférées
+    columns=['REQUESTID', 'WORKORDER_ID', 'FUNCTIONAL_LOCATION', 'STAGEID', 'ACTUALSTART', 'REQUEST_TYPE'],
+    # Les BT sont exclus côté serveur ; le filtre sur STAGEID reste local,
+    # car l'étape d'une demande change au cours de sa vie
+    filters=[NotLike('WORKORDER_ID', 'BT-%')],
+    transform=map_cost_centres('FUNCTIONAL_LOCATION'),
+    ttl=TTL_RTS,
+    key='REQUESTID',
+    # Lecture par lots, convertie dès l'arrivée de chaque lot vers les types
+    # déclarés dans kpi_rol.schemas
+    chunksize=DEFAULT_CHUNKSIZE,
+    # Copie gardée triée par date pour le filtrage par plage de dates
+    order_by='ACTUALSTART',
+    # Demandes distinctes par jour, centre de coût et étape, pour le graphique
+    rollups={'etapes': DailyRollup('ACTUALSTART', by=['Centre de coût', 'STAGEID'], distinct='REQUESTID')},
+)
+source_bt = DataSource(
+    'bt',
+    connection_string_bi_staging,
+    'dbo.ROLDynawayWorksheetAll',
+    columns=['WORKORDER_ID', 'FUNCTIONALLOCATIONID', 'STAGEID', 'CREATEDDATETIME'],
+    transform=map_cost_centres('FUNCTIONALLOCATIONID'),
+    ttl=TTL_BT,
+    key='WORKORDER_ID',
+    chunksize=DEFAULT_CHUNKSIZE,
+    order_by='CREATEDDATETIME',
+    rollups={'etapes': DailyRollup('CREATEDDATETIME', by=['Centre de coût', 'STAGEID'])},
+)
+source_perte_temps = DataSource(
+    'perte_temps',
+    connection_string_prod_pdtazure,
+    'dbo.vPerteTempsExtraction',
+    # Colonnes utilisées par les sections 3 et 4
+    columns=['DateDebut', 'DureeSecondaire', 'Nom', 'Secteur', 'TypeCauses', 'ActionsInterventions'],
+    ttl=TTL_PERTE_TEMPS,
+    chunksize=DEFAULT_CHUNKSIZE,
+    order_by='DateDebut',
+    rollups={
+        # Par heure : le graphique les regroupe ensuite par jour ou par semaine
+        'durees': DailyRollup(
+            'DateDebut', by=['Secteur', 'Nom', 'TypeCauses'], sums=['DureeSecondaire'], freq='h'
+        ),
+    },
+)
+source_production = DataSource(
+    'production',
+    connection_string_bi_prep,
+    '[dbo].[Daily Production]',
+    filters=[IsIn('Secteur', ['Usine']), Between('Date', start=datetime(2022, 1, 1))],
+    transform=index_by_date('Date'),
+    ttl=TTL_PRODUCTION,
+    fingerprint=DAILY_TABLE_FINGERPRINT,
+)
+source_eau = DataSource(
+    'eau',
+    connection_string_bi_prep,
+    '[dbo].[Water Consumption]',
+    filters=[IsIn('Secteur', ['Usine']), Between('Date', start=datetime(2022, 1, 1))],
+    transform=index_by_date('Date'),
+    ttl=TTL_EAU,
+    fingerprint=DAILY_TABLE_FINGERPRINT,
+)
+
+# Toutes les sources, dans l'ordre des sections
+SOURCES = (source_rts, source_bt, source_perte_temps, source_production, source_eau)
@@ -0,0 +1,159 @@
+"""
+Magasin local des KPI précalculés, au format Parquet.
+
+Le moteur de calcul (voir kpi_rol.engine) y écrit les KPI d'une période : un
+répertoire par période, un fichier par KPI et un manifeste qui décrit le
+calcul. Le tableau de bord ne fait que lire le magasin. Une période recalculée
+est remplacée d'un bloc : un lecteur voit l'ancien calcul ou le nouveau, jamais
+un mélange des deux.
+
+Comme pour les instantanés (voir kpi_rol.snapshots), pyarrow est une
+dépendance optionnelle : s'il est absent, le magasin est désactivé.
+"""
+import json
+import os
+import shutil
+import time
+
+from kpi_rol import snapshots
+
+# Répertoire du magasin
+STORE_DIR = os.environ.get(
+    'KPI_ROL_KPI_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'kpi_store'),
+)
+# Nombre maximal de périodes conservées (les moins récemment calculées sont supprimées)
+MAX_PERIODS = 1000
+# Fichier décrivant le calcul d'une période
+MANIFEST = 'manifest.json'
+
+
+def enabled():
+    """
+    Indique si le magasin est disponible (pyarrow installé).
+    """
+    return snapshots.enabled()
+
+
+def period_name(start, end):
+    """
+    Calcule le nom d'une période.
+
+    Args:
+        start (datetime): Le début de la période (inclus).
+        end (datetime): La fin de la période (exclue).
+
+    Returns:
+        str: Le nom de la période (ex. '20241222T0000-20241223T0000').
+    """
+    return f'{start:%Y%m%dT%H%M}-{end:%Y%m%dT%H%M}'
+
+
+def _path(period, name=None):
+    directory = os.path.join(STORE_DIR, period)
+    return directory if name is None else os.path.join(directory, f'{name}.parquet')
+
+
+def write(start, end, results, metadata=None):
+    """
+    Enregistre les KPI d'une période, en remplaçant un calcul précédent.
+
+    Args:
+        start (datetime): Le début de la période (inclus).
+        end (datetime): La fin de la période (exclue).
+        results (dict): Les KPI calculés : nom -> pd.DataFrame.
+        metadata (dict, optional): Informations ajoutées au manifeste
+            (sérialisables en JSON).
+
+    Returns:
+        str: Le nom de la période.
+
+    Raises:
+        RuntimeError: Si pyarrow n'est pas installé.
+    """
+    if not enabled():
+        raise RuntimeError("Le magasin de KPI nécessite pyarrow.")
+    period = period_name(start, end)
+    final = _path(period)
+    temporary = f'{final}.{os.getpid()}.tmp'
+    shutil.rmtree(temporary, ignore_errors=True)
+    os.makedirs(temporary)
+    for name, df in results.items():
+        # Les colonnes issues d'un pivot (étapes, noms) sont catégorielles, ce
+        # que le schéma Parquet ne restitue pas : elles sont enregistrées en texte
+        df = df.set_axis(df.columns.astype(object), axis=1)
+        snapshots.write_frame(df, os.path.join(temporary, f'{name}.parquet'))
+    manifest = dict(
+        metadata or {},
+        period=period,
+        start=start.isoformat(),
+        end=end.isoformat(),
+        computed_at=time.time(),
+        kpis={name: len(df) for name, df in results.items()},
+    )
+    with open(os.path.join(temporary, MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False, default=str)
+    if os.path.exists(final):
+        previous = f'{final}.{os.getpid()}.old'
+        os.replace(final, previous)
+        os.replace(temporary, final)
+        shutil.rmtree(previous, ignore_errors=True)
+    else:
+        os.replace(temporary, final)
+    _prune()
+    return period
+
+
+def periods():
+    """
+    Liste les périodes calculées, de la plus récente à la plus ancienne.
+
+    Returns:
+        list: Le manifeste de chaque période (dict avec au moins 'period',
+            'start', 'end', 'computed_at' et 'kpis').
+    """
+    try:
+        entries = os.listdir(STORE_DIR)
+    except OSError:
+        return []
+    manifests = []
+    for entry in entries:
+        # Les répertoires en cours d'écriture ou de remplacement sont ignorés
+        if '.' in entry:
+            continue
+        try:
+            with open(os.path.join(STORE_DIR, entry, MANIFEST), encoding='utf-8') as f:
+                manifests.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return sorted(manifests, key=lambda manifest: (manifest['end'], manifest['start']), reverse=True)
+
+
+def read(period, name):
+    """
+    Lit un KPI d'une période.
+
+    Args:
+        period (str): Le nom de la période (voir period_name).
+        name (str): Le nom du KPI.
+
+    Returns:
+        pd.DataFrame: Le KPI, ou None s'il est absent ou illisible.
+    """
+    frame = snapshots.read_frame(_path(period, name))
+    return None if frame is None else frame[0]
+
+
+def _prune():
+    try:
+        paths = [
+            os.path.join(STORE_DIR, entry)
+            for entry in os.listdir(STORE_DIR) if '.' not in entry
+        ]
+    except OSError:
+        return
+    if len(paths) <= MAX_PERIODS:
+        return
+    paths.sort(key=os.path.getmtime)
+    for path in paths[:len(paths) - MAX_PERIODS]:
+        shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,425 @@
+"""
+Synchronisation incrémentale des tables Dynaway.
+
+Chaque table synchronisée conserve une copie locale en mémoire. À chaque
+chargement, seules les lignes dont l'horodatage de modification ou de création
+est postérieur au dernier filigrane (watermark) sont lues puis fusionnées par
+clé. Une relecture complète périodique permet de refléter les suppressions.
+Une table dont la clé n'est pas unique ne peut pas être fusionnée par clé :
+elle est relue entièrement à chaque mise à jour.
+
+La copie locale est enregistrée dans un instantané sur disque après chaque
+mise à jour qui la modifie ; au redémarrage du processus, elle en est
+restaurée et seules les lignes modifiées depuis sont relues.
+"""
+import logging
+import threading
+import time
+
+import pandas as pd
+
+from kpi_rol import loader, snapshots
+from kpi_rol.chunks import concat_chunks
+from kpi_rol.query import Between, build_select
+from kpi_rol.schemas import schema_for
+from kpi_rol.transforms import sort_by
+
+logger = logging.getLogger(__name__)
+
+# Colonnes d'horodatage utilisables comme filigrane, par ordre de préférence
+WATERMARK_CANDIDATES = ('MODIFIEDDATETIME', 'CREATEDDATETIME')
+# Délai entre deux relectures complètes (en secondes)
+DEFAULT_RECONCILE_INTERVAL = 6 * 60 * 60
+
+
+def _changed_rows(delta, current, key):
+    """
+    Retourne les lignes lues qui diffèrent de la copie locale.
+
+    Le filtre du filigrane est inclusif : chaque lecture incrémentale relit
+    au moins les lignes du dernier horodatage, identiques à la copie locale.
+
+    Args:
+        delta (pd.DataFrame): Les lignes lues, à clés uniques.
+        current (pd.DataFrame): Les lignes de la copie locale de mêmes clés,
+            à clés uniques.
+        key (str): La colonne identifiant une ligne.
+
+    Returns:
+        pd.DataFrame: Les lignes nouvelles ou modifiées de delta.
+    """
+    previous = current.set_index(key).reindex(delta[key])
+    changed = ~delta[key].isin(current[key]).to_numpy()
+    for column in delta.columns.drop(key):
+        if column not in previous.columns:
+            return delta
+        # Comparaison des valeurs elles-mêmes, quel que soit le type des colonnes
+        new = delta[column].astype(object).reset_index(drop=True)
+        old = previous[column].astype(object).reset_index(drop=True)
+        same = (new == old) | (new.isna() & old.isna())
+        changed |= ~same.to_numpy(dtype=bool)
+    return delta[changed]
+
+
+class IncrementalTable:
+    """
+    Copie locale d'une table, mise à jour par lectures incrémentales.
+
+    Args:
+        connection_string (str): La chaîne de connexion à la base de données.
+        table (str): Le nom qualifié de la table (ex. 'dbo.ROLDynawayWorksheetAll').
+        key (str): La colonne identifiant une ligne, utilisée pour la fusion.
+            Ses valeurs doivent être uniques ; sinon, chaque mise à jour est
+            une relecture complète.
+        columns (list, optional): Les colonnes à conserver. Si None, toutes.
+        filters (list): Filtres permanents appliqués côté serveur. Ils ne doivent
+            porter que sur des valeurs qui ne changent pas au cours de la vie
+            d'une ligne, sans quoi la copie locale garderait des lignes périmées
+            jusqu'à la prochaine relecture complète.
+        transform (callable, optional): Transformation appliquée une seule fois
+            à chaque lot de lignes lu, avant la fusion dans la copie locale.
+        order_by (str, optional): Colonne de dates selon laquelle la copie
+            locale est gardée triée (voir kpi_rol.transforms.sort_by).
+        rollups (dict, optional): Cubes d'agrégats tenus à jour avec la copie
+            locale, par nom (voir kpi_rol.rollups.DailyRollup).
+        watermark_candidates (tuple): Colonnes d'horodatage candidates.
+        reconcile_interval (float): Délai entre deux relectures complètes, en secondes.
+    """
+
+    def __init__(
+        self,
+        connection_string,
+        table,
+        key,
+        columns=None,
+        filters=(),
+        transform=None,
+        order_by=None,
+        rollups=None,
+        watermark_candidates=WATERMARK_CANDIDATES,
+        reconcile_interval=DEFAULT_RECONCILE_INTERVAL,
+    ):
+        self.connection_string = connection_string
+        self.table = table
+        self.key = key
+        self.columns = columns
+        self.filters = list(filters)
+        self.transform = transform
+        self.order_by = order_by
+        self.rollups = dict(rollups or {})
+        self.cubes = {}
+        self.watermark_candidates = watermark_candidates
+        self.reconcile_interval = reconcile_interval
+        self.df = None
+        self.watermark_column = None
+        self._select_columns = None
+        self.last_full_load = None
+        self.last_full_load_wall = None
+        self.last_poll = None
+        # Horodatage Unix de la dernière interrogation réussie de la base
+        self.last_refresh = None
+        self._force_full = False
+        # Clé unique dans la copie locale (None tant qu'elle n'est pas vérifiée) :
+        # condition des lectures incrémentales
+        self._unique_key = None
+        self._restored = False
+        self._updating = False
+        self._updating_lock = threading.Lock()
+        self.snapshot_name = 'table-' + snapshots.snapshot_name(connection_string, table)
+        self._lock = threading.Lock()
+
+    def _config(self):
+        # Configuration dont dépend le contenu de la copie locale, y compris les
+        # types déclarés pour la table : une copie aux anciens types est relue
+        return repr((
+            self.columns,
+            [filtre.to_sql() for filtre in self.filters],
+            self.order_by,
+            sorted(schema_for(self.table).items()),
+        ))
+
+    def _restore(self):
+        snapshot = snapshots.read(self.snapshot_name)
+        if snapshot is None:
+            return
+        df, metadata = snapshot
+        if metadata.get('config') != self._config():
+            return
+        self.cubes = self._build_cubes(df)
+        self.df = df
+        self._unique_key = self._check_key(df)
+        self.watermark_column = metadata.get('watermark_column')
+        self._select_columns = metadata.get('select_columns')
+        self.last_full_load_wall = metadata.get('full_load_at', 0)
+        self.last_full_load = time.monotonic() - max(0, time.time() - self.last_full_load_wall)
+        snapshots.mark_served(self.snapshot_name, self.connection_string, metadata)
+
+    def _save(self):
+        snapshots.clear_served(self.snapshot_name)
+        snapshots.write_async(self.snapshot_name, self.df, {
+            'table': self.table,
+            'config': self._config(),
+            'watermark_column': self.watermark_column,
+            'select_columns': self._select_columns,
+            'full_load_at': self.last_full_load_wall,
+        })
+
+    def _resolve_columns(self, fetch):
+        # Lit la structure de la table pour retenir les colonnes existantes,
+        # y compris la colonne de filigrane
+        if self.columns is None:
+            return True
+        probe = fetch(f"SELECT * FROM {self.table} WHERE 1 = 0;", None)
+        if probe is None:
+            return False
+        watermark = next(
+            (column for column in self.watermark_candidates if column in probe.columns), None
+        )
+        columns = [column for column in self.columns if column in probe.columns]
+        if watermark is not None and watermark not in columns:
+            columns.append(watermark)
+        self._select_columns = columns
+        return True
+
+    def _transform(self, df):
+        return df if self.transform is None else self.transform(df)
+
+    def _order(self, df):
+        return df if self.order_by is None else sort_by(self.order_by)(df)
+
+    def _build_cubes(self, df):
+        return {name: rollup.build(df) for name, rollup in self.rollups.items()}
+
+    def _check_key(self, df):
+        duplicates = int(df[self.key].duplicated().sum())
+        # Signalé une fois, et non à chaque relecture
+        if duplicates and self._unique_key is not False:
+            logger.error(
+                "La clé %s de la table %s n'est pas unique (%d lignes en double) : "
+                "la table sera relue entièrement à chaque mise à jour",
+                self.key, self.table, duplicates,
+            )
+        return not duplicates
+
+    def _watermark(self):
+        values = pd.to_datetime(self.df[self.watermark_column], errors='coerce')
+        watermark = values.max()
+        return None if pd.isna(watermark) else watermark.to_pydatetime()
+
+    def invalidate(self):
+        """
+        Force une relecture complète au prochain chargement.
+        """
+        self._force_full = True
+        self._select_columns = None
+        self._restored = True
+
+    def _needs_full_load(self, now):
+        return (
+            self._force_full
+            or self.df is None
+            or self.watermark_column is None
+            or not self._unique_key
+            or now - self.last_full_load > self.reconcile_interval
+        )
+
+    def _load_full(self, fetch, now):
+        if self._select_columns is None and not self._resolve_columns(fetch):
+            return False
+        query, params = build_select(self.table, self._select_columns, self.filters)
+        df = fetch(query, params or None)
+        if df is None:
+            return False
+        df = self._order(self._transform(df))
+        if self.df is not None and df.equals(self.df):
+            # Relecture sans changement : la copie locale et son instantané sont gardés
+            self.last_full_load = now
+            self.last_full_load_wall = time.time()
+            self._force_full = False
+            return False
+        self.cubes = self._build_cubes(df)
+        self.df = df
+        self._unique_key = self._check_key(df)
+        self.watermark_column = next(
+            (column for column in self.watermark_candidates if column in df.columns), None
+        )
+        self.last_full_load = now
+        self.last_full_load_wall = time.time()
+        self._force_full = False
+        return True
+
+    def _load_delta(self, fetch, now):
+        watermark = self._watermark()
+        if watermark is None:
+            self._force_full = True
+            return False
+        query, params = build_select(
+            self.table,
+            self._select_columns,
+            self.filters + [Between(self.watermark_column, start=watermark)],
+        )
+        delta = fetch(query, params)
+        if delta is None or delta.empty:
+            return False
+        delta = self._transform(delta)
+        if delta[self.key].duplicated().any():
+            # Clé répétée depuis la dernière lecture : la fusion par clé
+            # perdrait des lignes, la table est relue entièrement
+            return self._load_full(fetch, now)
+        modified = self.df[self.key].isin(delta[self.key])
+        delta = _changed_rows(delta, self.df[modified], self.key)
+        if delta.empty:
+            return False
+        modified = self.df[self.key].isin(delta[self.key])
+        # Seules les lignes des clés lues sont remplacées ; les cubes
+        # retranchent leurs anciennes versions
+        cubes = {
+            name: rollup.update(self.cubes[name], delta, self.df[modified])
+            for name, rollup in self.rollups.items()
+        }
+        merged = concat_chunks([self.df[~modified], delta]).reset_index(drop=True)
+        # Les nouvelles versions remplacent les anciennes d'un bloc
+        self.cubes, self.df = cubes, self._order(merged)
+        return True
+
+    def _due(self, min_interval):
+        return not snapshots.OFFLINE and (
+            self._force_full
+            or self.last_poll is None
+            or time.monotonic() - self.last_poll >= min_interval
+        )
+
+    def _update_in_background(self, fetch, min_interval):
+        with self._updating_lock:
+            if self._updating:
+                return
+            self._updating = True
+
+        def update():
+            try:
+                self.load(fetch, min_interval)
+            except Exception:
+                logger.exception("Échec de la mise à jour de la table %s", self.table)
+            finally:
+                self._updating = False
+
+        loader.submit(self.connection_string, update)
+
+    def load(self, fetch, min_interval=0, wait=True):
+        """
+        Met à jour la copie locale puis en retourne une vue.
+
+        La vue partage les données de la copie locale (copie superficielle) ;
+        avec le mode copy-on-write de pandas, la modifier n'altère pas la copie
+        locale.
+
+        Args:
+            fetch (callable): Fonction fetch(query, params) qui exécute une
+                requête et retourne un DataFrame, ou None en cas d'échec.
+            min_interval (float): Délai minimal entre deux interrogations de la
+                base, en secondes. En deçà, la copie locale est servie telle quelle.
+            wait (bool): Si False et qu'une copie locale existe, elle est servie
+                immédiatement et la mise à jour, si elle est due, est faite en
+                arrière-plan : l'appelant n'attend jamais la base.
+
+        Returns:
+            pd.DataFrame: Une vue de la table locale, ou None si elle n'a
+                jamais pu être chargée.
+
+        Raises:
+            snapshots.OfflineError: En mode hors ligne, si aucun instantané n'existe.
+            Exception: Une erreur de lecture, si aucune copie locale n'existe
+                encore. Sinon, l'erreur est journalisée et la copie locale,
+                éventuellement périmée, est servie.
+        """
+        if not wait:
+            if self.df is None and not self._restored:
+                with self._lock:
+                    if self.df is None and not self._restored:
+                        self._restored = True
+                        self._restore()
+            df = self.df
+            if df is not None:
+                if self._due(min_interval):
+                    self._update_in_background(fetch, min_interval)
+                return df.copy(deep=False)
+        with self._lock:
+            now = time.monotonic()
+            if self.df is None and not self._restored:
+                self._restored = True
+                self._restore()
+            if snapshots.OFFLINE:
+                if self.df is None:
+                    raise snapshots.OfflineError(f"Aucun instantané disponible pour la table {self.table}")
+            elif (
+                self.df is None
+                or self._force_full
+                or self.last_poll is None
+                or now - self.last_poll >= min_interval
+            ):
+                try:
+                    if self._needs_full_load(now):
+                        changed = self._load_full(fetch, now)
+                    else:
+                        changed = self._load_delta(fetch, now)
+                except Exception:
+                    if self.df is None:
+                        raise
+                    logger.exception("Échec de la mise à jour de la table %s", self.table)
+                else:
+                    if changed:
+                        self._save()
+                    self.last_refresh = time.time()
+                self.last_poll = now
+            return None if self.df is None else self.df.copy(deep=False)
+
+    def cube(self, name):
+        """
+        Retourne un cube d'agrégats de la copie locale, dans son dernier état.
+
+        Args:
+            name (str): Le nom du cube.
+
+        Returns:
+            pd.DataFrame: Le cube, ou None si la table n'a jamais été chargée.
+        """
+        # Lecture sans verrou : les cubes sont remplacés d'un bloc lors des mises à jour
+        return self.cubes.get(name)
+
+
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def get_incremental_table(connection_string, table, key, **kwargs):
+    """
+    Retourne la table synchronisée partagée pour une source et un nom de table.
+
+    Args:
+        connection_string (str): La chaîne de connexion à la base de données.
+        table (str): Le nom qualifié de la table.
+        key (str): La colonne identifiant une ligne.
+        **kwargs: Options transmises à IncrementalTable lors de la création.
+
+    Returns:
+        IncrementalTable: La table synchronisée, créée au premier appel.
+    """
+    with _tables_lock:
+        sync = _tables.get((connection_string, table))
+        if sync is None:
+            sync = IncrementalTable(connection_string, table, key, **kwargs)
+            _tables[(connection_string, table)] = sync
+        return sync
+
+
+def invalidate_tables(connection_string):
+    """
+    Force la relecture complète des tables synchronisées d'une source.
+
+    Args:
+        connection_string (str): La chaîne de connexion à la base de données.
+    """
+    with _tables_lock:
+        tables = [sync for (cs, _), sync in _tables.items() if cs == connection_string]
+    for sync in tables:
+        sync.invalidate()
@@ -0,0 +1,99 @@
+"""
+Transformations communes appliquées une seule fois à chaque jeu de données chargé.
+"""
+import pandas as pd
+
+
+def index_by_date(column):
+    """
+    Crée une transformation qui indexe le DataFrame par une colonne de dates.
+
+    Les lignes sans date valide sont supprimées et l'index est trié.
+
+    Args:
+        column (str): La colonne de dates.
+
+    Returns:
+        callable: La transformation df -> df.
+    """
+    def transform(df):
+        df = df.assign(**{column: pd.to_datetime(df[column], errors='coerce')})
+        return df.dropna(subset=[column]).set_index(column).sort_index()
+    return transform
+
+
+def sort_by(column):
+    """
+    Crée une transformation qui trie les lignes selon une colonne de dates.
+
+    Les dates manquantes sont placées en fin de tri, ce qui permet à
+    kpi_rol.dates.date_window d'extraire une plage par recherche dichotomique.
+
+    Args:
+        column (str): La colonne de tri.
+
+    Returns:
+        callable: La transformation df -> df.
+    """
+    def transform(df):
+        if column not in df.columns:
+            return df
+        if df[column].is_monotonic_increasing:
+            return df
+        return df.sort_values(column, kind='stable', na_position='last')
+    return transform
+
+
+def apply_dtypes(df, dtypes):
+    """
+    Convertit les colonnes d'un DataFrame vers des types compacts.
+
+    Les types reconnus sont 'category', 'datetime64[ns]', les types numériques
+    numpy (ex. 'float32', 'int32') et 'string'. Les valeurs non convertibles
+    deviennent manquantes ; les colonnes entières contenant des valeurs
+    manquantes utilisent le type entier nullable de pandas.
+
+    Args:
+        df (pd.DataFrame): Le DataFrame à convertir.
+        dtypes (dict): Le type cible de chaque colonne ; les colonnes absentes
+            du DataFrame sont ignorées.
+
+    Returns:
+        pd.DataFrame: Le DataFrame converti.
+    """
+    if not dtypes:
+        return df
+    converted = {}
+    for column, dtype in dtypes.items():
+        if column not in df.columns or df[column].dtype == dtype:
+            continue
+        values = df[column]
+        if dtype == 'category':
+            converted[column] = values.astype('category')
+        elif dtype.startswith('datetime64'):
+            converted[column] = pd.to_datetime(values, errors='coerce').astype(dtype)
+        elif dtype == 'string':
+            converted[column] = values.astype('string')
+        else:
+            numeric = pd.to_numeric(values, errors='coerce')
+            if dtype.startswith('int') and numeric.isna().any():
+                dtype = dtype.capitalize()
+            converted[column] = numeric.astype(dtype)
+    return df.assign(**converted) if converted else df
+
+
+def chain(*transforms):
+    """
+    Compose plusieurs transformations, appliquées dans l'ordre.
+
+    Args:
+        *transforms (callable): Les transformations df -> df.
+
+    Returns:
+        callable: La transformation composée.
+    """
+    def transform(df):
+        for step in transforms:
+            df = step(df)
+        return df
+    return transform
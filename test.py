@@ -1,593 +1,664 @@
 # Importations
 import streamlit as st
-import pyodbc
 import pandas as pd
-import plotly.express as px
+import time
 from datetime import datetime, timedelta
 
+from kpi_rol import loader, metrics, snapshots, store
+from kpi_rol.cache import query_cache
+from kpi_rol.cost_centres import default_cost_centres
+from kpi_rol.data import DataAccess
+from kpi_rol.dates import date_window, day_bounds
+from kpi_rol.db import read_query
+from kpi_rol.kpis import (
+    CLOSED_STAGES, UNPLANNED, downtime_series, downtime_summary, request_stages, with_duration_classes, work_order_stages
+)
+from kpi_rol.metrics import frame_payload
+from kpi_rol.preview import preview
+from kpi_rol.query import Between, IsIn, build_bounds, build_distinct
+from kpi_rol.scheduler import schedule_source, scheduler
+from kpi_rol.sources import (
+    SOURCES,
+    TTL_PERTE_TEMPS,
+    connection_string_bi_prep,
+    connection_string_bi_staging,
+    connection_string_prod_pdtazure,
+    source_bt,
+    source_eau,
+    source_perte_temps,
+    source_production,
+    source_rts,
+)
+from kpi_rol.sync import invalidate_tables
+
 # Fonctions
-def create_connection_string(server, database, username, password):
+def format_age(secondes):
     """
-    Crée une chaîne de connexion pour la base de données SQL Server.
+    Formate l'âge de données pour l'affichage.
 
     Args:
-        server (str): Nom du serveur.
-        database (str): Nom de la base de données.
-        username (str): Nom d'utilisateur.
-        password (str): Mot de passe.
+        secondes (float): L'âge en secondes.
+
+    Returns:
+        str: L'âge en minutes, en heures ou en jours (ex. '5 min', '3 h', '2 j').
+    """
+    minutes = int(secondes // 60)
+    if minutes < 60:
+        return f"{minutes} min"
+    if minutes < 24 * 60:
+        return f"{minutes // 60} h"
+    return f"{minutes // (24 * 60)} j"
+
+# Début du rendu, pour le panneau des mesures de performance
+debut_rendu = time.time()
+
+# Configuration de la page
+st.set_page_config(page_title="Page des KPIs")
+st.title("KPI Papier Rolland")
+st.subheader("Version 1.0 2024-12-23r")
+
+# Les chaînes de connexion et les sources de données (tables, colonnes,
+# filtres permanents, durées de vie, agrégats) sont déclarées dans
+# kpi_rol.sources, partagées avec le moteur de calcul des KPI (kpi_rol.engine)
+
+# Nombre maximal de points envoyés au navigateur par graphique
+MAX_POINTS_GRAPHIQUE = 5000
+
+# Actualisation manuelle des données par source
+sources_donnees = {
+    "BI_Staging (RTs et BT)": connection_string_bi_staging,
+    "PROD_PDTAzure (pertes de temps)": connection_string_prod_pdtazure,
+    "BI_PREP (production et eau)": connection_string_bi_prep,
+}
+st.sidebar.header("Actualiser les données")
+if snapshots.OFFLINE:
+    st.sidebar.warning("Mode hors ligne : les données proviennent des instantanés enregistrés.")
+etats_sources = {}
+for nom_source, connection_string in sources_donnees.items():
+    if st.sidebar.button(nom_source, key=f"actualiser_{nom_source}"):
+        query_cache.invalidate(connection_string)
+        invalidate_tables(connection_string)
+    # L'état de la source est affiché une fois les données chargées
+    etats_sources[connection_string] = st.sidebar.empty()
+mode_debogage = st.sidebar.toggle("Mesures de performance", key='mesures_performance')
+
+# Accès aux données pour ce rendu : chaque jeu n'est lu qu'une fois
+donnees = DataAccess(read_query)
+
+
+def load_perte_temps_options():
+    """
+    Lit les bornes de dates et les valeurs des sélecteurs de la section 3,
+    sans transférer la vue.
 
     Returns:
-        str: Chaîne de connexion formatée.
+        tuple: Les DataFrames des bornes, des secteurs et des noms.
     """
+    table_perte_temps = source_perte_temps.table
+    query_bornes, params_bornes = build_bounds(table_perte_temps, 'DateDebut')
+    query_secteurs, params_secteurs = build_distinct(table_perte_temps, 'Secteur')
+    query_noms, params_noms = build_distinct(table_perte_temps, 'Nom')
+    # Requêtes fixes : relues avec la source et enregistrées pour le mode hors ligne
+    options = dict(ttl=TTL_PERTE_TEMPS, tag=source_perte_temps.name, scheduled=True)
     return (
-        f'DRIVER={{ODBC Driver 17 for SQL Server}};'
-        f'SERVER={server};'
-        f'DATABASE={database};'
-        f'UID={username};'
-        f'PWD={password};'
-        'TrustServerCertificate=yes;'
+        read_query(query_bornes, connection_string_prod_pdtazure, params=params_bornes, **options),
+        read_query(query_secteurs, connection_string_prod_pdtazure, params=params_secteurs, **options),
+        read_query(query_noms, connection_string_prod_pdtazure, params=params_noms, **options),
     )
 
-def execute_query(query, connection_string):
+
+def load_non_planifie():
     """
-    Établit une connexion à la base de données et exécute la requête SQL fournie.
+    Lit les arrêts non planifiés des deux dernières années (section 4).
+
+    Returns:
+        pd.DataFrame: Les arrêts, ou None en cas d'échec.
+    """
+    date_aujourdhui = datetime.now().date()
+    date_max_retour = date_aujourdhui - timedelta(days=730)  # Deux ans en arrière
+    return donnees.load(
+        source_perte_temps,
+        filters=[
+            IsIn('Nom', [UNPLANNED]),
+            Between('DateDebut', *day_bounds(date_max_retour, date_aujourdhui)),
+        ],
+        # Fenêtre fixe de la section : relue par l'actualisation planifiée
+        scheduled=True,
+    )
+
+
+def load_or_error(source, filters=()):
+    """
+    Charge une source depuis le rendu et affiche l'erreur éventuelle.
 
     Args:
-        query (str): La requête SQL à exécuter.
-        connection_string (str): La chaîne de connexion à la base de données.
+        source (DataSource): La source à lire.
+        filters (list): Les filtres propres à la section.
 
     Returns:
-        pd.DataFrame: Le DataFrame contenant les résultats de la requête.
+        pd.DataFrame: Les lignes demandées, ou None en cas d'échec.
     """
     try:
-        conn = pyodbc.connect(connection_string)
-        df = pd.read_sql(query, conn)
-        conn.close()
-        return df
+        return donnees.load(source, filters)
     except Exception as e:
         st.error(f"Erreur lors de l'exécution de la requête : {e}")
         return None
 
-# Configuration de la page
-st.set_page_config(page_title="Page des KPIs")
-st.title("KPI Papier Rolland")
-st.subheader("Version 1.0 2024-12-23r")
-
-# Chaînes de connexion
-connection_string_bi_staging = create_connection_string(
-    server='cpopapbi01',
-    database='BI_Staging',
-    username='PowerBI',
-    password='Stj2020!'
-)
 
-connection_string_bi_prep = create_connection_string(
-    server='cpopapbi01',
-    database='BI_PREP',
-    username='PowerBI',
-    password='Stj2020!'
-)
+def filtres_zone(cle):
+    """
+    Affiche un sélecteur de zone (M6, M7, M8...) et retourne le filtre correspondant.
 
-connection_string_prod_pdtazure = create_connection_string(
-    server='SRV-SQLPROD-01',
-    database='PROD_PDTAzure',
-    username='PDTViewer',
-    password='PDTViewer'
-)
+    Les zones et leurs centres de coût sont déclarés dans kpi_rol/cost_centres.json.
 
+    Args:
+        cle (str): La clé du widget.
 
+    Returns:
+        list: Le filtre des centres de coût de la zone choisie, ou aucun filtre.
+    """
+    zones = default_cost_centres().areas
+    zone = st.selectbox("Sélectionnez une zone :", ["Toutes les zones", *zones], key=cle)
+    return [IsIn('Centre de coût', zones[zone])] if zone in zones else []
 
-def mappingBT(df_rts):
-    # Vérifier si la colonne 'FUNCTIONAL_LOCATION' existe dans le DataFrame
-    if 'FUNCTIONALLOCATIONID' in df_rts.columns:
-        # Extraire les trois premiers caractères de 'FUNCTIONAL_LOCATION'
-        df_rts['Prefix'] = df_rts['FUNCTIONALLOCATIONID'].str[:3]
-    
-        # Dictionnaire de mappage des préfixes aux centres de coût avec corrections orthographiques
-        mapping = {
-            '080': 'Recyclage général',
-            '090': 'Plan de pigment',
-            '150': 'Préparation des pâtes M6',
-            '160': 'Préparation des pâtes M6',
-            '170': 'Préparation des pâtes M7',
-            '180': 'Préparation des pâtes M8',
-            '190': 'Adjuvant',
-            '200': 'Département de production général',
-            '220': 'Rebobineuse de reprise',
-            '250': 'Récupération et bobineuse M6',
-            '260': 'M6',
-            '270': 'M7',
-            '280': 'M8',
-            '300': 'Finition B',
-            '400': 'Finition A',
-            '500': 'Centrale thermique',
-            '510': 'Alimentation eau fraîche',
-            '520': 'Alimentation électrique',
-            '540': 'Département entretien',
-            '636': 'Recyclage des huiles usées',
-            '660': 'Contrôle qualité',
-            '675': 'Laboratoire technique',
-            '760': 'Bâtiment',
-            'P10': 'Projet'
-        }
-    
-        # Appliquer le mappage pour créer la colonne 'Centre de coût'
-        df_rts['Centre de coût'] = df_rts['Prefix'].map(mapping)
-    
-        # Supprimer la colonne temporaire 'Prefix'
-        df_rts.drop(columns=['Prefix'], inplace=True)
-    
-        # Afficher le DataFrame mis à jour
-        st.dataframe(df_rts)
-    else:
-        st.error("La colonne 'FUNCTIONAL_LOCATION' est absente du DataFrame.")
-    
-    
-    
-    return df_rts
 
 # Section 1: Données des RTs
-st.header("1. Données des RTs")
-st.write(
-    "Cette section présente les enregistrements de la table 'ROLDynawayWorksheetKPIRequest' de la base de données 'BI_Staging'."
-)
+def render_rts(df_rtsnum1):
+    if df_rtsnum1 is not None:
+        # Le centre de coût est calculé lors du chargement à partir de 'FUNCTIONAL_LOCATION'
+        if 'Centre de coût' not in df_rtsnum1.columns:
+            st.error("La colonne 'FUNCTIONAL_LOCATION' est absente du DataFrame.")
+        if 'WORKORDER_ID' not in df_rtsnum1.columns:
+            st.error("La colonne 'WORKORDER_ID' est absente du DataFrame.")
+
+        # Appliquer les filtres initiaux
+        if {'WORKORDER_ID', 'STAGEID'}.issubset(df_rtsnum1.columns):
+            # Les BT sont déjà exclus par la requête de synchronisation
+            filtre_stageid = ~df_rtsnum1['STAGEID'].isin(CLOSED_STAGES)
+            df_rts = df_rtsnum1[filtre_stageid]
+
+            st.write("Aperçu des données de RTs :")
+            preview(df_rts, key='apercu_rts')
+            # Vérifier la présence des colonnes nécessaires
+            required_columns = {'Centre de coût', 'STAGEID', 'REQUESTID', 'ACTUALSTART', 'REQUEST_TYPE'}
+            if not required_columns.issubset(df_rts.columns):
+                st.error(f"Les colonnes suivantes sont manquantes dans les données : {required_columns - set(df_rts.columns)}")
+            else:
+                # Sélecteur de plage de dates ('ACTUALSTART' est converti au chargement ;
+                # les dates invalides sont écartées par le filtre de dates)
+                min_date = df_rts['ACTUALSTART'].min().date()
+                max_date = df_rts['ACTUALSTART'].max().date()
+                date_range = st.slider(
+                    "Sélectionnez une plage de dates :",
+                    min_value=min_date,
+                    max_value=max_date,
+                    value=(min_date, max_date),
+                    format="YYYY-MM-DD",
+                    key='plage_dates_rts'
+                )
+                filtres = filtres_zone('zone_rts')
 
-# Exécuter la requête pour obtenir les données
-query_rts = "SELECT * FROM dbo.ROLDynawayWorksheetKPIRequest;"
-df_rtsnum1 = execute_query(query_rts, connection_string_bi_staging)
-
-if df_rtsnum1 is not None:
-    # Vérifier si la colonne 'FUNCTIONAL_LOCATION' existe dans le DataFrame
-    if 'FUNCTIONAL_LOCATION' in df_rtsnum1.columns:
-        # Extraire les trois premiers caractères de 'FUNCTIONAL_LOCATION'
-        df_rtsnum1['Prefix'] = df_rtsnum1['FUNCTIONAL_LOCATION'].str[:3]
-        
-        # Dictionnaire de mappage des préfixes aux centres de coût
-        mapping = {
-            '080': 'Recyclage général',
-            '090': 'Plan de pigment',
-            '150': 'Préparation des pâtes M6',
-            '160': 'Préparation des pâtes M6',
-            '170': 'Préparation des pâtes M7',
-            '180': 'Préparation des pâtes M8',
-            '190': 'Adjuvant',
-            '200': 'Département de production général',
-            '220': 'Rebobineuse de reprise',
-            '250': 'Récupération et bobineuse M6',
-            '260': 'M6',
-            '270': 'M7',
-            '280': 'M8',
-            '300': 'Finition B',
-            '400': 'Finition A',
-            '500': 'Centrale thermique',
-            '510': 'Alimentation eau fraîche',
-            '520': 'Alimentation électrique',
-            '540': 'Département entretien',
-            '636': 'Recyclage des huiles usées',
-            '660': 'Contrôle qualité',
-            '675': 'Laboratoire technique',
-            '760': 'Bâtiment',
-            'P10': 'Projet'
-        }
-
-        # Appliquer le mappage
-        df_rtsnum1['Centre de coût'] = df_rtsnum1['Prefix'].map(mapping)
-        df_rtsnum1.drop(columns=['Prefix'], inplace=True)
-    else:
-        st.error("La colonne 'FUNCTIONAL_LOCATION' est absente du DataFrame.")
+                # Compter les demandes distinctes de la plage à partir des agrégats quotidiens
+                cube = donnees.rollup(source_rts, 'etapes', filtres)
+                df_pivot = request_stages(source_rts.rollups['etapes'], cube, date_range[0], date_range[1])
 
-    # S'assurer que 'WORKORDER_ID' est de type chaîne
-    if 'WORKORDER_ID' in df_rtsnum1.columns:
-        df_rtsnum1['WORKORDER_ID'] = df_rtsnum1['WORKORDER_ID'].astype(str)
-    else:
-        st.error("La colonne 'WORKORDER_ID' est absente du DataFrame.")
-    
-    # Appliquer les filtres initiaux
-    if {'WORKORDER_ID', 'STAGEID'}.issubset(df_rtsnum1.columns):
-        filtre_workorder = ~df_rtsnum1['WORKORDER_ID'].str.startswith('BT-')
-        valeurs_exclues = ['ANNULE', 'COMPLETE', 'FERMER']
-        filtre_stageid = ~df_rtsnum1['STAGEID'].isin(valeurs_exclues)
-        df_rts = df_rtsnum1[filtre_workorder & filtre_stageid]
-
-        st.write("Aperçu des données de RTs :")
-        st.dataframe(df_rts)
-        # Vérifier la présence des colonnes nécessaires
-        required_columns = {'Centre de coût', 'STAGEID', 'REQUESTID', 'ACTUALSTART', 'REQUEST_TYPE'}
-        if not required_columns.issubset(df_rts.columns):
-            st.error(f"Les colonnes suivantes sont manquantes dans les données : {required_columns - set(df_rts.columns)}")
+                if not df_pivot.empty:
+                    # Affichage du graphique
+                    st.bar_chart(frame_payload(df_pivot))
+                else:
+                    st.write("Aucune donnée disponible pour les sélections effectuées.")
         else:
-            # Convertir 'ACTUALSTART' en datetime
-            df_rts['ACTUALSTART'] = pd.to_datetime(df_rts['ACTUALSTART'], errors='coerce')
+            st.error("Les colonnes nécessaires pour le filtrage sont absentes.")
+    else:
+        st.error("Aucune donnée n'a été chargée depuis la base de données.")
 
-            # Supprimer les lignes avec des dates invalides
-            df_rts.dropna(subset=['ACTUALSTART'], inplace=True)
 
-            # Sélecteur de plage de dates
-            min_date = df_rts['ACTUALSTART'].min().date()
-            max_date = df_rts['ACTUALSTART'].max().date()
+# Section 2: Données de BT
+def render_bt(df_bt):
+    if df_bt is not None:
+        st.write("Aperçu des données de BT :")
+        if 'Centre de coût' in df_bt.columns:
+            preview(df_bt, key='apercu_bt')
+        else:
+            st.error("La colonne 'FUNCTIONALLOCATIONID' est absente du DataFrame.")
+
+        # Vérifier la présence des colonnes nécessaires
+        required_columns = {'CREATEDDATETIME', 'Centre de coût', 'STAGEID'}
+        if not required_columns.issubset(df_bt.columns):
+            st.error(f"Les colonnes suivantes sont manquantes dans les données : {required_columns - set(df_bt.columns)}")
+        else:
+            # Ajouter un sélecteur de plage de dates ('CREATEDDATETIME' est converti au chargement)
+            min_date = df_bt['CREATEDDATETIME'].min().date()
+            max_date = df_bt['CREATEDDATETIME'].max().date()
             date_range = st.slider(
                 "Sélectionnez une plage de dates :",
                 min_value=min_date,
                 max_value=max_date,
                 value=(min_date, max_date),
-                format="YYYY-MM-DD"
+                format="YYYY-MM-DD",
+                key='plage_dates_bt'
             )
+            filtres = filtres_zone('zone_bt')
 
-            # Filtrer les données
-            df_filtre = df_rts[
-                (df_rts['ACTUALSTART'].dt.date >= date_range[0]) &
-                (df_rts['ACTUALSTART'].dt.date <= date_range[1])
-            ]
-
-            if not df_filtre.empty:
-                # Grouper les données
-                df_grouped = df_filtre.groupby(['Centre de coût', 'STAGEID']).agg(
-                    Nombre_Occurrences=('REQUESTID', 'nunique')
-                ).reset_index()
-
-                # Pivot et affichage du graphique
-                df_pivot = df_grouped.pivot(index='Centre de coût', columns='STAGEID', values='Nombre_Occurrences').fillna(0)
-                st.bar_chart(df_pivot)
-            else:
-                st.write("Aucune donnée disponible pour les sélections effectuées.")
-    else:
-        st.error("Les colonnes nécessaires pour le filtrage sont absentes.")
-else:
-    st.error("Aucune donnée n'a été chargée depuis la base de données.")
-    
-
+            # Regrouper les BT de la plage par Centre de Coût et STAGEID à partir des agrégats quotidiens
+            # (table pivot, pour un affichage clair dans un graphique)
+            cube = donnees.rollup(source_bt, 'etapes', filtres)
+            pivot_table = work_order_stages(source_bt.rollups['etapes'], cube, date_range[0], date_range[1])
 
+            # Afficher le graphique
+            st.bar_chart(frame_payload(pivot_table))
 
 
-# Section 2: Données de BT 
-st.header("2. Données de BT")
-st.write(
-    "Cette section présente les enregistrements de la table 'ROLDynawayWorksheetAll' de la base de données 'BI_Staging'."
-)
-
-query_bt = "SELECT * FROM dbo.ROLDynawayWorksheetAll;"
-df_bt = execute_query(query_bt, connection_string_bi_staging)
-
-if df_bt is not None:
-    st.write("Aperçu des données de BT :")
-    df_bt=mappingBT(df_bt)
-
-    # Vérifier la présence des colonnes nécessaires
-    required_columns = {'CREATEDDATETIME', 'Centre de coût', 'STAGEID'}
-    if not required_columns.issubset(df_bt.columns):
-        st.error(f"Les colonnes suivantes sont manquantes dans les données : {required_columns - set(df_bt.columns)}")
-    else:
-        # Convertir 'CREATEDDATETIME' en datetime
-        df_bt['CREATEDDATETIME'] = pd.to_datetime(df_bt['CREATEDDATETIME'], errors='coerce')
-
-        # Supprimer les lignes avec des dates invalides
-        df_bt = df_bt.dropna(subset=['CREATEDDATETIME'])
-
-        # Ajouter un sélecteur de plage de dates
-        min_date = df_bt['CREATEDDATETIME'].min().date()
-        max_date = df_bt['CREATEDDATETIME'].max().date()
-        date_range = st.slider(
-            "Sélectionnez une plage de dates :",
-            min_value=min_date,
-            max_value=max_date,
-            value=(min_date, max_date),
-            format="YYYY-MM-DD"
-        )
-
-        # Filtrer les données selon la plage de dates sélectionnée
-        df_bt = df_bt[(df_bt['CREATEDDATETIME'].dt.date >= date_range[0]) & (df_bt['CREATEDDATETIME'].dt.date <= date_range[1])]
-
-        # Regrouper les données par Centre de Coût et STAGEID
-        grouped_data = df_bt.groupby(["Centre de coût", "STAGEID"]).size().reset_index(name="Occurrences")
-
-        # Créer une table pivot pour un affichage clair dans un graphique
-        pivot_table = grouped_data.pivot(index="Centre de coût", columns="STAGEID", values="Occurrences").fillna(0)
-
-        # Afficher le graphique
-        st.bar_chart(pivot_table)
-    
-    
-
 # Section 3: Données de Perte de Temps
-st.header("3. Données de Perte de Temps")
-st.write(
-    "Cette section présente les enregistrements de la vue 'vPerteTempsExtraction' de la base de données 'PROD_PDTAzure'."
-)
+def render_perte_temps(options):
+    df_bornes, df_secteurs, df_noms = options
+    min_date = pd.to_datetime(df_bornes['min_value'].iloc[0], errors='coerce')
+    max_date = pd.to_datetime(df_bornes['max_value'].iloc[0], errors='coerce')
 
-query_perte_temps = "SELECT * FROM dbo.vPerteTempsExtraction;"
-df_perte_temps = execute_query(query_perte_temps, connection_string_prod_pdtazure)
+    if pd.isna(min_date) or pd.isna(max_date):
+        st.write("Aucune donnée disponible.")
+        return
 
-if df_perte_temps is not None:
-    st.write("Aperçu des données de perte de temps :")
-    st.dataframe(df_perte_temps)
-
-    # Vérifier la présence des colonnes nécessaires
-    required_columns = {'DateDebut', 'DureeSecondaire', 'Nom', 'Secteur'}
-    if not required_columns.issubset(df_perte_temps.columns):
-        st.error(f"Les colonnes suivantes sont manquantes dans les données : {required_columns - set(df_perte_temps.columns)}")
-    else:
-        # Convertir 'DateDebut' en datetime
-        df_perte_temps['DateDebut'] = pd.to_datetime(df_perte_temps['DateDebut'], errors='coerce')
-
-        # Supprimer les lignes avec des dates invalides
-        df_perte_temps = df_perte_temps.dropna(subset=['DateDebut'])
+    # Ajouter un sélecteur multiple pour la colonne 'Secteur'
+    secteurs = df_secteurs['Secteur'].dropna()
+    secteurs_selectionnes = st.multiselect(
+        'Sélectionnez un ou plusieurs secteurs :', secteurs, key='secteurs_perte_temps'
+    )
 
-        # Ajouter un sélecteur multiple pour la colonne 'Secteur'
-        secteurs = df_perte_temps['Secteur'].unique()
-        secteurs_selectionnes = st.multiselect('Sélectionnez un ou plusieurs secteurs :', secteurs)
+    # Ajouter un sélecteur multiple pour la colonne 'Nom'
+    noms = df_noms['Nom'].dropna()
+    noms_selectionnes = st.multiselect(
+        'Sélectionnez un ou plusieurs noms :', noms, key='noms_perte_temps'
+    )
 
-        # Ajouter un sélecteur multiple pour la colonne 'Nom'
-        noms = df_perte_temps['Nom'].unique()
-        noms_selectionnes = st.multiselect('Sélectionnez un ou plusieurs noms :', noms)
+    # Ajouter un sélecteur de plage de dates
+    date_range = st.slider(
+        "Sélectionnez une plage de dates :",
+        min_value=min_date.date(),
+        max_value=max_date.date(),
+        value=(min_date.date(), max_date.date()),
+        format="YYYY-MM-DD",
+        key='plage_dates_perte_temps'
+    )
 
-        # Ajouter un sélecteur de plage de dates
-        min_date = df_perte_temps['DateDebut'].min().date()
-        max_date = df_perte_temps['DateDebut'].max().date()
-        date_range = st.slider(
-            "Sélectionnez une plage de dates :",
-            min_value=min_date,
-            max_value=max_date,
-            value=(min_date, max_date),
-            format="YYYY-MM-DD"
-        )
+    # Ne lire que les lignes nécessaires aux sélections
+    filtres = [
+        IsIn('Secteur', secteurs_selectionnes),
+        IsIn('Nom', noms_selectionnes),
+        Between('DateDebut', *day_bounds(date_range[0], date_range[1])),
+    ]
+    df_filtre = load_or_error(source_perte_temps, filters=filtres)
 
-        # Filtrer les données en fonction des sélections
-        df_filtre = df_perte_temps[
-            (df_perte_temps['Secteur'].isin(secteurs_selectionnes) if secteurs_selectionnes else True) &
-            (df_perte_temps['Nom'].isin(noms_selectionnes) if noms_selectionnes else True) &
-            (df_perte_temps['DateDebut'].dt.date >= date_range[0]) &
-            (df_perte_temps['DateDebut'].dt.date <= date_range[1])
-        ]
+    if df_filtre is not None:
+        st.write("Aperçu des données de perte de temps :")
+        preview(df_filtre, key='apercu_perte_temps')
 
         if not df_filtre.empty:
-            # Préparer les données pour le graphique en aires empilées
-            df_pivot = df_filtre.pivot_table(
-                index='DateDebut',
-                columns='Nom',
-                values='DureeSecondaire',
-                aggfunc='sum'
-            ).fillna(0)
+            # Préparer les données pour le graphique en aires empilées : durées
+            # par nom, lues dans les agrégats des lignes chargées et regroupées
+            # par heure, jour ou semaine selon la plage, pour borner le nombre de points
+            cube = donnees.rollup(source_perte_temps, 'durees', filtres)
+            df_pivot = downtime_series(
+                source_perte_temps.rollups['durees'], cube, date_range[0], date_range[1], MAX_POINTS_GRAPHIQUE
+            )
 
             # Afficher le graphique en aires empilées
-            st.area_chart(df_pivot)
+            st.area_chart(frame_payload(df_pivot))
         else:
             st.write("Aucune donnée disponible pour les sélections effectuées.")
- 
-# Section 4: Données de Perte de Temps Non planifié
-st.header("4. Données de Perte de Temps Non planifiées")
-st.write(
-    "Cette section présente les enregistrements de la vue 'vPerteTempsExtraction' de la base de données 'PROD_PDTAzure'."
-)
-
-# Exécuter la requête pour obtenir les données
-query_perte_temps = "SELECT * FROM dbo.vPerteTempsExtraction;"
-df_perte_tempsnonplan = execute_query(query_perte_temps, connection_string_prod_pdtazure)
 
-# Vérifier si des données ont été récupérées
-if df_perte_tempsnonplan is not None and not df_perte_tempsnonplan.empty:
-    # Filtrer les données pour 'Non-Planifié'
-    df_non_planifie = df_perte_tempsnonplan[df_perte_tempsnonplan['Nom'] == 'Non-Planifié']
 
-    # Convertir 'DateDebut' en datetime
-    df_non_planifie['DateDebut'] = pd.to_datetime(df_non_planifie['DateDebut'], errors='coerce')
+# Section 4: Données de Perte de Temps Non planifié
+def configuration_resume(colonne, libelle, sujet):
+    """
+    Configure les colonnes d'un résumé des arrêts (voir kpi_rol.kpis.downtime_summary).
 
-    # Supprimer les lignes avec des dates invalides
-    df_non_planifie = df_non_planifie.dropna(subset=['DateDebut'])
+    Args:
+        colonne (str): La colonne de regroupement du résumé.
+        libelle (str): Le titre de cette colonne.
+        sujet (str): Ce que désigne chaque ligne dans les infobulles (ex. 'type de cause').
 
-    # Ajouter un filtre multisélection pour la colonne 'Secteur'
-    secteurs_disponibles = df_non_planifie['Secteur'].unique()
-    secteurs_selectionnes = st.multiselect(
-        "Sélectionnez un ou plusieurs secteurs :",
-        options=secteurs_disponibles,
-        default=secteurs_disponibles  # Par défaut, tous les secteurs sont sélectionnés
-    )
+    Returns:
+        dict: La configuration des colonnes pour st.dataframe.
+    """
+    return {
+        colonne: libelle,
+        'Nombre_Occurrences': st.column_config.NumberColumn(
+            'Nombre d\'Occurrences',
+            help=f"Nombre total d'occurrences pour chaque {sujet}",
+            format='%d'
+        ),
+        'Duree_Par_Occurrence_Minutes': st.column_config.NumberColumn(
+            'Durée par Occurrence (Minutes)',
+            help=f"Durée moyenne par occurrence en minutes pour chaque {sujet}",
+            format='%.2f'
+        ),
+        'Durees': st.column_config.LineChartColumn(
+            'Arrêts par Classe de Durée',
+            help=(
+                f"Nombre d'arrêts par classe de durée pour chaque {sujet}, des plus courts aux plus longs ; "
+                "les classes s'élargissent avec la durée (échelle logarithmique)"
+            ),
+            y_min=0
+        )
+    }
 
-    # Appliquer le filtre sur les secteurs sélectionnés
-    df_filtre = df_non_planifie[df_non_planifie['Secteur'].isin(secteurs_selectionnes)]
 
+def render_non_planifie(df_non_planifie):
     # Définir les dates limites
     date_aujourdhui = datetime.now().date()
-    date_max_retour = date_aujourdhui - timedelta(days=730)  # Deux ans en arrière
 
-    # Slider pour sélectionner le nombre de jours à afficher
-    nb_jours = st.slider(
-        "Sélectionnez le nombre de jours à afficher",
-        min_value=1,
-        max_value=730,
-        value=30,  # Valeur par défaut : 30 jours
-        step=1,
-        help="Déplacez le curseur pour sélectionner la période à afficher, jusqu'à un maximum de deux ans."
-    )
-
-    # Calculer la date de début en fonction du nombre de jours sélectionné
-    date_debut = date_aujourdhui - timedelta(days=nb_jours)
-
-    # Filtrer les données en fonction de la période sélectionnée
-    df_filtre = df_filtre[
-        (df_filtre['DateDebut'].dt.date >= date_debut) &
-        (df_filtre['DateDebut'].dt.date <= date_aujourdhui)
-    ]
-
-    # Vérifier si le DataFrame filtré n'est pas vide
-    if not df_filtre.empty:
-        # Calculer la somme des durées en secondes et le nombre d'occurrences par 'TypeCauses'
-        df_aggregated = df_filtre.groupby('TypeCauses').agg(
-            Nombre_Occurrences=('TypeCauses', 'size'),
-            Somme_Duree_Minutes=('DureeSecondaire', 'sum')
-        ).reset_index()
-
-        # Calculer la durée par occurrence en minutes
-        df_aggregated['Duree_Par_Occurrence_Minutes'] = df_aggregated['Somme_Duree_Minutes'] / df_aggregated['Nombre_Occurrences'] 
-
-        # Ajouter une colonne pour les durées sous forme de liste (pour le graphique)
-        df_aggregated['Durees'] = df_filtre.groupby('TypeCauses')['DureeSecondaire'].apply(list).reset_index(drop=True)
-
-        # Afficher le DataFrame avec la configuration des colonnes
-        st.dataframe(
-            df_aggregated,
-            column_config={
-                'TypeCauses': 'Type de Causes',
-                'Nombre_Occurrences': st.column_config.NumberColumn(
-                    'Nombre d\'Occurrences',
-                    help='Nombre total d\'occurrences pour chaque type de cause',
-                    format='%d'
-                ),
-                'Duree_Par_Occurrence_Minutes': st.column_config.NumberColumn(
-                    'Durée par Occurrence (Minutes)',
-                    help='Durée moyenne par occurrence en minutes pour chaque type de cause',
-                    format='%.2f'
-                ),
-                'Durees': st.column_config.LineChartColumn(
-                    'Distribution des Durées (Minutes)',
-                    help='Graphique montrant la distribution des durées en Minutes pour chaque type de cause',
-                    y_min=0
-                )
-            },
-            hide_index=True
+    # Vérifier si des données ont été récupérées
+    if df_non_planifie is not None and not df_non_planifie.empty:
+        # Classes de durée des histogrammes, communes aux deux tableaux et à toutes
+        # les périodes sélectionnées : elles couvrent les deux années chargées
+        df_non_planifie = with_duration_classes(df_non_planifie)
+
+        # Ajouter un filtre multisélection pour la colonne 'Secteur'
+        secteurs_disponibles = df_non_planifie['Secteur'].unique()
+        secteurs_selectionnes = st.multiselect(
+            "Sélectionnez un ou plusieurs secteurs :",
+            options=secteurs_disponibles,
+            default=secteurs_disponibles,  # Par défaut, tous les secteurs sont sélectionnés
+            key='secteurs_non_planifie'
         )
-        
-        # Calculer la somme des durées en secondes et le nombre d'occurrences par 'TypeCauses'
-        df_aggregated = df_filtre.groupby('ActionsInterventions').agg(
-            Nombre_Occurrences=('ActionsInterventions', 'size'),
-            Somme_Duree_Minutes=('DureeSecondaire', 'sum')
-        ).reset_index()
-
-        # Calculer la durée par occurrence en minutes
-        df_aggregated['Duree_Par_Occurrence_Minutes'] = df_aggregated['Somme_Duree_Minutes'] / df_aggregated['Nombre_Occurrences'] 
-
-        # Ajouter une colonne pour les durées sous forme de liste (pour le graphique)
-        df_aggregated['Durees'] = df_filtre.groupby('ActionsInterventions')['DureeSecondaire'].apply(list).reset_index(drop=True)
-
-        # Afficher le DataFrame avec la configuration des colonnes
-        st.dataframe(
-            df_aggregated,
-            column_config={
-                'ActionsInterventions': 'Actions',
-                'Nombre_Occurrences': st.column_config.NumberColumn(
-                    'Nombre d\'Occurrences',
-                    help="Nombre total d\'occurrences pour chaque type d'action",
-                    format='%d'
-                ),
-                'Duree_Par_Occurrence_Minutes': st.column_config.NumberColumn(
-                    'Durée par Occurrence (Minutes)',
-                    help="Durée moyenne par occurrence en minutes pour chaque type d'action",
-                    format='%.2f'
-                ),
-                'Durees': st.column_config.LineChartColumn(
-                    'Distribution des Durées (Minutes)',
-                    help="Graphique montrant la distribution des durées en Minutes pour chaque type d'action",
-                    y_min=0
-                )
-            },
-            hide_index=True
+
+        # Appliquer le filtre sur les secteurs sélectionnés
+        df_filtre = df_non_planifie[df_non_planifie['Secteur'].isin(secteurs_selectionnes)]
+
+        # Slider pour sélectionner le nombre de jours à afficher
+        nb_jours = st.slider(
+            "Sélectionnez le nombre de jours à afficher",
+            min_value=1,
+            max_value=730,
+            value=30,  # Valeur par défaut : 30 jours
+            step=1,
+            help="Déplacez le curseur pour sélectionner la période à afficher, jusqu'à un maximum de deux ans.",
+            key='nb_jours_non_planifie'
         )
-        
-    else:
-        st.write("Aucune donnée 'Non-Planifié' disponible pour les critères sélectionnés.")
-else:
-    st.write("Aucune donnée disponible.")
-    
-    
-# Section 5: Données de la production
-st.header("5. Données de la production")
-st.write(
-    "Cette section présente les enregistrements de la table 'Daily Production' de la base de données 'BI_PREP'."
-)
 
-query_prod = (
-    "SELECT * FROM [dbo].[Daily Production] "
-    "WHERE Secteur = 'Usine' AND Date >= '2022-01-01';"
-)
-df_prod = execute_query(query_prod, connection_string_bi_prep)
+        # Calculer la date de début en fonction du nombre de jours sélectionné
+        date_debut = date_aujourdhui - timedelta(days=nb_jours)
 
+        # Filtrer les données en fonction de la période sélectionnée
+        df_filtre = date_window(df_filtre, date_debut, date_aujourdhui, 'DateDebut')
 
-if df_prod is not None:
-    st.write("Aperçu des données de production :")
-    st.dataframe(df_prod)
+        # Vérifier si le DataFrame filtré n'est pas vide
+        if not df_filtre.empty:
+            # Nombre d'occurrences, durées et histogramme des durées par type de cause
+            st.dataframe(
+                frame_payload(downtime_summary(df_filtre, 'TypeCauses')),
+                column_config=configuration_resume('TypeCauses', 'Type de Causes', 'type de cause'),
+                hide_index=True
+            )
 
-    # Convertir la colonne 'Date' en datetime
-    df_prod['Date'] = pd.to_datetime(df_prod['Date'], errors='coerce')
+            # Puis par action
+            st.dataframe(
+                frame_payload(downtime_summary(df_filtre, 'ActionsInterventions')),
+                column_config=configuration_resume('ActionsInterventions', 'Actions', "type d'action"),
+                hide_index=True
+            )
 
-    # Supprimer les lignes avec des dates invalides
-    df_prod = df_prod.dropna(subset=['Date'])
+        else:
+            st.write("Aucune donnée 'Non-Planifié' disponible pour les critères sélectionnés.")
+    else:
+        st.write("Aucune donnée disponible.")
 
-    # Définir 'Date' comme index
-    df_prod.set_index('Date', inplace=True)
 
-    # Sélectionner les colonnes pertinentes
-    df_prod_selected = df_prod[['Production Nette (lb)', 'Production Brute (lb)']]
+# Section 5: Données de la production
+def render_production(df_prod):
+    if df_prod is not None:
+        st.write("Aperçu des données de production :")
+        preview(df_prod, key='apercu_production')
 
-    # Définir la date minimale et maximale pour le date_input
-    min_date = df_prod.index.min().date()
-    max_date = df_prod.index.max().date()
+        # 'Date' est convertie et sert d'index trié dès le chargement
 
-    # Afficher le champ de saisie de dates pour sélectionner la plage
-    start_date, end_date = st.date_input(
-        "Sélectionnez la plage de dates",
-        value=(min_date, max_date),
-        min_value=min_date,
-        max_value=max_date,
-        format="YYYY-MM-DD"
-    )
+        # Définir la date minimale et maximale pour le date_input
+        min_date = df_prod.index.min().date()
+        max_date = df_prod.index.max().date()
 
-    # Vérifier que les dates sont dans le bon ordre
-    if start_date > end_date:
-        st.error("La date de début doit être antérieure ou égale à la date de fin.")
-    else:
-        # Filtrer les données en fonction de la plage de dates sélectionnée
-        df_filtered = df_prod_selected.loc[start_date:end_date]
+        # Afficher le champ de saisie de dates pour sélectionner la plage
+        start_date, end_date = st.date_input(
+            "Sélectionnez la plage de dates",
+            value=(min_date, max_date),
+            min_value=min_date,
+            max_value=max_date,
+            format="YYYY-MM-DD",
+            key='plage_dates_production'
+        )
 
-        # Afficher le graphique linéaire des données filtrées
-        st.line_chart(df_filtered)
+        # Vérifier que les dates sont dans le bon ordre
+        if start_date > end_date:
+            st.error("La date de début doit être antérieure ou égale à la date de fin.")
+        else:
+            # Points de la plage sélectionnée, lus au niveau de la pyramide de
+            # résolutions (jour, semaine, mois) adapté à la plage et réduits au
+            # budget de points du graphique en conservant les pics
+            df_filtered = donnees.pyramid(source_production).view(
+                start_date, end_date, MAX_POINTS_GRAPHIQUE,
+                columns=['Production Nette (lb)', 'Production Brute (lb)'],
+            )
 
+            # Afficher le graphique linéaire des données filtrées
+            st.line_chart(frame_payload(df_filtered))
 
-# Section 6: Données de la production
-st.header("6. Données de consommation d'eau")
-st.write(
-    "Cette section présente les enregistrements de la table 'Water Consumption' de la base de données 'BI_PREP'."
-)
 
-query_eau = (
-    "SELECT * FROM [dbo].[Water Consumption] "
-    "WHERE Secteur = 'Usine' AND Date >= '2022-01-01';"
-)
-df_prod = execute_query(query_eau, connection_string_bi_prep)
+# Section 6: Données de consommation d'eau
+def render_eau(df_eau):
+    if df_eau is not None:
+        st.write("Aperçu des données de consommation d'eau:")
+        preview(df_eau, key='apercu_eau')
 
+        # Définir la date minimale et maximale pour le date_input
+        min_date = df_eau.index.min().date()
+        max_date = df_eau.index.max().date()
 
-if df_prod is not None:
-    st.write("Aperçu des données de consommation d'eau:")
-    st.dataframe(df_prod)
+        # Afficher le champ de saisie de dates pour sélectionner la plage
+        start_date, end_date = st.date_input(
+            "Sélectionnez la plage de dates",
+            value=(min_date, max_date),
+            min_value=min_date,
+            max_value=max_date,
+            format="YYYY-MM-DD",
+            key='plage_dates_eau'
+        )
 
-    # Convertir la colonne 'Date' en datetime
-    df_prod['Date'] = pd.to_datetime(df_prod['Date'], errors='coerce')
+        # Vérifier que les dates sont dans le bon ordre
+        if start_date > end_date:
+            st.error("La date de début doit être antérieure ou égale à la date de fin.")
+        else:
+            # Colonnes de consommation de la plage sélectionnée, au niveau de
+            # résolution adapté et réduites au budget de points du graphique
+            df_filtered = donnees.pyramid(source_eau).view(start_date, end_date, MAX_POINTS_GRAPHIQUE)
 
-    # Supprimer les lignes avec des dates invalides
-    df_prod = df_prod.dropna(subset=['Date'])
+            # Afficher le graphique linéaire des données filtrées
+            st.line_chart(frame_payload(df_filtered))
 
-    # Définir 'Date' comme index
-    df_prod.set_index('Date', inplace=True)
 
+# Section 7: KPI précalculés par le moteur de calcul (python -m kpi_rol.engine)
+def afficher_resume(colonne, libelle, sujet):
+    """
+    Crée l'affichage d'un résumé des arrêts précalculé, comme dans la section 4.
 
-    # Définir la date minimale et maximale pour le date_input
-    min_date = df_prod.index.min().date()
-    max_date = df_prod.index.max().date()
+    Args:
+        colonne (str): La colonne de regroupement du résumé.
+        libelle (str): Le titre de cette colonne.
+        sujet (str): Ce que désigne chaque ligne dans les infobulles.
 
-    # Afficher le champ de saisie de dates pour sélectionner la plage
-    start_date, end_date = st.date_input(
-        "Sélectionnez la plage de dates",
-        value=(min_date, max_date),
-        min_value=min_date,
-        max_value=max_date,
-        format="YYYY-MM-DD"
+    Returns:
+        callable: La fonction d'affichage df -> None.
+    """
+    return lambda df: st.dataframe(df, column_config=configuration_resume(colonne, libelle, sujet), hide_index=True)
+
+
+# KPI du magasin, dans l'ordre d'affichage : nom, titre et affichage
+kpi_precalcules = [
+    ('rts_etapes', "Demandes (RT) en cours par centre de coût et étape", st.bar_chart),
+    ('bt_etapes', "BT par centre de coût et étape", st.bar_chart),
+    ('perte_temps', "Pertes de temps par nom", st.area_chart),
+    ('non_planifie_causes', "Arrêts non planifiés par type de cause",
+     afficher_resume('TypeCauses', 'Type de Causes', 'type de cause')),
+    ('non_planifie_actions', "Arrêts non planifiés par action",
+     afficher_resume('ActionsInterventions', 'Actions', "type d'action")),
+    ('production', "Production", st.line_chart),
+    ('eau', "Consommation d'eau", st.line_chart),
+]
+
+
+def render_kpi_precalcules(periodes):
+    if not periodes:
+        st.write("Aucun KPI précalculé. Ils sont produits par la commande : python -m kpi_rol.engine")
+        return
+
+    # Périodes calculées, de la plus récente à la plus ancienne
+    manifestes = {manifeste['period']: manifeste for manifeste in periodes}
+    periode = st.selectbox(
+        "Sélectionnez une période :",
+        list(manifestes),
+        format_func=lambda nom: (
+            f"{datetime.fromisoformat(manifestes[nom]['start']):%Y-%m-%d %H:%M}"
+            f" au {datetime.fromisoformat(manifestes[nom]['end']):%Y-%m-%d %H:%M}"
+        ),
+        key='periode_kpi'
     )
+    manifeste = manifestes[periode]
+    st.caption(f"Calculé le {datetime.fromtimestamp(manifeste['computed_at']):%Y-%m-%d %H:%M:%S}")
+    for nom_kpi, erreur in manifeste.get('errors', {}).items():
+        st.warning(f"Le KPI {nom_kpi} n'a pas pu être calculé : {erreur}")
+
+    for nom_kpi, titre, afficher in kpi_precalcules:
+        df_kpi = store.read(periode, nom_kpi)
+        if df_kpi is None:
+            continue
+        st.subheader(titre)
+        if df_kpi.empty:
+            st.write("Aucune donnée pour cette période.")
+        else:
+            afficher(frame_payload(df_kpi))
+
+
+# Disposition de la page : un onglet par section. Seul l'onglet affiché lit ses
+# données et calcule ses tableaux et graphiques ; l'onglet choisi figure dans
+# l'adresse de la page (ex. ?section=Eau) pour pouvoir y revenir directement
+sections = [
+    ('rts', "RTs", "1. Données des RTs",
+     "Cette section présente les enregistrements de la table 'ROLDynawayWorksheetKPIRequest' de la base de données 'BI_Staging'."),
+    ('bt', "BT", "2. Données de BT",
+     "Cette section présente les enregistrements de la table 'ROLDynawayWorksheetAll' de la base de données 'BI_Staging'."),
+    ('perte_temps', "Pertes de temps", "3. Données de Perte de Temps",
+     "Cette section présente les enregistrements de la vue 'vPerteTempsExtraction' de la base de données 'PROD_PDTAzure'."),
+    ('non_planifie', "Non planifié", "4. Données de Perte de Temps Non planifiées",
+     "Cette section présente les enregistrements de la vue 'vPerteTempsExtraction' de la base de données 'PROD_PDTAzure'."),
+    ('production', "Production", "5. Données de la production",
+     "Cette section présente les enregistrements de la table 'Daily Production' de la base de données 'BI_PREP'."),
+    ('eau', "Eau", "6. Données de consommation d'eau",
+     "Cette section présente les enregistrements de la table 'Water Consumption' de la base de données 'BI_PREP'."),
+    ('kpi_precalcules', "KPI précalculés", "7. KPI précalculés",
+     "Cette section présente les KPI calculés en lot par période (nuit, quart) et enregistrés dans le magasin local."),
+]
+onglets = st.tabs([onglet for _, onglet, _, _ in sections], key='section', bind='query-params')
+
+# Source, lecture et rendu de chaque section
+chargements_sections = {
+    'rts': (source_rts, lambda: donnees.load(source_rts), render_rts),
+    'bt': (source_bt, lambda: donnees.load(source_bt), render_bt),
+    'perte_temps': (source_perte_temps, load_perte_temps_options, render_perte_temps),
+    'non_planifie': (source_perte_temps, load_non_planifie, render_non_planifie),
+    'production': (source_production, lambda: donnees.load(source_production), render_production),
+    'eau': (source_eau, lambda: donnees.load(source_eau), render_eau),
+    # Lecture seule du magasin local : aucune base de données n'est interrogée
+    'kpi_precalcules': (None, store.periods, render_kpi_precalcules),
+}
+
+# Lancer les lectures des sections affichées ; chaque section est rendue dès
+# que ses propres données sont arrivées
+emplacements = {}
+chargements = {}
+for (nom_section, _, titre, description), onglet in zip(sections, onglets):
+    # Sans suivi de l'onglet affiché (open vaut None), toutes les sections sont rendues
+    if onglet.open is False:
+        continue
+    with onglet:
+        st.header(titre)
+        st.write(description)
+        emplacements[nom_section] = st.empty()
+        emplacements[nom_section].caption("Chargement des données en cours…")
+    source, lecture, _ = chargements_sections[nom_section]
+    if source is None:
+        # Le répertoire du magasin tient lieu de serveur pour la limite de lectures simultanées
+        chargements[nom_section] = loader.submit(store.STORE_DIR, lecture)
+        continue
+    # Une source consultée est ensuite actualisée à l'intervalle de sa durée de
+    # vie : les rendus servent les données déjà chargées et n'attendent pas la base
+    schedule_source(source)
+    chargements[nom_section] = loader.submit(source.connection_string, lecture)
+emplacements = {nom: emplacement.container() for nom, emplacement in emplacements.items()}
+
+for nom_chargement, chargement in loader.completed(chargements):
+    with emplacements[nom_chargement]:
+        try:
+            resultat = chargement.result()
+        except Exception as e:
+            # Une source en échec n'empêche pas le rendu des autres sections
+            st.error(f"Erreur lors de l'exécution de la requête : {e}")
+            continue
+        # Durée du rendu et volume des tableaux et graphiques envoyés au navigateur
+        with metrics.timed('render', nom_chargement):
+            chargements_sections[nom_chargement][2](resultat)
+
+# État des sources dans la barre latérale : date et âge des données, erreurs
+# des actualisations planifiées
+for connection_string, etat_source in etats_sources.items():
+    sources_connexion = [
+        source for source in SOURCES if source.connection_string == connection_string
+    ]
+    instantane = snapshots.oldest_served(connection_string)
+    chargements_source = [query_cache.last_loaded(connection_string)] + [
+        source.incremental_table().last_refresh for source in sources_connexion if source.incremental
+    ]
+    chargements_source = [moment for moment in chargements_source if moment is not None]
+    echecs = [
+        actualisation for actualisation in map(scheduler.status, (s.name for s in sources_connexion))
+        if actualisation is not None and actualisation.last_error
+    ]
+    with etat_source.container():
+        if instantane is not None:
+            st.caption(
+                f"Instantané du {datetime.fromtimestamp(instantane):%Y-%m-%d %H:%M:%S}"
+                + ("" if snapshots.OFFLINE else ", actualisation en cours")
+            )
+        elif chargements_source:
+            # Les données affichées sont celles de la source actualisée le moins récemment
+            dernier_chargement = min(chargements_source)
+            st.caption(
+                f"Chargé le {datetime.fromtimestamp(dernier_chargement):%Y-%m-%d %H:%M:%S}"
+                f" (il y a {format_age(datetime.now().timestamp() - dernier_chargement)})"
+            )
+        for echec in echecs:
+            # Âge des données servies depuis la dernière actualisation réussie
+            age = echec.staleness()
+            st.warning(
+                f"Échec de la dernière actualisation : {echec.last_error}"
+                + ("" if age is None else f" (données actualisées il y a {format_age(age)})")
+            )
 
-    # Vérifier que les dates sont dans le bon ordre
-    if start_date > end_date:
-        st.error("La date de début doit être antérieure ou égale à la date de fin.")
+# Mesures de performance de ce rendu (requêtes, transformations, rendus des sections)
+if mode_debogage:
+    mesures = pd.DataFrame(metrics.recent(since=debut_rendu))
+    if mesures.empty:
+        st.sidebar.caption("Aucune mesure pour ce rendu.")
     else:
-        # Filtrer les données en fonction de la plage de dates sélectionnée
-        df_filtered = df_prod_selected.loc[start_date:end_date]
-
-        # Afficher le graphique linéaire des données filtrées
-        st.line_chart(df_filtered)
-   
\ No newline at end of file
+        colonnes = ['stage', 'name', 'ms', 'rows', 'bytes', 'payload_bytes', 'process_peak_rss']
+        st.sidebar.dataframe(
+            mesures.reindex(columns=colonnes).rename(columns={
+                'stage': 'Étape',
+                'name': 'Nom',
+                'ms': 'Durée (ms)',
+                'rows': 'Lignes',
+                'bytes': 'Octets lus',
+                'payload_bytes': 'Octets envoyés',
+                'process_peak_rss': 'Pic RSS du processus',
+            }),
+            hide_index=True,
+        )
+        st.sidebar.caption(f"Durée totale du rendu : {(time.time() - debut_rendu) * 1000:.0f} ms")
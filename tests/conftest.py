@@ -0,0 +1,16 @@
+"""
+Configuration commune des tests.
+"""
+import pytest
+
+from kpi_rol import snapshots
+
+
+@pytest.fixture(autouse=True)
+def snapshot_dir(tmp_path, monkeypatch):
+    # Instantanés des tests dans un répertoire temporaire, jamais dans celui du tableau de bord
+    directory = tmp_path / 'snapshots'
+    monkeypatch.setattr(snapshots, 'SNAPSHOT_DIR', str(directory))
+    yield directory
+    # Les écritures en arrière-plan se terminent avant le retour au répertoire d'origine
+    snapshots._writer.submit(lambda: None).result()
@@ -0,0 +1,145 @@
+"""
+Tests du cache des résultats de requêtes et du regroupement des lectures (kpi_rol.cache).
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from kpi_rol import cache
+from kpi_rol.cache import QueryCache, SingleFlight
+
+CS = 'SERVER=test;'
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Horloge monotone avancée à la main : now[0] secondes
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def frame(rows=100):
+    return pd.DataFrame({'v': range(rows)})
+
+
+def test_get_within_ttl(clock):
+    query_cache = QueryCache()
+    df = frame()
+    query_cache.put(CS, 'SELECT 1;', df)
+    assert query_cache.get(CS, 'SELECT 1;', ttl=60) is df
+    assert query_cache.get(CS, 'SELECT 2;', ttl=60) is None
+    assert query_cache.get('SERVER=other;', 'SELECT 1;', ttl=60) is None
+
+
+def test_ttl_expiry(clock):
+    query_cache = QueryCache()
+    query_cache.put(CS, 'SELECT 1;', frame())
+    clock[0] += 61
+    # La durée de vie est choisie par l'appelant
+    assert query_cache.get(CS, 'SELECT 1;', ttl=120) is not None
+    assert query_cache.get(CS, 'SELECT 1;', ttl=60) is None
+
+
+def test_lru_eviction_by_byte_budget(clock):
+    size = int(frame().memory_usage(index=True, deep=True).sum())
+    query_cache = QueryCache(max_bytes=int(size * 2.5))
+    query_cache.put(CS, 'a', frame())
+    query_cache.put(CS, 'b', frame())
+    # 'a' devient le plus récemment utilisé : 'b' est évincé à sa place
+    assert query_cache.get(CS, 'a', ttl=60) is not None
+    query_cache.put(CS, 'c', frame())
+    assert query_cache.get(CS, 'a', ttl=60) is not None
+    assert query_cache.get(CS, 'b', ttl=60) is None
+    assert query_cache.get(CS, 'c', ttl=60) is not None
+
+
+def test_result_larger_than_budget_is_not_kept(clock):
+    query_cache = QueryCache(max_bytes=10)
+    query_cache.put(CS, 'a', frame())
+    assert query_cache.get(CS, 'a', ttl=60) is None
+
+
+def test_put_replaces_previous_result(clock):
+    size = int(frame().memory_usage(index=True, deep=True).sum())
+    query_cache = QueryCache(max_bytes=int(size * 1.5))
+    query_cache.put(CS, 'a', frame())
+    replacement = frame()
+    # Le remplacement ne compte pas deux fois dans la mémoire occupée
+    query_cache.put(CS, 'a', replacement)
+    assert query_cache.get(CS, 'a', ttl=60) is replacement
+
+
+def test_invalidate_connection_string(clock):
+    query_cache = QueryCache()
+    query_cache.put(CS, 'a', frame())
+    query_cache.put('SERVER=other;', 'a', frame())
+    query_cache.invalidate(CS)
+    assert query_cache.get(CS, 'a', ttl=60) is None
+    assert query_cache.get('SERVER=other;', 'a', ttl=60) is not None
+    query_cache.invalidate()
+    assert query_cache.get('SERVER=other;', 'a', ttl=60) is None
+
+
+def test_last_loaded(clock):
+    query_cache = QueryCache()
+    assert query_cache.last_loaded(CS) is None
+    query_cache.put(CS, 'a', frame())
+    assert query_cache.last_loaded(CS) is not None
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'résultat'
+
+    with ThreadPoolExecutor(4) as pool:
+        leader = pool.submit(flight.do, 'k', slow)
+        assert started.wait(5)
+        followers = [pool.submit(flight.do, 'k', slow) for _ in range(3)]
+        # Les appels suivants attendent l'appel en cours au lieu de s'exécuter
+        time.sleep(0.1)
+        release.set()
+        results = [leader.result()] + [future.result() for future in followers]
+
+    assert results == ['résultat'] * 4
+    assert len(calls) == 1
+    # L'appel terminé, la clé est libérée : un nouvel appel s'exécute
+    assert flight.do('k', lambda: 'suivant') == 'suivant'
+
+
+def test_error_is_shared_and_key_released():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise ValueError('échec')
+
+    with ThreadPoolExecutor(2) as pool:
+        leader = pool.submit(flight.do, 'k', failing)
+        assert started.wait(5)
+        follower = pool.submit(flight.do, 'k', failing)
+        time.sleep(0.1)
+        release.set()
+        for future in (leader, follower):
+            with pytest.raises(ValueError):
+                future.result()
+
+    assert flight.do('k', lambda: 1) == 1
+
+
+def test_distinct_keys_run_separately():
+    flight = SingleFlight()
+    assert flight.do('a', lambda: 1) == 1
+    assert flight.do('b', lambda: 2) == 2
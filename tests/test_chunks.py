@@ -0,0 +1,40 @@
+"""
+Tests de la lecture par lots (kpi_rol.chunks).
+"""
+import pandas as pd
+import pytest
+
+from kpi_rol.chunks import aggregate_chunks, concat_chunks
+
+
+def lots():
+    first = pd.DataFrame({'Nom': pd.Categorical(['b', 'a', 'b']), 'v': [1.0, 2.0, 3.0]})
+    return [first, pd.DataFrame({'Nom': pd.Categorical(['c']), 'v': [4.0]}), first.iloc[:0]]
+
+
+def test_concat_chunks_unites_categories():
+    df = concat_chunks(lots())
+    assert df['Nom'].tolist() == ['b', 'a', 'b', 'c']
+    assert df['Nom'].cat.categories.tolist() == ['a', 'b', 'c']
+    # Catégories identiques dans tous les lots : elles sont conservées telles quelles
+    dtype = pd.CategoricalDtype(['z', 'a'])
+    same = [pd.DataFrame({'Nom': pd.Series(['a'], dtype=dtype)})] * 2
+    assert concat_chunks(same)['Nom'].dtype == dtype
+
+
+def test_aggregate_chunks_matches_one_block():
+    aggregations = {'n': ('v', 'size'), 'total': ('v', 'sum'), 'plus_grand': ('v', 'max')}
+    result = aggregate_chunks(lots(), ['Nom'], **aggregations)
+    expected = concat_chunks(lots()).groupby(['Nom'], observed=True).agg(**aggregations)
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_aggregate_chunks_without_rows():
+    result = aggregate_chunks(lots()[2:], ['Nom'], n=('v', 'size'))
+    assert result.empty
+    assert result.index.names == ['Nom']
+
+
+def test_aggregate_chunks_rejects_mean():
+    with pytest.raises(ValueError):
+        aggregate_chunks(lots(), ['Nom'], moyenne=('v', 'mean'))
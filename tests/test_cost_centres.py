@@ -0,0 +1,48 @@
+"""
+Tests de la correspondance des centres de coût (kpi_rol.cost_centres).
+"""
+import pandas as pd
+
+from kpi_rol.cost_centres import CostCentres, default_cost_centres
+
+
+def centres():
+    return CostCentres(
+        {'10': 'Usine', '101': 'M6', '20': 'Bâtiment'},
+        areas={'Production': ['M6', 'Usine']},
+    )
+
+
+def test_longest_prefix():
+    table = centres()
+    assert table.centre_of('101-A') == 'M6'
+    assert table.centre_of('102-A') == 'Usine'
+    assert table.centre_of('30') is None
+    assert table.centre_of(None) is None
+
+
+def test_map_text_and_categorical():
+    table = centres()
+    locations = pd.Series(['101-A', '20-B', '99', None, '101-A'], index=[5, 6, 7, 8, 9], name='Lieu')
+    expected = ['M6', 'Bâtiment', None, None, 'M6']
+    for column in (locations, locations.astype('category')):
+        mapped = table.map(column)
+        assert mapped.astype(object).where(mapped.notna(), None).tolist() == expected
+        assert mapped.index.tolist() == [5, 6, 7, 8, 9]
+        assert mapped.name == 'Lieu'
+        assert mapped.dtype == table.centres
+
+
+def test_from_file(tmp_path):
+    path = tmp_path / 'centres.json'
+    path.write_text('{"prefixes": {"101": "M6"}, "areas": {"Production": ["M6"]}}', encoding='utf-8')
+    table = CostCentres.from_file(path)
+    assert table.centre_of('101-A') == 'M6'
+    assert table.areas == {'Production': ['M6']}
+
+
+def test_default_areas_group_known_centres():
+    table = default_cost_centres()
+    assert table.areas
+    for centres in table.areas.values():
+        assert set(centres) <= set(table.centres.categories)
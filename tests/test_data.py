@@ -0,0 +1,63 @@
+"""
+Tests de la couche d'accès aux données (kpi_rol.data).
+"""
+import pandas as pd
+
+from kpi_rol.data import DataAccess, DataSource
+from kpi_rol.query import IsIn
+from kpi_rol.rollups import COUNT, DailyRollup
+
+
+class CountingRollup(DailyRollup):
+    """
+    Cube qui compte ses constructions.
+    """
+
+    builds = 0
+
+    def build(self, df):
+        CountingRollup.builds += 1
+        return super().build(df)
+
+
+def shared_result():
+    # Résultat partagé entre les rendus, comme celui du cache de requêtes
+    df = pd.DataFrame({
+        'Date': pd.to_datetime(['2024-01-01', '2024-01-01', '2024-01-02']),
+        'Nom': ['a', 'b', 'a'],
+    })
+
+    def execute(query, connection_string, **kwargs):
+        return df
+
+    return execute
+
+
+def test_identical_filters_reuse_the_cube():
+    CountingRollup.builds = 0
+    source = DataSource(
+        'essai', 'SERVER=test;', 'dbo.Essai', rollups={'noms': CountingRollup('Date', by=['Nom'])}
+    )
+    execute = shared_result()
+    filters = [IsIn('Nom', ['a', 'b'])]
+    for _ in range(3):
+        # Un nouvel accès par rendu, avec des filtres égaux mais recréés
+        access = DataAccess(execute)
+        access.load(source, list(filters))
+        cube = access.rollup(source, 'noms', [IsIn('Nom', ['b', 'a'])])
+    assert CountingRollup.builds == 1
+    assert cube[COUNT].sum() == 3
+
+
+def test_narrower_filters_are_applied_locally():
+    queries = []
+
+    def execute(query, connection_string, **kwargs):
+        queries.append(query)
+        return shared_result()(query, connection_string)
+
+    source = DataSource('essai', 'SERVER=test;', 'dbo.Essai')
+    access = DataAccess(execute)
+    assert len(access.load(source)) == 3
+    assert access.load(source, [IsIn('Nom', ['a'])])['Nom'].tolist() == ['a', 'a']
+    assert len(queries) == 1
@@ -0,0 +1,52 @@
+"""
+Tests du filtrage par plage de dates (kpi_rol.dates).
+"""
+from datetime import date, datetime
+
+import pandas as pd
+
+from kpi_rol.dates import date_window, day_bounds
+from kpi_rol.transforms import sort_by
+
+
+def frame():
+    return pd.DataFrame({
+        'Date': pd.to_datetime(['2024-01-03 12:00', None, '2024-01-01 00:00', '2024-01-02 23:59', '2024-01-04 00:00']),
+        'v': [3, 0, 1, 2, 4],
+    })
+
+
+def test_day_bounds():
+    assert day_bounds(date(2024, 1, 1), date(2024, 1, 2)) == (datetime(2024, 1, 1), datetime(2024, 1, 3))
+    assert day_bounds(None, None) == (None, None)
+
+
+def test_unsorted_column():
+    df = frame()
+    assert date_window(df, date(2024, 1, 2), date(2024, 1, 3), 'Date')['v'].tolist() == [3, 2]
+    assert date_window(df, None, date(2024, 1, 1), 'Date')['v'].tolist() == [1]
+    # Sans borne, seules les lignes sans date sont écartées
+    assert date_window(df, None, None, 'Date')['v'].tolist() == [3, 1, 2, 4]
+
+
+def test_sorted_column():
+    df = sort_by('Date')(frame())
+    assert date_window(df, date(2024, 1, 2), date(2024, 1, 3), 'Date')['v'].tolist() == [2, 3]
+    assert date_window(df, date(2024, 1, 4), None, 'Date')['v'].tolist() == [4]
+    assert date_window(df, date(2024, 2, 1), None, 'Date').empty
+
+
+def test_reordered_copy_of_sorted_frame():
+    df = sort_by('Date')(frame())
+    date_window(df, None, None, 'Date')
+    # Une copie triée selon une autre colonne n'est plus triée par date
+    reordered = df.sort_values('v', ascending=False)
+    assert date_window(reordered, date(2024, 1, 2), date(2024, 1, 3), 'Date')['v'].tolist() == [3, 2]
+    doubled = pd.concat([df, df])
+    assert date_window(doubled, date(2024, 1, 2), date(2024, 1, 2), 'Date')['v'].tolist() == [2, 2]
+
+
+def test_index():
+    df = frame().dropna().set_index('Date')
+    assert date_window(df, date(2024, 1, 2), date(2024, 1, 3))['v'].tolist() == [3, 2]
+    assert date_window(df.sort_index(), date(2024, 1, 2), date(2024, 1, 3))['v'].tolist() == [2, 3]
@@ -0,0 +1,31 @@
+"""
+Tests de l'exécution des requêtes (kpi_rol.db).
+"""
+import sqlite3
+
+import pytest
+
+from kpi_rol import db, pool, snapshots
+
+
+@pytest.fixture
+def saved(monkeypatch):
+    # Requêtes dont le résultat est enregistré dans un instantané
+    queries = []
+    monkeypatch.setattr(pool, '_connect', lambda cs: sqlite3.connect(':memory:', check_same_thread=False))
+    monkeypatch.setattr(pool, '_driver_errors', (sqlite3.Error,))
+    monkeypatch.setattr(snapshots, 'write_async', lambda name, df, metadata=None: queries.append(metadata['query']))
+    return queries
+
+
+def test_only_scheduled_reads_are_saved(saved):
+    connection_string = 'SERVER=instantanes;'
+    # Sélection des widgets : mise en cache, mais pas enregistrée
+    df = db.read_query('SELECT 1 AS v;', connection_string, ttl=60, tag='essai')
+    assert df['v'].tolist() == [1]
+    # Requête principale d'une source
+    df = db.read_query('SELECT 2 AS v;', connection_string, ttl=60, tag='essai', scheduled=True)
+    assert df['v'].tolist() == [2]
+    # Sans durée de vie, rien n'est conservé
+    db.read_query('SELECT 3 AS v;', connection_string, scheduled=True)
+    assert saved == ['SELECT 2 AS v;']
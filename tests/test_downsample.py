@@ -0,0 +1,65 @@
+"""
+Tests du sous-échantillonnage des séries temporelles (kpi_rol.downsample).
+"""
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from kpi_rol.downsample import SeriesPyramid, lttb, pyramid_of
+
+
+def test_lttb_keeps_ends_and_peaks():
+    x = np.arange(1000)
+    y = np.sin(x / 50.0)
+    y[500] = 10.0
+    kept = lttb(x, y, 50)
+    assert len(kept) == 50
+    assert kept[0] == 0 and kept[-1] == 999
+    assert np.all(np.diff(kept) > 0)
+    assert 500 in kept
+
+
+def test_lttb_small_inputs():
+    assert lttb(np.arange(5), np.zeros(5), 10).tolist() == [0, 1, 2, 3, 4]
+    assert lttb(np.arange(5), np.zeros(5), 2).tolist() == [0, 4]
+
+
+def hourly(days=60):
+    index = pd.date_range('2024-01-01', periods=days * 24, freq='h', name='Date')
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'a': rng.normal(size=len(index)), 'b': rng.normal(size=len(index))}, index=index)
+    return df
+
+
+def test_view_respects_budget_and_keeps_extremes():
+    df = hourly()
+    df.iloc[700, 0] = 100.0
+    df.iloc[900, 1] = -100.0
+    pyramid = SeriesPyramid(df)
+    assert [name for name, _ in pyramid.levels] == ['raw', 'day', 'week', 'month']
+    view = pyramid.view(date(2024, 1, 1), date(2024, 2, 29), max_points=200)
+    assert 0 < len(view) <= 100
+    assert view['a'].max() == 100.0
+    assert view['b'].min() == -100.0
+    assert view.index.is_monotonic_increasing
+
+
+def test_view_short_range_uses_raw_rows():
+    df = hourly()
+    view = SeriesPyramid(df).view(date(2024, 1, 2), date(2024, 1, 2), max_points=200, columns=['a'])
+    pd.testing.assert_frame_equal(view, df.loc['2024-01-02', ['a']])
+
+
+def test_daily_table_has_no_hour_or_day_level():
+    index = pd.date_range('2022-01-01', periods=800, freq='D', name='Date')
+    df = pd.DataFrame({'v': np.arange(800.0), 'Secteur': 'Usine'}, index=index)
+    pyramid = SeriesPyramid(df)
+    assert [name for name, _ in pyramid.levels] == ['raw', 'week', 'month']
+    # Seules les colonnes numériques sont gardées
+    assert list(pyramid.levels[0][1].columns) == ['v']
+
+
+def test_pyramid_built_once_per_frame():
+    df = hourly(3)
+    assert pyramid_of(df) is pyramid_of(df)
@@ -0,0 +1,73 @@
+"""
+Tests du moteur de calcul des KPI en lot (kpi_rol.engine).
+"""
+from datetime import datetime
+
+import pandas as pd
+
+from kpi_rol import db, engine
+from kpi_rol.engine import KPIS, split_rows
+
+
+def rows():
+    # Centre A : 6 lignes, B : 3, C : 2, D : 1, plus une ligne sans centre
+    return pd.DataFrame({
+        'Centre de coût': pd.Categorical(list('AAAAAABBBCCD') + [None]),
+        'v': range(13),
+    })
+
+
+def test_split_rows_balances_groups():
+    groups = split_rows(rows(), 'Centre de coût', parts=2, min_rows=1)
+    assert len(groups) == 2
+    assert sorted(len(group) for group in groups) == [6, 6]
+    # Chaque centre est entier dans un seul groupe ; les lignes sans centre sont écartées
+    centres = [set(group['Centre de coût'].dropna()) for group in groups]
+    assert centres[0].isdisjoint(centres[1])
+    assert set.union(*centres) == set('ABCD')
+    assert sum(len(group) for group in groups) == 12
+
+
+def test_split_rows_min_rows():
+    df = rows()
+    # Trop peu de lignes pour plusieurs groupes d'au moins 10 lignes
+    assert split_rows(df, 'Centre de coût', parts=4, min_rows=10)[0] is df
+    assert len(split_rows(df, 'Centre de coût', parts=4, min_rows=3)) == 4
+
+
+def test_split_rows_single_value():
+    df = pd.DataFrame({'Centre de coût': ['A'] * 10, 'v': range(10)})
+    assert split_rows(df, 'Centre de coût', parts=4, min_rows=1)[0] is df
+
+
+def test_rollup_kpi_is_built_chunk_by_chunk(monkeypatch):
+    kpi = KPIS['perte_temps']
+    chunks = [
+        pd.DataFrame({
+            'DateDebut': pd.to_datetime(['2024-01-01 08:00', '2024-01-01 08:30']),
+            'DureeSecondaire': [10.0, 20.0],
+            'Nom': ['Planifié', 'Planifié'],
+            'Secteur': ['A', 'A'],
+            'TypeCauses': ['X', 'X'],
+        }),
+        pd.DataFrame({
+            'DateDebut': pd.to_datetime(['2024-01-01 08:45']),
+            'DureeSecondaire': [5.0],
+            'Nom': ['Planifié'],
+            'Secteur': ['A'],
+            'TypeCauses': ['X'],
+        }),
+    ]
+    queries = []
+
+    def iter_query(query, connection_string, params=None, chunksize=None, dtypes=None):
+        queries.append((query, params))
+        yield from chunks
+
+    monkeypatch.setattr(db, 'iter_query', iter_query)
+    cube, count = engine._load(None, kpi, datetime(2024, 1, 1), datetime(2024, 1, 2))
+    assert count == 3
+    # La période est bornée côté serveur
+    assert queries[0][1] == [datetime(2024, 1, 1), datetime(2024, 1, 2)]
+    rollup = kpi.source.rollups[kpi.rollup]
+    pd.testing.assert_frame_equal(cube, rollup.build(pd.concat(chunks, ignore_index=True)))
@@ -0,0 +1,37 @@
+"""
+Tests des histogrammes par groupe (kpi_rol.histograms).
+"""
+import numpy as np
+import pandas as pd
+
+from kpi_rol.histograms import assign_bins, bin_edges, group_histograms
+
+
+def test_bin_edges_widen_geometrically():
+    edges = bin_edges(pd.Series([0.0, 5.0, 999.0, None]), bins=3)
+    # log(1 + 999) découpé en trois : 1 + bornes = 1, 10, 100, 1000
+    np.testing.assert_allclose(edges, [0.0, 9.0, 99.0, 999.0])
+    assert bin_edges(pd.Series([None, None], dtype=float)) is None
+
+
+def test_skewed_durations_fill_several_bins():
+    # Beaucoup d'arrêts courts, quelques arrêts très longs
+    durations = pd.Series([1.0] * 50 + [5.0] * 30 + [30.0] * 15 + [600.0] * 5)
+    counts = np.bincount(assign_bins(durations, bins=10), minlength=10)
+    assert counts.sum() == 100
+    assert (counts > 0).sum() == 4
+    assert counts[0] == 50
+    assert counts[-1] == 5
+
+
+def test_assign_bins_bounds_and_missing_values():
+    codes = assign_bins(pd.Series([0.0, 8.0, 10.0, 999.0, None]), bins=3)
+    assert codes.tolist() == [0, 0, 1, 2, -1]
+    assert assign_bins(pd.Series([4.0, 4.0]), bins=3).tolist() == [0, 0]
+
+
+def test_group_histograms():
+    keys = pd.Series(['a', 'b', 'a', None], name='Cause')
+    histograms = group_histograms(keys, [0, 2, 2, 1], bins=3)
+    assert histograms.to_dict() == {'a': [1, 0, 1], 'b': [0, 0, 1]}
+    assert histograms.index.name == 'Cause'
@@ -0,0 +1,83 @@
+"""
+Tests de la lecture parallèle des sources (kpi_rol.loader).
+"""
+import threading
+import time
+
+import pytest
+
+from kpi_rol import loader
+
+
+class Gauge:
+    """
+    Nombre de lectures en cours et son maximum.
+    """
+
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def read(self, value, seconds=0.01):
+        with self._lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(seconds)
+        with self._lock:
+            self.running -= 1
+        return value
+
+
+def test_server_of():
+    connection_string = 'DRIVER={ODBC Driver 17 for SQL Server};SERVER=SRV-01;DATABASE=BI;'
+    assert loader.server_of(connection_string) == 'srv-01'
+    assert loader.server_of('/chemin/local') == '/chemin/local'
+
+
+def test_results_and_errors():
+    ok = loader.submit('SERVER=resultats;', lambda a, b=0: a + b, 1, b=2)
+    failed = loader.submit('SERVER=resultats;', lambda: 1 / 0)
+    assert ok.result(5) == 3
+    with pytest.raises(ZeroDivisionError):
+        failed.result(5)
+
+
+def test_reads_per_server_are_bounded():
+    gauge = Gauge()
+    futures = [loader.submit('SERVER=borne;', gauge.read, i) for i in range(12)]
+    assert [future.result(5) for future in futures] == list(range(12))
+    assert gauge.peak <= loader.MAX_PER_SERVER
+
+
+def test_completed_in_completion_order():
+    futures = {
+        'lente': loader.submit('SERVER=ordre-a;', time.sleep, 0.2),
+        'rapide': loader.submit('SERVER=ordre-b;', lambda: None),
+    }
+    assert [name for name, _ in loader.completed(futures)] == ['rapide', 'lente']
+
+
+def test_busy_server_does_not_block_other_servers():
+    release = threading.Event()
+    busy = [loader.submit('SERVER=occupe;', release.wait, 5) for _ in range(loader.MAX_WORKERS * 2)]
+    try:
+        # Les lectures en attente du serveur occupé n'occupent aucun fil
+        assert loader.submit('SERVER=libre;', lambda: 'lu').result(2) == 'lu'
+    finally:
+        release.set()
+    assert all(future.result(5) for future in busy)
+
+
+def test_cancelled_pending_read_is_not_run():
+    release = threading.Event()
+    calls = []
+    running = [loader.submit('SERVER=annule;', release.wait, 5) for _ in range(loader.MAX_PER_SERVER)]
+    pending = loader.submit('SERVER=annule;', calls.append, 1)
+    assert pending.cancel()
+    release.set()
+    for future in running:
+        future.result(5)
+    # La place libérée passe à la lecture suivante du serveur
+    assert loader.submit('SERVER=annule;', lambda: 'lu').result(5) == 'lu'
+    assert calls == []
@@ -0,0 +1,134 @@
+"""
+Tests des bassins de connexions (kpi_rol.pool).
+"""
+import pytest
+
+from kpi_rol import pool
+from kpi_rol.pool import ConnectionPool, PoolTimeout
+
+
+class FakeError(Exception):
+    pass
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, query):
+        if self.connection.broken:
+            raise FakeError('connexion perdue')
+
+    def fetchall(self):
+        return [(1,)]
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.broken = False
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def opened(monkeypatch):
+    # Connexions ouvertes par le pilote, dans l'ordre
+    connections = []
+
+    def connect(connection_string):
+        connections.append(FakeConnection())
+        return connections[-1]
+
+    monkeypatch.setattr(pool, '_connect', connect)
+    monkeypatch.setattr(pool, '_driver_errors', (FakeError,))
+    return connections
+
+
+def test_connection_is_reused(opened):
+    connections = ConnectionPool('SERVER=test;')
+    first = connections.run(lambda conn: conn)
+    second = connections.run(lambda conn: conn)
+    assert first is second
+    assert len(opened) == 1
+
+
+def test_idle_connection_is_checked_and_replaced(opened):
+    connections = ConnectionPool('SERVER=test;', health_check_after=0)
+    first = connections.run(lambda conn: conn)
+    first.broken = True
+    second = connections.run(lambda conn: conn)
+    assert second is not first
+    assert first.closed
+    assert len(opened) == 2
+
+
+def test_recent_connection_is_not_checked(opened):
+    connections = ConnectionPool('SERVER=test;', health_check_after=60)
+    first = connections.run(lambda conn: conn)
+    first.broken = True
+    # Rendue il y a moins de health_check_after : servie sans vérification
+    assert connections.run(lambda conn: conn) is first
+
+
+def test_run_retries_on_a_new_connection(opened):
+    connections = ConnectionPool('SERVER=test;')
+    attempts = []
+
+    def query(conn):
+        attempts.append(conn)
+        if len(attempts) == 1:
+            raise FakeError('échec')
+        return 'résultat'
+
+    assert connections.run(query) == 'résultat'
+    assert attempts[0] is not attempts[1]
+    assert attempts[0].closed
+
+
+def test_run_raises_after_retries(opened):
+    connections = ConnectionPool('SERVER=test;')
+
+    def query(conn):
+        raise FakeError('échec')
+
+    with pytest.raises(FakeError):
+        connections.run(query, retries=2)
+    assert len(opened) == 3
+    assert all(conn.closed for conn in opened)
+
+
+def test_other_errors_keep_the_connection(opened):
+    connections = ConnectionPool('SERVER=test;')
+
+    def query(conn):
+        raise ValueError('erreur du code appelant')
+
+    with pytest.raises(ValueError):
+        connections.run(query)
+    assert not opened[0].closed
+    assert connections.run(lambda conn: conn) is opened[0]
+
+
+def test_acquire_timeout(opened):
+    connections = ConnectionPool('SERVER=test;', max_size=1, acquire_timeout=0.05)
+    conn = connections.acquire()
+    with pytest.raises(PoolTimeout):
+        connections.acquire()
+    connections.release(conn)
+    assert connections.acquire() is conn
+
+
+def test_close_idle(opened):
+    connections = ConnectionPool('SERVER=test;', idle_timeout=0)
+    conn = connections.run(lambda conn: conn)
+    connections.close_idle()
+    assert conn.closed
+    assert connections.run(lambda conn: conn) is not conn
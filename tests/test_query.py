@@ -0,0 +1,46 @@
+"""
+Tests des filtres de requêtes (kpi_rol.query).
+"""
+from datetime import datetime
+
+import pandas as pd
+
+from kpi_rol.query import Between, IsIn, NotLike, apply_filters, build_select, filters_cover
+
+JAN = datetime(2024, 1, 1)
+FEB = datetime(2024, 2, 1)
+MAR = datetime(2024, 3, 1)
+
+
+def test_filters_cover():
+    assert filters_cover([], [IsIn('Nom', ['a'])])
+    assert filters_cover([Between('Date', JAN, MAR)], [Between('Date', FEB, MAR), IsIn('Nom', ['a'])])
+    assert not filters_cover([Between('Date', FEB, MAR)], [Between('Date', JAN, MAR)])
+    assert not filters_cover([Between('Date', JAN)], [Between('Date', end=MAR)])
+    assert filters_cover([IsIn('Nom', ['a', 'b'])], [IsIn('Nom', ['a'])])
+    assert not filters_cover([IsIn('Nom', ['a'])], [IsIn('Nom', ['a', 'b'])])
+    # Une liste vide ne filtre rien : elle couvre tout, mais n'est couverte que par l'absence de filtre
+    assert filters_cover([IsIn('Nom', [])], [])
+    assert not filters_cover([IsIn('Nom', ['a'])], [IsIn('Nom', [])])
+    assert filters_cover([NotLike('ID', 'BT-%')], [NotLike('ID', 'BT-%')])
+
+
+def test_apply_filters_matches_sql_semantics():
+    df = pd.DataFrame({
+        'Date': pd.to_datetime(['2024-01-01', '2024-02-01', '2024-03-01', None]),
+        'Nom': ['a', 'b', 'a', 'a'],
+        'ID': ['RT-1', 'BT-2', None, 'RT_4'],
+    })
+    # Borne de fin exclue, dates manquantes écartées
+    assert apply_filters(df, [Between('Date', JAN, MAR)]).index.tolist() == [0, 1]
+    assert apply_filters(df, [IsIn('Nom', [])]).index.tolist() == [0, 1, 2, 3]
+    # NULL conservés, '_' et '%' interprétés comme dans LIKE
+    assert apply_filters(df, [NotLike('ID', 'BT-%')]).index.tolist() == [0, 2, 3]
+    assert apply_filters(df, [NotLike('ID', 'RT_4')]).index.tolist() == [0, 1, 2]
+    assert apply_filters(df, [IsIn('Nom', ['a']), Between('Date', start=FEB)]).index.tolist() == [2]
+
+
+def test_build_select():
+    query, params = build_select('dbo.T', ['A', 'B]'], [IsIn('A', [1, 2]), Between('D', start=JAN), IsIn('C', [])])
+    assert query == 'SELECT [A], [B]]] FROM dbo.T WHERE [A] IN (?, ?) AND [D] >= ?;'
+    assert params == [1, 2, JAN]
@@ -0,0 +1,61 @@
+"""
+Tests des cubes d'agrégats (kpi_rol.rollups).
+"""
+from datetime import date
+
+import pandas as pd
+
+from kpi_rol.rollups import COUNT, DailyRollup, choose_bucket
+
+
+def events(ids, days, sectors, durations):
+    return pd.DataFrame({
+        'ID': ids,
+        'Date': pd.to_datetime(days),
+        'Secteur': sectors,
+        'Duree': durations,
+    })
+
+
+def totals(rollup, cube):
+    return rollup.query(cube)[[COUNT, 'Duree']].to_dict('index')
+
+
+def test_update_adds_and_subtracts():
+    rollup = DailyRollup('Date', by=['Secteur'], sums=['Duree'])
+    old = events([1, 2], ['2024-01-01 08:00', '2024-01-01 09:00'], ['A', 'B'], [10.0, 20.0])
+    cube = rollup.build(old)
+
+    # La ligne 2 passe du secteur B au secteur A ; la ligne 3 est nouvelle
+    added = events([2, 3], ['2024-01-01 09:00', '2024-01-02 10:00'], ['A', 'A'], [25.0, 5.0])
+    updated = rollup.update(cube, added, old[old['ID'] == 2])
+
+    assert totals(rollup, updated) == {'A': {COUNT: 3, 'Duree': 40.0}}
+    assert totals(rollup, updated) == totals(rollup, rollup.build(pd.concat([old[old['ID'] == 1], added])))
+    # Le cube d'origine n'est pas modifié
+    assert totals(rollup, cube) == {'A': {COUNT: 1, 'Duree': 10.0}, 'B': {COUNT: 1, 'Duree': 20.0}}
+
+
+def test_query_range_and_distinct():
+    rollup = DailyRollup('Date', by=['Secteur'], distinct='ID')
+    cube = rollup.build(events(
+        [1, 1, 2, 3], ['2024-01-01', '2024-01-02', '2024-01-02', '2024-01-05'], ['A'] * 4, [0.0] * 4
+    ))
+    result = rollup.query(cube, date(2024, 1, 1), date(2024, 1, 2))
+    assert result.loc['A', COUNT] == 3
+    assert result.loc['A', 'ID'] == 2
+
+
+def test_build_chunks_matches_build():
+    rollup = DailyRollup('Date', by=['Secteur'], distinct='ID', sums=['Duree'])
+    df = events(
+        [1, 2, 1, 3], ['2024-01-01 08:00', '2024-01-01 09:00', '2024-01-01 17:00', '2024-01-02 10:00'],
+        ['A', 'B', 'A', 'A'], [10.0, 20.0, 5.0, 1.0],
+    )
+    pd.testing.assert_frame_equal(rollup.build_chunks([df.iloc[:1], df.iloc[1:3], df.iloc[3:]]), rollup.build(df))
+
+
+def test_choose_bucket():
+    assert choose_bucket(date(2024, 1, 1), date(2024, 1, 1), 24) == 'h'
+    assert choose_bucket(date(2024, 1, 1), date(2024, 1, 31), 100) == 'D'
+    assert choose_bucket(date(2020, 1, 1), date(2024, 1, 1), 10) == 'W'
@@ -0,0 +1,26 @@
+"""
+Tests de l'actualisation planifiée des sources (kpi_rol.scheduler).
+"""
+from kpi_rol import scheduler
+from kpi_rol.scheduler import RefreshJob, RefreshScheduler
+
+
+def test_failed_refresh_keeps_the_age_of_the_data(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(scheduler.time, 'time', lambda: now[0])
+    job = RefreshJob('essai', 'SERVER=essai;', 60, lambda: None)
+    assert job.staleness() is None
+
+    RefreshScheduler()._execute(job)
+    assert job.staleness() == 0
+    assert not job.running
+
+    def failing():
+        raise OSError('base indisponible')
+
+    now[0] += 120
+    job.refresh = failing
+    RefreshScheduler()._execute(job)
+    assert job.last_error == 'base indisponible'
+    # Les données servies sont celles de la dernière actualisation réussie
+    assert job.staleness() == 120
@@ -0,0 +1,85 @@
+"""
+Tests des instantanés sur disque (kpi_rol.snapshots).
+"""
+import os
+
+import pandas as pd
+import pytest
+
+from kpi_rol import snapshots
+
+pytestmark = pytest.mark.skipif(not snapshots.enabled(), reason="pyarrow n'est pas installé")
+
+
+def frame():
+    return pd.DataFrame(
+        {
+            'Date': pd.to_datetime(['2024-01-01', '2024-01-02', None]),
+            'Nom': pd.Categorical(['a', 'b', 'a']),
+            'Duree': [1.5, None, 3.0],
+        },
+        index=pd.Index([10, 20, 30], name='ligne'),
+    )
+
+
+def test_round_trip():
+    df = frame()
+    snapshots.write('essai', df, {'query': 'SELECT 1;'})
+    restored, metadata = snapshots.read('essai')
+    pd.testing.assert_frame_equal(restored, df)
+    assert metadata['query'] == 'SELECT 1;'
+    assert metadata['rows'] == 3
+    assert 'created_at' in metadata
+
+
+def test_missing_or_unreadable(snapshot_dir):
+    assert snapshots.read('absent') is None
+    os.makedirs(snapshot_dir, exist_ok=True)
+    (snapshot_dir / 'abime.parquet').write_bytes(b'pas du parquet')
+    assert snapshots.read('abime') is None
+
+
+def test_write_async():
+    snapshots.write_async('asynchrone', frame())
+    snapshots._writer.submit(lambda: None).result()
+    assert snapshots.read('asynchrone') is not None
+
+
+def test_prune_keeps_most_recent(snapshot_dir, monkeypatch):
+    monkeypatch.setattr(snapshots, 'MAX_SNAPSHOTS', 2)
+    for age, name in enumerate(['recent', 'ancien']):
+        snapshots.write(name, frame())
+        path = snapshot_dir / f'{name}.parquet'
+        os.utime(path, (path.stat().st_mtime - 100 * (age + 1),) * 2)
+    snapshots.write('nouveau', frame())
+    assert sorted(path.name for path in snapshot_dir.iterdir()) == ['nouveau.parquet', 'recent.parquet']
+
+
+def test_snapshot_name():
+    name = snapshots.snapshot_name('SERVER=s;PWD=secret;', 'SELECT 1;', [1])
+    assert name == snapshots.snapshot_name('SERVER=s;PWD=secret;', 'SELECT 1;', [1])
+    assert name != snapshots.snapshot_name('SERVER=s;PWD=secret;', 'SELECT 1;', [2])
+    assert 'secret' not in name
+
+
+def test_served_snapshots():
+    snapshots.mark_served('a', 'SERVER=servi;', {'created_at': 200})
+    snapshots.mark_served('b', 'SERVER=servi;', {'created_at': 100})
+    assert snapshots.oldest_served('SERVER=servi;') == 100
+    snapshots.clear_served('b')
+    assert snapshots.oldest_served('SERVER=servi;') == 200
+    snapshots.clear_served('a')
+    assert snapshots.oldest_served('SERVER=servi;') is None
+
+
+def test_failed_async_write_is_logged(monkeypatch, caplog):
+    def failing(name, df, metadata=None):
+        raise OSError('disque plein')
+
+    monkeypatch.setattr(snapshots, 'write', failing)
+    snapshots.write_async('echec', frame())
+    snapshots._writer.submit(lambda: None).result()
+    assert any(
+        record.levelname == 'ERROR' and 'echec' in record.getMessage() and record.exc_info
+        for record in caplog.records
+    )
@@ -0,0 +1,56 @@
+"""
+Tests du magasin des KPI précalculés (kpi_rol.store).
+"""
+import os
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from kpi_rol import store
+
+pytestmark = pytest.mark.skipif(not store.enabled(), reason="pyarrow n'est pas installé")
+
+
+@pytest.fixture(autouse=True)
+def store_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(store, 'STORE_DIR', str(tmp_path / 'kpi_store'))
+    return tmp_path / 'kpi_store'
+
+
+def day(n):
+    return datetime(2024, 12, n), datetime(2024, 12, n + 1)
+
+
+def test_write_and_read():
+    # Colonnes issues d'un pivot : étiquettes catégorielles
+    stages = pd.DataFrame([[1.0, 2.0]], index=pd.Index(['M6'], name='Centre de coût'),
+                          columns=pd.CategoricalIndex(['OUVERT', 'PLANIF'], name='STAGEID'))
+    period = store.write(*day(1), {'etapes': stages}, {'seconds': 1.5})
+    assert period == '20241201T0000-20241202T0000'
+    restored = store.read(period, 'etapes')
+    assert restored.loc['M6', 'PLANIF'] == 2.0
+    assert list(restored.columns) == ['OUVERT', 'PLANIF']
+    assert store.read(period, 'absent') is None
+    [manifest] = store.periods()
+    assert manifest['period'] == period
+    assert manifest['kpis'] == {'etapes': 1}
+    assert manifest['seconds'] == 1.5
+
+
+def test_rewrite_replaces_period():
+    first = store.write(*day(1), {'a': pd.DataFrame({'v': [1]}), 'b': pd.DataFrame({'v': [2]})})
+    store.write(*day(1), {'a': pd.DataFrame({'v': [3]})})
+    assert store.read(first, 'a')['v'].tolist() == [3]
+    # Le nouveau calcul remplace l'ancien d'un bloc, sans mélange
+    assert store.read(first, 'b') is None
+    assert len(store.periods()) == 1
+
+
+def test_periods_most_recent_first_and_pruned(store_dir, monkeypatch):
+    monkeypatch.setattr(store, 'MAX_PERIODS', 2)
+    for n in (1, 2, 3):
+        period = store.write(*day(n), {'a': pd.DataFrame({'v': [n]})})
+        os.utime(store_dir / period, (1000 + n,) * 2)
+    store.write(*day(4), {'a': pd.DataFrame({'v': [4]})})
+    assert [manifest['period'][:8] for manifest in store.periods()] == ['20241204', '20241203']
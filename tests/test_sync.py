@@ -0,0 +1,125 @@
+"""
+Tests de la synchronisation incrémentale (kpi_rol.sync).
+"""
+import pandas as pd
+import pytest
+
+from kpi_rol import snapshots
+from kpi_rol.rollups import COUNT, DailyRollup
+from kpi_rol.sync import IncrementalTable
+
+
+class FakeTable:
+    """
+    Table servie par une fonction fetch(query, params), comme kpi_rol.db.read_query.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def fetch(self, query, params):
+        self.queries.append(query)
+        if params:
+            # Seul filtre de ces tables : le filigrane, inclusif
+            return self.rows[self.rows['MODIFIEDDATETIME'] >= params[-1]].reset_index(drop=True)
+        return self.rows.copy()
+
+
+@pytest.fixture
+def saved(monkeypatch):
+    # Instantanés en mémoire : noms des copies enregistrées
+    names = []
+    monkeypatch.setattr(snapshots, 'read', lambda name: None)
+    monkeypatch.setattr(snapshots, 'write_async', lambda name, df, metadata=None: names.append(name))
+    return names
+
+
+def rows(ids, values, dates):
+    return pd.DataFrame({
+        'ID': ids,
+        'V': values,
+        'MODIFIEDDATETIME': pd.to_datetime(dates),
+    })
+
+
+def make_table(**kwargs):
+    return IncrementalTable(
+        'SERVER=test;', 'dbo.T', 'ID',
+        rollups={'v': DailyRollup('MODIFIEDDATETIME', by=['V'])},
+        **kwargs,
+    )
+
+
+def test_full_then_delta(saved):
+    source = FakeTable(rows([1, 2], ['a', 'b'], ['2024-01-01', '2024-01-02']))
+    table = make_table()
+    assert len(table.load(source.fetch)) == 2
+    assert 'WHERE' not in source.queries[-1]
+
+    source.rows = pd.concat([
+        rows([1], ['z'], ['2024-01-03']),
+        source.rows[source.rows['ID'] == 2],
+        rows([3], ['c'], ['2024-01-03']),
+    ], ignore_index=True)
+    df = table.load(source.fetch)
+    assert 'WHERE' in source.queries[-1]
+    assert df.set_index('ID')['V'].to_dict() == {1: 'z', 2: 'b', 3: 'c'}
+    # Le cube retranche l'ancienne version de la ligne 1
+    cube = table.cube('v')
+    assert cube.groupby('V', observed=True)[COUNT].sum().to_dict() == {'b': 1, 'c': 1, 'z': 1}
+    assert len(saved) == 2
+
+
+def test_unchanged_poll_is_not_saved(saved):
+    source = FakeTable(rows([1, 2, 3], ['a', 'b', None], ['2024-01-01', '2024-01-02', '2024-01-02']))
+    table = make_table()
+    for _ in range(3):
+        df = table.load(source.fetch)
+    assert len(df) == 3
+    assert len(saved) == 1
+
+
+def test_repeated_key_keeps_all_rows(saved):
+    source = FakeTable(rows([1, 1, 2], ['a', 'b', 'c'], ['2024-01-01', '2024-01-02', '2024-01-02']))
+    table = make_table()
+    for _ in range(3):
+        assert len(table.load(source.fetch)) == 3
+    # Pas de fusion par clé : chaque mise à jour est une relecture complète
+    assert all('WHERE' not in query for query in source.queries)
+    assert len(saved) == 1
+
+
+def test_repeated_key_in_delta_triggers_full_load(saved):
+    source = FakeTable(rows([1, 2], ['a', 'b'], ['2024-01-01', '2024-01-02']))
+    table = make_table()
+    table.load(source.fetch)
+    source.rows = pd.concat([source.rows, rows([2], ['c'], ['2024-01-03'])], ignore_index=True)
+    df = table.load(source.fetch)
+    assert sorted(df['V']) == ['a', 'b', 'c']
+    assert 'WHERE' not in source.queries[-1]
+
+
+def test_reconcile_reflects_deletions(saved):
+    source = FakeTable(rows([1, 2], ['a', 'b'], ['2024-01-01', '2024-01-02']))
+    table = make_table(reconcile_interval=0)
+    table.load(source.fetch)
+    source.rows = source.rows[source.rows['ID'] == 2].reset_index(drop=True)
+    df = table.load(source.fetch)
+    assert df['ID'].tolist() == [2]
+    assert table.cube('v')['V'].tolist() == ['b']
+
+
+def test_min_interval_serves_local_copy(saved):
+    source = FakeTable(rows([1], ['a'], ['2024-01-01']))
+    table = make_table()
+    table.load(source.fetch)
+    table.load(source.fetch, min_interval=3600)
+    assert len(source.queries) == 1
+
+
+def test_failed_column_probe_is_not_a_change(saved):
+    table = make_table(columns=['ID', 'V'])
+    assert table._load_full(lambda query, params: None, 0) is False
+    assert table.load(lambda query, params: None) is None
+    assert saved == []